@@ -21,7 +21,9 @@ import os
 import unittest      # Python's built-in testing framework
 import tempfile      # For creating temporary files during tests
 import time          # For adding small delays when needed
+import threading     # For waiting on background work
 from unittest.mock import Mock, patch  # For creating fake objects and responses
+import requests      # For building fake HTTP responses
 
 # Add our project folder to Python's search path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -36,12 +38,43 @@ try:
     import storage                  # Save/load weather data to files
     from error_handler import CityValidator  # Blocks fake city names
     import api                     # Gets weather data from internet
+    from weather_dashboard.config import http_client  # Shared connection pool
+    from weather_dashboard.config import geocoding    # Shared city -> coordinates cache
+    from weather_dashboard.config.single_flight import SingleFlight  # Merges duplicate requests
+    from weather_dashboard.config import city_snapshot  # One combined Open-Meteo request
+    from weather_dashboard.config import cassette       # Record/replay for offline runs
+    from weather_dashboard.config import provider_health  # Circuit breaker and adaptive timeouts
+    from weather_dashboard.config import weather_cache    # Stale-while-revalidate current weather
+    from weather_dashboard.config import not_found_cache  # Remembers unknown city names
+    from weather_dashboard.config import connectivity     # Background online/offline state
+    from weather_dashboard.config import history_index    # SQLite index of the history CSV
+    from weather_dashboard.config import history_writer   # Background history writes
+    from weather_dashboard.config import history_snapshot # In-memory copy of the history
+    from weather_dashboard.config import daily_archive    # Year-long daily exports as NumPy columns
+    from weather_dashboard.features.interactive_map import region_packs  # Offline map tiles
 except ImportError as e:
     # If we can't import these, something is wrong and we can't test
     print(f"Core modules missing: {e}")
     print("Please fix import issues before running tests.")
     sys.exit(1)
 
+# Try to import the map tile server - it needs Flask and Pillow
+try:
+    from weather_dashboard.features.interactive_map import tile_server
+    from weather_dashboard.features.interactive_map.tile_cache import TileCache
+    from weather_dashboard.features.interactive_map import local_overlay
+    from PIL import Image
+    import numpy as np
+    TILE_SERVER_AVAILABLE = True
+except ImportError:
+    TILE_SERVER_AVAILABLE = False
+
+# NumPy is also used on its own by the daily archive tests
+try:
+    import numpy as np
+except ImportError:
+    pass
+
 # Try to import language system - it's okay if this fails
 try:
     from language.controller import LanguageController
@@ -206,6 +239,8 @@ class TestWeatherStorage(unittest.TestCase):
             os.unlink(self.test_file)  # Delete the temporary file
         except FileNotFoundError:
             pass  # File already deleted, that's fine
+        # Also delete the index built next to it
+        storage.clear_weather_history(self.test_file)
     
     def test_save_and_load_weather(self):
         """Test saving weather data to file and loading it back."""
@@ -254,6 +289,347 @@ class TestWeatherStorage(unittest.TestCase):
         self.assertIsInstance(cities, list)
 
 
+class TestHistoryIndex(unittest.TestCase):
+    """
+    Test the SQLite index that answers per-city history questions, and the
+    background writer that saves history.
+
+    The index must always give the same answers as reading the CSV file.
+    """
+
+    def setUp(self):
+        """Start each test with a fresh history file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.history = os.path.join(self.temp_dir.name, "weather_history.csv")
+        with open(self.history, "w", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("timestamp,city,temperature,description\n"
+                          "2025-06-01 10:00,London,15.5,rain\n"
+                          "2025-06-02 10:00,Paris,21,clear sky\n"
+                          "2025-06-03 10:00,london,17,clouds,80,3.2\n"
+                          "2025-06-03 10:00,London,N/A,mist\n")
+
+    def tearDown(self):
+        """Delete the history file and its index."""
+        self.temp_dir.cleanup()
+
+    def test_same_answers_as_reading_the_csv(self):
+        """Test that indexed queries match a full scan of the file."""
+        recent = storage.get_recent_weather("LONDON", 2, self.history)
+
+        # Newest first, equal timestamps in file order, rows just like csv.DictReader
+        self.assertEqual([r["temperature"] for r in recent], ["17", "N/A"])
+        self.assertEqual(recent[0][None], ["80", "3.2"])
+        self.assertTrue(os.path.exists(history_index.index_path(self.history)))
+
+        self.assertEqual(storage.get_searched_cities(self.history), ["London", "Paris", "london"])
+        self.assertEqual([r["description"] for r in storage.get_city_history("london", 2, self.history)],
+                         ["clouds", "mist"])
+
+        stats = storage.get_weather_stats(self.history)
+        self.assertEqual(stats["total_records"], 4)
+        self.assertEqual(stats["date_range"], {"earliest": "2025-06-01 10:00", "latest": "2025-06-03 10:00"})
+        self.assertEqual(stats["temperature_stats"], {"min": 15.5, "max": 21.0, "avg": 17.8})
+
+    def test_new_lines_are_picked_up(self):
+        """Test that saving more weather updates the index without a rebuild."""
+        storage.get_searched_cities(self.history)  # Build the index
+        storage.save_weather({"temperature": 3, "description": "snow"}, "Oslo", self.history)
+
+        self.assertIn("Oslo", storage.get_searched_cities(self.history))
+        self.assertEqual(storage.get_recent_weather("oslo", 5, self.history)[0]["description"], "snow")
+        self.assertEqual(storage.get_weather_stats(self.history)["total_records"], 5)
+
+    def test_replaced_file_rebuilds_index(self):
+        """Test that clearing or replacing the history never shows old records."""
+        storage.get_searched_cities(self.history)
+        with open(self.history, "w", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("timestamp,city,temperature,description\n"
+                          "2025-07-01 10:00,Tokyo,30,clear sky\n")
+
+        self.assertEqual(storage.get_searched_cities(self.history), ["Tokyo"])
+
+        self.assertTrue(storage.clear_weather_history(self.history))
+        self.assertFalse(os.path.exists(history_index.index_path(self.history)))
+        self.assertEqual(storage.get_searched_cities(self.history), [])
+        self.assertEqual(storage.get_recent_weather("Tokyo", 5, self.history), [])
+
+    def test_running_stats_per_city_and_conditions(self):
+        """Test that statistics are kept per city and overall as rows arrive."""
+        london = storage.get_city_stats("LONDON", self.history)
+        self.assertEqual(london["total_records"], 3)
+        self.assertEqual(london["temperature_stats"], {"min": 15.5, "max": 17.0, "avg": 16.2})
+        self.assertEqual(london["date_range"]["earliest"], "2025-06-01 10:00")
+        self.assertEqual(storage.get_condition_counts("london", self.history),
+                         {"rain": 1, "clouds": 1, "mist": 1})
+
+        # New rows are added to the totals: only the new tail of the file is read
+        with open(self.history, "a", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("2025-06-04 10:00,London,-2,rain\n")
+        with patch.object(history_index, 'read_new_rows', wraps=history_index.read_new_rows) as reads:
+            london = storage.get_city_stats("london", self.history)
+            stats = storage.get_weather_stats(self.history)
+        self.assertGreater(reads.call_args[0][1], 0)
+
+        self.assertEqual(london["temperature_stats"]["min"], -2.0)
+        self.assertEqual(london["date_range"]["latest"], "2025-06-04 10:00")
+        self.assertEqual(storage.get_condition_counts("London", self.history)["rain"], 2)
+        self.assertEqual(storage.get_condition_counts(filepath=self.history)["clear sky"], 1)
+        self.assertEqual(stats["total_records"], 5)
+        self.assertEqual(stats["temperature_stats"], {"min": -2.0, "max": 21.0, "avg": 12.9})
+
+    def test_old_index_is_rebuilt(self):
+        """Test that an index from an older app version is rebuilt with statistics."""
+        import sqlite3
+
+        # An index with no statistics tables and a stale version number
+        conn = sqlite3.connect(history_index.index_path(self.history))
+        conn.execute("CREATE TABLE records (id INTEGER PRIMARY KEY, city_key TEXT)")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(storage.get_weather_stats(self.history)["total_records"], 4)
+
+    def test_writer_batches_and_coalesces(self):
+        """Test that a burst of saves is written once, in order, without duplicates."""
+        before = history_writer.get_writer_info()
+        # Keep the background thread from writing until every save is queued
+        with patch.object(history_writer, 'FLUSH_DELAY', 5):
+            for index, city in enumerate(["Oslo", "Rome", "oslo", "Lima"]):
+                storage.save_weather({"temperature": index}, city, self.history)
+            self.assertEqual(history_writer.get_writer_info()["pending"], 3)
+
+            # Reading the history writes the queue first
+            records = storage.load_weather_history(self.history)
+        after = history_writer.get_writer_info()
+
+        # The second Oslo save (same minute) replaced the first and moved after Rome
+        self.assertEqual([(r["city"], r["temperature"]) for r in records[4:]],
+                         [("Rome", "1"), ("oslo", "2"), ("Lima", "3")])
+        self.assertEqual(after["coalesced"] - before["coalesced"], 1)
+        self.assertEqual(after["batches"] - before["batches"], 1)
+        self.assertEqual(after["pending"], 0)
+
+    def test_writer_flushes_in_background_and_on_close(self):
+        """Test that queued records reach the file without anyone reading them."""
+        new_file = os.path.join(self.temp_dir.name, "new", "history.csv")
+        storage.save_weather({"temperature": 9}, "Cairo", new_file)
+        deadline = time.time() + 5
+        while not os.path.exists(new_file) and time.time() < deadline:
+            time.sleep(0.02)
+        with open(new_file, encoding="utf-8") as csvfile:
+            self.assertTrue(csvfile.readline().startswith("timestamp,city,temperature"))
+
+        with patch.object(history_writer, 'FLUSH_DELAY', 5):
+            storage.save_weather({"temperature": 10}, "Accra", new_file)
+            history_writer.stop_writer()
+        self.assertFalse(history_writer.get_writer_info()["writer_running"])
+        with open(new_file, encoding="utf-8") as csvfile:
+            self.assertIn("Accra", csvfile.read())
+
+    def test_falls_back_to_csv_without_index(self):
+        """Test that history still works if the index can't be opened."""
+        import sqlite3
+
+        with patch.object(history_index, '_connect', side_effect=sqlite3.OperationalError("read-only")):
+            self.assertEqual(storage.get_searched_cities(self.history), ["London", "Paris", "london"])
+            self.assertEqual(len(storage.get_recent_weather("London", 10, self.history)), 3)
+            self.assertEqual(storage.get_weather_stats(self.history)["total_records"], 4)
+
+
+class TestHistorySnapshot(unittest.TestCase):
+    """
+    Test the in-memory copy of the history that load_weather_history uses.
+    """
+
+    def setUp(self):
+        """Start each test with a small history file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.history = os.path.join(self.temp_dir.name, "weather_history.csv")
+        with open(self.history, "w", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("timestamp,city,temperature,description\n"
+                          "2025-06-01 10:00,London,15.5,rain\n")
+
+    def tearDown(self):
+        """Delete the history file and forget its snapshot."""
+        history_snapshot.forget(self.history)
+        self.temp_dir.cleanup()
+
+    def test_unchanged_file_is_not_read_again(self):
+        """Test that reading an unchanged history doesn't parse the file."""
+        first = storage.load_weather_history(self.history)
+        with patch.object(history_snapshot, 'read_new_rows') as reads:
+            second = storage.load_weather_history(self.history)
+
+        reads.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIs(first, second)  # Nothing is copied while the file is unchanged
+
+    def test_grown_file_reads_only_the_new_lines(self):
+        """Test that appended lines are read from where the last read stopped."""
+        import csv
+
+        storage.load_weather_history(self.history)
+        size = os.path.getsize(self.history)
+        with open(self.history, "a", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("2025-06-02 10:00,Paris,21,clear sky\n2025-06-03 10:00,Rome")
+
+        with patch.object(history_snapshot, 'read_new_rows', wraps=history_snapshot.read_new_rows) as reads:
+            records = storage.load_weather_history(self.history)
+
+        self.assertEqual(reads.call_args[0][1], size)
+        with open(self.history, newline="", encoding="utf-8") as csvfile:
+            self.assertEqual(list(records), list(csv.DictReader(csvfile)))
+        self.assertEqual(records[-1]["city"], "Rome")  # Unfinished last line is included
+
+        # Finishing that line replaces it rather than adding it twice
+        with open(self.history, "a", newline="", encoding="utf-8") as csvfile:
+            csvfile.write(",25,sunny\n")
+        records = storage.load_weather_history(self.history)
+        self.assertEqual([r["city"] for r in records], ["London", "Paris", "Rome"])
+        self.assertEqual(records[-1]["description"], "sunny")
+
+    def test_earlier_results_never_change(self):
+        """Test that records handed out stay the same when the file grows or callers re-sort them."""
+        first = storage.load_weather_history(self.history)
+        with open(self.history, "a", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("2025-06-02 10:00,Paris,21,clear sky\n")
+
+        second = storage.load_weather_history(self.history)
+        self.assertEqual(len(first), 1)  # The earlier result keeps its old length
+        self.assertEqual([r["city"] for r in second], ["London", "Paris"])
+
+        # The result can't be changed in place, and a sorted copy doesn't
+        # affect what the next call gets
+        with self.assertRaises(AttributeError):
+            second.sort(key=lambda r: r["city"], reverse=True)
+        by_city = sorted(second, key=lambda r: r["city"], reverse=True)
+        self.assertEqual([r["city"] for r in by_city], ["Paris", "London"])
+        self.assertEqual([r["city"] for r in storage.load_weather_history(self.history)], ["London", "Paris"])
+
+    def test_replaced_file_is_parsed_again(self):
+        """Test that a rewritten history file never mixes in old records."""
+        storage.load_weather_history(self.history)
+        with open(self.history, "w", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("timestamp,city,temperature,description\n"
+                          "2025-07-01 10:00,Tokyo,30,clear sky\n"
+                          "2025-07-02 10:00,Tokyo,31,clear sky\n")
+
+        records = storage.load_weather_history(self.history)
+        self.assertEqual([r["city"] for r in records], ["Tokyo", "Tokyo"])
+
+        storage.clear_weather_history(self.history)
+        self.assertEqual(storage.load_weather_history(self.history), [])
+        self.assertNotIn(os.path.abspath(self.history), history_snapshot.get_snapshot_info())
+
+    def test_threads_share_one_snapshot(self):
+        """Test that background threads reading at once all get the full history."""
+        with open(self.history, "a", newline="", encoding="utf-8") as csvfile:
+            for day in range(2, 30):
+                csvfile.write(f"2025-06-{day:02d} 10:00,London,{day},rain\n")
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(len(storage.load_weather_history(self.history))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(results, [29] * 8)
+
+
+@unittest.skipUnless(daily_archive.NUMPY_AVAILABLE, "Daily archive needs NumPy")
+class TestDailyArchive(unittest.TestCase):
+    """
+    Test loading the year-long daily weather exports as NumPy columns.
+    """
+
+    HEADER = ("city,time,weather_code (wmo code),temperature_2m_max (°F),temperature_2m_min (°F),"
+              "temperature_2m_mean (°F),sunrise (iso8601),sunset (iso8601),rain_sum (inch),"
+              "snowfall_sum (inch),wind_speed_10m_max (mp/h),sunshine_duration (s),"
+              "visibility_mean (undefined),surface_pressure_mean (hPa),relative_humidity_2m_mean (%),"
+              "cloud_cover_mean (%),precipitation_probability_mean (undefined)\n")
+
+    def setUp(self):
+        """Start each test with a small archive file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_path = os.path.join(self.temp_dir.name, "combined.csv")
+        with open(self.archive_path, "w", newline="", encoding="utf-8") as csvfile:
+            csvfile.write(self.HEADER)
+            # Phoenix's days are out of order on purpose
+            csvfile.write("Phoenix,2024-01-02,3,66.0,43.0,54.0,2024-01-02T14:32,2024-01-03T00:32,"
+                          "0.0,0.0,7.0,5000.0,,979.0,60,50,\n")
+            csvfile.write("Denver,2024-01-01,3,49.6,19.7,30.3,2024-01-01T14:21,2024-01-01T23:45,"
+                          "0.0,0.0,5.2,28895.93,,838.1,57,30,\n")
+            csvfile.write("Phoenix,2024-01-01,0,64.6,42.5,51.4,2024-01-01T14:32,2024-01-02T00:31,"
+                          "0.1,0.0,6.5,4893.26,,979.0,69,75,\n")
+            # A row exported in another column order (mean, max, min, wind, code, ...)
+            csvfile.write("Lebrija,2024-01-01,80.2,86.0,75.1,6.1,2,2024-01-01T07:37,2024-01-01T17:17,"
+                          "30000.0,0.2,0.0,40,,80,1010.0,\n")
+
+    def tearDown(self):
+        """Delete the archive and forget the loaded copy."""
+        daily_archive.forget_daily_archives()
+        self.temp_dir.cleanup()
+
+    def test_columns_are_parsed_and_grouped_by_city(self):
+        """Test that rows become typed columns, grouped by city in date order."""
+        archive = daily_archive.load_daily_archive(self.archive_path)
+
+        self.assertEqual(len(archive), 4)
+        self.assertEqual(archive.cities(), ["Phoenix", "Denver", "Lebrija"])
+        self.assertEqual(archive.units["temperature_2m_max"], "°F")
+
+        phoenix = archive.city("phoenix")  # Any capitalization works
+        self.assertEqual([str(day) for day in phoenix["time"]], ["2024-01-01", "2024-01-02"])
+        self.assertEqual(list(phoenix["temperature_2m_max"]), [64.6, 66.0])
+        self.assertEqual(str(phoenix["sunset"][0]), "2024-01-02T00:31")
+        self.assertTrue(np.isnan(phoenix["visibility_mean"]).all())  # Empty cells are NaN
+
+        # The other column order is put back in line
+        lebrija = archive.city("Lebrija")
+        self.assertEqual(lebrija["temperature_2m_max"][0], 86.0)
+        self.assertEqual(lebrija["weather_code"][0], 2)
+        self.assertEqual(lebrija["rain_sum"][0], 0.2)
+
+        self.assertIsNone(archive.city("Atlantis"))
+        self.assertIsNone(archive.column("not_a_column"))
+
+    def test_date_range(self):
+        """Test that a city's days can be limited to a date range."""
+        archive = daily_archive.load_daily_archive(self.archive_path)
+
+        days = archive.city("Phoenix", start="2024-01-02")
+        self.assertEqual(list(days["temperature_2m_min"]), [43.0])
+        days = archive.city("Phoenix", end="2024-01-01")
+        self.assertEqual(list(days["temperature_2m_min"]), [42.5])
+        self.assertEqual(len(archive.city("Phoenix", "2024-02-01", "2024-02-28")["time"]), 0)
+
+    def test_saved_columns_are_used_until_the_csv_changes(self):
+        """Test that later loads use the saved .npy files, and a changed CSV is parsed again."""
+        daily_archive.load_daily_archive(self.archive_path)
+        self.assertTrue(os.path.isfile(os.path.join(daily_archive.cache_dir(self.archive_path), "meta.json")))
+
+        # Loading again (like the next time the app starts) doesn't parse the CSV
+        daily_archive.forget_daily_archives()
+        with patch.object(daily_archive, '_parse_csv') as parse:
+            archive = daily_archive.load_daily_archive(self.archive_path)
+        parse.assert_not_called()
+        self.assertIsInstance(archive.columns["temperature_2m_max"], np.memmap)
+        self.assertEqual(archive.cities(), ["Phoenix", "Denver", "Lebrija"])
+
+        with open(self.archive_path, "a", newline="", encoding="utf-8") as csvfile:
+            csvfile.write("Ahmedabad,2024-01-01,0,82.8,59.8,69.7,2024-01-01T01:50,2024-01-01T12:35,"
+                          "0.0,0.0,6.7,35130.0,,1008.3,71,0,\n")
+        archive = daily_archive.load_daily_archive(self.archive_path)
+        self.assertIn("Ahmedabad", archive.cities())
+        self.assertEqual(len(archive), 5)
+
+    def test_missing_file(self):
+        """Test that a missing archive gives None instead of an error."""
+        self.assertIsNone(daily_archive.load_daily_archive(os.path.join(self.temp_dir.name, "nothing.csv")))
+
+
 class TestAPIFunctions(unittest.TestCase):
     """
     Test API functions that get data from the internet.
@@ -262,7 +638,25 @@ class TestAPIFunctions(unittest.TestCase):
     we create fake responses to test our code logic.
     """
     
-    @patch('api.requests.get')  # Replace the real internet request with a fake one
+    def setUp(self):
+        """Point the geocoding cache at an empty temporary file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.temp_dir.name, "geocode.db")
+        self.db_patch = patch.object(geocoding, 'GEOCODE_DB_PATH', db_path)
+        self.db_patch.start()
+        geocoding.clear_geocode_cache()
+        not_found_cache.clear_not_found_cache()
+        city_snapshot.clear_snapshot_cache()
+    
+    def tearDown(self):
+        """Forget anything cached during the test."""
+        geocoding.clear_geocode_cache()
+        not_found_cache.clear_not_found_cache()
+        city_snapshot.clear_snapshot_cache()
+        self.db_patch.stop()
+        self.temp_dir.cleanup()
+    
+    @patch('api.http_client.get')  # Replace the real internet request with a fake one
     def test_geocoding_success(self, mock_get):
         """Test successful city geocoding (getting latitude/longitude)."""
         # Create a fake successful response from the geocoding API
@@ -281,7 +675,7 @@ class TestAPIFunctions(unittest.TestCase):
         self.assertEqual(lon, -0.1278)
         mock_get.assert_called_once()  # Make sure the API was called exactly once
     
-    @patch('api.requests.get')  # Another fake internet request
+    @patch('api.http_client.get')  # Another fake internet request
     def test_geocoding_no_results(self, mock_get):
         """Test geocoding when city is not found."""
         # Create a fake response with no results
@@ -297,6 +691,58 @@ class TestAPIFunctions(unittest.TestCase):
         self.assertIsNone(lat)
         self.assertIsNone(lon)
     
+    def test_slow_details_return_partial_result(self):
+        """Test that a slow Open-Meteo call doesn't hold up the main weather data."""
+        basic = ({"main": {"temp": 18, "humidity": 60}, "weather": [{"description": "clear sky"}]}, None)
+        
+        def slow_details(city):
+            time.sleep(0.5)  # Much slower than the deadline below
+            return {"daily": {"uv_index_max": [5]}}
+        
+        with patch.object(api, 'get_basic_weather_from_weatherdb', return_value=basic), \
+             patch.object(api, 'get_detailed_environmental_data', side_effect=slow_details), \
+             patch.object(api, 'SECONDARY_DEADLINE', 0.1):
+            result = api.get_current_weather("London")
+        
+        # Main data is there, extra details are marked as missing
+        self.assertEqual(result["temperature"], 18)
+        self.assertIsNone(result["error"])
+        self.assertTrue(result["partial"])
+        self.assertEqual(result["uv_index"], "N/A")
+    
+    @patch('api.http_client.get')
+    def test_many_cities_share_one_open_meteo_request(self, mock_get):
+        """Test that a multi-city batch sends one Open-Meteo request for all cities."""
+        coordinates = {"London": (51.5, -0.1), "Paris": (48.9, 2.4)}
+        
+        def fake_get(url, params=None, **kwargs):
+            response = Mock(status_code=200)
+            if url == geocoding.OPEN_METEO_GEOCODING_URL:
+                lat, lon = coordinates[params["name"]]
+                response.json.return_value = {"results": [{"latitude": lat, "longitude": lon}]}
+            elif url == city_snapshot.SNAPSHOT_URL:
+                count = len(str(params["latitude"]).split(","))
+                response.json.return_value = [
+                    {"current": {"time": "2025-06-24T12:00", "visibility": 10000 + i},
+                     "daily": {"time": ["2025-06-24"], "uv_index_max": [3 + i]}}
+                    for i in range(count)
+                ]
+            else:
+                response.json.return_value = {"main": {"temp": 20}, "weather": [{"description": "clear"}]}
+            return response
+        
+        mock_get.side_effect = fake_get
+        results = dict(api.get_current_weather_many(["London", "Paris"]))
+        
+        self.assertEqual(set(results), {"London", "Paris"})
+        self.assertEqual(results["London"]["temperature"], 20)
+        self.assertEqual(results["London"]["uv_index"], 3)
+        self.assertEqual(results["Paris"]["uv_index"], 4)
+        
+        snapshot_calls = [c for c in mock_get.call_args_list if c.args[0] == city_snapshot.SNAPSHOT_URL]
+        self.assertEqual(len(snapshot_calls), 1)
+        self.assertEqual(snapshot_calls[0].kwargs["params"]["latitude"], "51.5,48.9")
+    
     def test_geocoding_invalid_input(self):
         """Test geocoding with invalid inputs."""
         # These inputs should not work
@@ -311,6 +757,1130 @@ class TestAPIFunctions(unittest.TestCase):
                 self.assertIsNone(lon)
 
 
+class TestCurrentWeatherCache(unittest.TestCase):
+    """
+    Test the stale-while-revalidate cache for current conditions.
+    
+    Switching back to a city seen a moment ago should be instant.
+    """
+    
+    def setUp(self):
+        """Start every test with an empty cache."""
+        weather_cache.clear_weather_cache()
+        self.sunny = {"temperature": 25, "error": None, "partial": False}
+        self.rainy = {"temperature": 12, "error": None, "partial": False}
+    
+    def tearDown(self):
+        """Leave an empty cache behind."""
+        weather_cache.clear_weather_cache()
+    
+    def test_first_view_downloads_then_cache_is_fresh(self):
+        """Test that the second view of a city doesn't hit the network."""
+        with patch.object(api, 'get_current_weather', return_value=self.sunny) as mock_fetch:
+            first = api.get_current_weather_cached("Rome")
+            second = api.get_current_weather_cached("rome")
+        
+        mock_fetch.assert_called_once()
+        self.assertEqual(first["cache_status"], "network")
+        self.assertEqual(second["cache_status"], weather_cache.FRESH)
+        self.assertEqual(second["temperature"], 25)
+    
+    def test_stale_entry_shown_then_refreshed(self):
+        """Test that stale data is returned instantly and refreshed in the background."""
+        weather_cache.store("Rome", "en", self.sunny)
+        refreshed = []
+        done = threading.Event()
+        
+        def on_refresh(data):
+            refreshed.append(data)
+            done.set()
+        
+        with patch.object(weather_cache, 'FRESH_SECONDS', 0), \
+             patch.object(api, 'get_current_weather', return_value=self.rainy):
+            result = api.get_current_weather_cached("Rome", "en", on_refresh=on_refresh)
+            self.assertTrue(done.wait(2))
+        
+        # Old data shown immediately, new data delivered by the callback
+        self.assertEqual(result["cache_status"], weather_cache.STALE)
+        self.assertEqual(result["temperature"], 25)
+        self.assertEqual(refreshed[0]["temperature"], 12)
+        self.assertEqual(weather_cache.lookup("Rome", "en")[0]["temperature"], 12)
+    
+    def test_expired_entry_is_not_used(self):
+        """Test that very old data is replaced before being shown."""
+        weather_cache.store("Rome", "en", self.sunny)
+        with patch.object(weather_cache, 'FRESH_SECONDS', 0), \
+             patch.object(weather_cache, 'STALE_SECONDS', 0), \
+             patch.object(api, 'get_current_weather', return_value=self.rainy):
+            result = api.get_current_weather_cached("Rome")
+        
+        self.assertEqual(result["cache_status"], "network")
+        self.assertEqual(result["temperature"], 12)
+    
+    def test_errors_are_not_cached(self):
+        """Test that a failed search is retried next time."""
+        weather_cache.store("Atlantis", "en", {"error": "City not found"})
+        self.assertEqual(weather_cache.lookup("Atlantis", "en"), (None, weather_cache.MISS))
+
+
+class TestGeocodingCache(unittest.TestCase):
+    """
+    Test the shared geocoding cache.
+    
+    Every feature looks cities up through this cache, so after the first
+    lookup a city should never need another network call.
+    """
+    
+    def setUp(self):
+        """Use a temporary database and a fake geocoding response."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.temp_dir.name, "geocode.db")
+        self.db_patch = patch.object(geocoding, 'GEOCODE_DB_PATH', db_path)
+        self.db_patch.start()
+        geocoding.clear_geocode_cache()
+        not_found_cache.clear_not_found_cache()
+        
+        # Fake Open-Meteo response for London
+        self.mock_response = Mock()
+        self.mock_response.status_code = 200
+        self.mock_response.json.return_value = {
+            "results": [{
+                "name": "London", "country": "United Kingdom",
+                "latitude": 51.5074, "longitude": -0.1278,
+                "timezone": "Europe/London"
+            }]
+        }
+    
+    def tearDown(self):
+        """Forget anything cached during the test."""
+        geocoding.clear_geocode_cache()
+        not_found_cache.clear_not_found_cache()
+        self.db_patch.stop()
+        self.temp_dir.cleanup()
+    
+    def test_second_lookup_uses_cache(self):
+        """Test that spelling variations of a cached city skip the network."""
+        with patch.object(http_client, 'get', return_value=self.mock_response) as mock_get:
+            self.assertEqual(geocoding.get_coordinates("London"), (51.5074, -0.1278))
+            self.assertEqual(geocoding.get_coordinates("  LONDON "), (51.5074, -0.1278))
+            mock_get.assert_called_once()
+    
+    def test_cache_survives_restart(self):
+        """Test that cities come back from disk after memory is cleared."""
+        with patch.object(http_client, 'get', return_value=self.mock_response):
+            geocoding.geocode_city("London")
+        
+        # Clearing memory is like restarting the app
+        geocoding.clear_geocode_cache()
+        not_found_cache.clear_not_found_cache()
+        
+        with patch.object(http_client, 'get') as mock_get:
+            record = geocoding.geocode_city("london")
+            mock_get.assert_not_called()
+        
+        self.assertEqual(record["provider"], "open-meteo")
+        self.assertEqual(record["timezone"], "Europe/London")
+    
+    def test_unknown_city_remembered(self):
+        """Test that a typo isn't looked up again straight away."""
+        empty = Mock(status_code=200)
+        empty.json.return_value = {"results": []}
+        
+        with patch.object(http_client, 'get', return_value=empty) as mock_get:
+            self.assertEqual(geocoding.get_coordinates("Londn"), (None, None))
+            calls_after_first_try = mock_get.call_count
+            self.assertEqual(geocoding.get_coordinates("londn"), (None, None))
+            self.assertEqual(mock_get.call_count, calls_after_first_try)
+    
+    def test_network_error_not_remembered_as_unknown(self):
+        """Test that being offline doesn't mark a real city as unknown."""
+        with patch.object(http_client, 'get', side_effect=requests.exceptions.ConnectionError()):
+            self.assertEqual(geocoding.get_coordinates("London"), (None, None))
+        
+        self.assertFalse(not_found_cache.is_not_found("geocode", "London"))
+        with patch.object(http_client, 'get', return_value=self.mock_response):
+            self.assertEqual(geocoding.get_coordinates("London"), (51.5074, -0.1278))
+    
+    @patch('api.http_client.get')
+    def test_weatherdb_404_remembered(self, mock_get):
+        """Test that WeatherDB isn't asked twice about a city it doesn't know."""
+        mock_get.return_value = Mock(status_code=404)
+        
+        first = api.get_basic_weather_from_weatherdb("Atlantis")
+        second = api.get_basic_weather_from_weatherdb("ATLANTIS")
+        
+        self.assertIsNone(first[0])
+        self.assertIsNone(second[0])
+        self.assertIn("not found", second[1])
+        mock_get.assert_called_once()
+    
+    def test_connection_check_uses_cached_state(self):
+        """Test that checking the connection doesn't open a socket every time."""
+        validator = CityValidator()
+        with patch.object(connectivity, 'start_monitor'), \
+             patch('socket.create_connection') as mock_socket:
+            connectivity._set_online(False)
+            self.assertFalse(validator.check_internet_connection())
+            connectivity.mark_online()
+            self.assertTrue(validator.check_internet_connection())
+            mock_socket.assert_not_called()
+
+
+class TestCitySnapshot(unittest.TestCase):
+    """
+    Test splitting one combined Open-Meteo response into the pieces
+    used by the weather display, history tracker and sun/moon page.
+    """
+    
+    def setUp(self):
+        """Build a fake snapshot: 7 past days plus today, London in summer (UTC+1)."""
+        dates = [f"2025-06-{day:02d}" for day in range(17, 25)]
+        self.snapshot = {
+            "utc_offset_seconds": 3600,
+            "current": {"time": "2025-06-24T17:45", "visibility": 24000},
+            "daily": {
+                "time": dates,
+                "temperature_2m_max": [20 + i for i in range(8)],
+                "temperature_2m_min": [10 + i for i in range(8)],
+                "temperature_2m_mean": [15 + i for i in range(8)],
+                "uv_index_max": [1, 2, 3, 4, 5, 6, 7, 8],
+                "precipitation_sum": [0, 0, 0, 0, 0, 0, 0, 1.5],
+                "sunrise": [f"{d}T04:43" for d in dates],
+                "sunset": [f"{d}T21:21" for d in dates],
+                "daylight_duration": [59880.0] * 8,
+            }
+        }
+    
+    def test_current_conditions_use_today(self):
+        """Test that UV and precipitation come from today, not the past days."""
+        conditions = city_snapshot.get_current_conditions(self.snapshot)
+        self.assertEqual(conditions["daily"]["uv_index_max"], [8])
+        self.assertEqual(conditions["daily"]["precipitation_sum"], [1.5])
+        self.assertEqual(conditions["current"]["visibility"], 24000)
+    
+    def test_past_days_exclude_today(self):
+        """Test that history covers the 7 days before today."""
+        history = city_snapshot.get_past_days(self.snapshot)
+        self.assertEqual(len(history["time"]), 7)
+        self.assertEqual(history["time"][-1], "2025-06-23")
+        self.assertEqual(history["temperature_2m_mean"][0], 15)
+    
+    def test_sun_times_converted_to_utc(self):
+        """Test that local sunrise/sunset are turned into UTC times."""
+        sun = city_snapshot.get_today_sun_times(self.snapshot)
+        self.assertEqual(sun["sunrise"], "2025-06-24T03:43:00+00:00")
+        self.assertEqual(sun["sunset"], "2025-06-24T20:21:00+00:00")
+        self.assertEqual(sun["day_length"], 59880)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test that identical requests running at the same time are merged.
+    
+    Several features ask for the same city right after a search, so only
+    one of them should actually hit the network.
+    """
+    
+    def test_concurrent_callers_share_one_call(self):
+        """Test that five threads asking for the same thing cause one call."""
+        import threading
+        group = SingleFlight()
+        call_count = []
+        
+        def slow_fetch():
+            call_count.append(1)
+            time.sleep(0.2)  # Long enough for all threads to pile up
+            return {"city": "London"}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(group.do(("archive", "london"), slow_fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Everyone got the answer, but only one request was made
+        self.assertEqual(len(call_count), 1)
+        self.assertEqual(results, [{"city": "London"}] * 5)
+        
+        stats = group.get_stats()
+        self.assertEqual(stats["executed"], 1)
+        self.assertEqual(stats["coalesced"], 4)
+
+
+class TestHTTPClient(unittest.TestCase):
+    """
+    Test the shared HTTP client that every API call goes through.
+    
+    Reusing one session means connections stay open between requests,
+    which makes repeat searches much faster.
+    """
+    
+    def tearDown(self):
+        """Throw away the session so each test starts fresh."""
+        http_client.close_session()
+        provider_health.reset_provider_health()
+    
+    def test_session_is_shared(self):
+        """Test that every caller gets the same session object."""
+        self.assertIs(http_client.get_session(), http_client.get_session())
+    
+    def test_busy_hosts_get_bigger_pools(self):
+        """Test that tile hosts get their own, larger connection pool."""
+        session = http_client.get_session()
+        tile_adapter = session.get_adapter("https://tile.openstreetmap.org/1/0/0.png")
+        other_adapter = session.get_adapter("https://example.com/")
+        
+        # Different hosts should use different pools with different sizes
+        self.assertIsNot(tile_adapter, other_adapter)
+        self.assertEqual(tile_adapter._pool_maxsize, http_client.HOST_POOL_SIZES["tile.openstreetmap.org"])
+        self.assertEqual(other_adapter._pool_maxsize, http_client.DEFAULT_POOL_SIZE)
+    
+    @patch('requests.Session.get')
+    def test_default_timeout_applied(self, mock_get):
+        """Test that requests without a timeout still get one."""
+        http_client.get("https://example.com/")
+        _, kwargs = mock_get.call_args
+        self.assertEqual(kwargs["timeout"], http_client.DEFAULT_TIMEOUT)
+
+
+class TestCassette(unittest.TestCase):
+    """
+    Test recording responses and playing them back without a network.
+    """
+    
+    def setUp(self):
+        """Use an empty temporary cassette folder."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        cassette.configure(mode="off", directory=self.temp_dir.name, latency=0)
+        cassette.reset_cassette_stats()
+    
+    def tearDown(self):
+        """Switch cassettes off again."""
+        cassette.configure(mode="off", directory=cassette.DEFAULT_CASSETTE_DIR, latency=0)
+        http_client.close_session()
+        provider_health.reset_provider_health()
+        self.temp_dir.cleanup()
+    
+    def _fake_response(self, body, content_type="application/json"):
+        """Create a real Response object with the given body."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = content_type
+        response._content = body
+        return response
+    
+    @patch('requests.Session.get')
+    def test_record_then_replay(self, mock_get):
+        """Test that a recorded response is served back with no network call."""
+        mock_get.return_value = self._fake_response(b'{"temp": 21}')
+        params = {"q": "London", "appid": "secret-key"}
+        
+        cassette.configure(mode="record")
+        http_client.get("https://api.example.com/weather", params=params)
+        
+        cassette.configure(mode="replay")
+        mock_get.reset_mock()
+        response = http_client.get("https://api.example.com/weather", params=params)
+        
+        mock_get.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"temp": 21})
+    
+    @patch('requests.Session.get')
+    def test_binary_tiles_survive_round_trip(self, mock_get):
+        """Test that PNG tiles are saved and replayed byte for byte."""
+        png_bytes = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+        mock_get.return_value = self._fake_response(png_bytes, "image/png")
+        
+        cassette.configure(mode="record")
+        http_client.get("https://tile.openstreetmap.org/3/4/2.png")
+        cassette.configure(mode="replay")
+        
+        self.assertEqual(http_client.get("https://tile.openstreetmap.org/3/4/2.png").content, png_bytes)
+    
+    @patch('requests.Session.get')
+    def test_api_keys_not_saved(self, mock_get):
+        """Test that secret parameters never end up in cassette files."""
+        mock_get.return_value = self._fake_response(b'{}')
+        cassette.configure(mode="record")
+        http_client.get("https://api.example.com/weather", params={"q": "Paris", "appid": "secret-key"})
+        
+        for folder, _, files in os.walk(self.temp_dir.name):
+            for name in files:
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    self.assertNotIn("secret-key", f.read())
+
+    @patch('requests.Session.get')
+    def test_api_key_in_url_not_saved(self, mock_get):
+        """Test that a key written straight into the URL (like overlay tiles) isn't saved either."""
+        mock_get.return_value = self._fake_response(b"\x89PNG", "image/png")
+        url = "https://tile.example.com/map/clouds_new/3/4/2.png?appid=secret-key"
+        cassette.configure(mode="record")
+        http_client.get(url)
+
+        for folder, _, files in os.walk(self.temp_dir.name):
+            for name in files:
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    self.assertNotIn("secret-key", f.read())
+
+        # The cleaned recording is still found when replaying the same URL
+        cassette.configure(mode="replay")
+        self.assertEqual(http_client.get(url).content, b"\x89PNG")
+
+        # And a miss doesn't print the key either
+        with self.assertRaises(cassette.CassetteMissError) as caught:
+            http_client.get("https://tile.example.com/map/clouds_new/3/4/3.png?appid=secret-key")
+        self.assertNotIn("secret-key", str(caught.exception))
+
+    def test_missing_recording_acts_like_offline(self):
+        """Test that an unrecorded request raises a connection error."""
+        cassette.configure(mode="replay")
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get("https://api.example.com/never-recorded")
+        self.assertEqual(cassette.get_cassette_stats()["misses"], 1)
+    
+    @patch('requests.Session.get')
+    def test_replay_latency_injected(self, mock_get):
+        """Test that replay waits for the configured latency."""
+        mock_get.return_value = self._fake_response(b'{}')
+        cassette.configure(mode="record")
+        http_client.get("https://api.example.com/slow")
+        
+        cassette.configure(mode="replay", latency=0.1)
+        start = time.perf_counter()
+        http_client.get("https://api.example.com/slow")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+
+class TestProviderHealth(unittest.TestCase):
+    """
+    Test the circuit breaker and adaptive timeouts.
+    
+    When a weather service goes down we want searches to fail instantly
+    and use fallback data, not hang for the full timeout every time.
+    """
+    
+    def tearDown(self):
+        """Forget the health history so tests don't affect each other."""
+        provider_health.reset_provider_health()
+        http_client.close_session()
+    
+    @patch('requests.Session.get')
+    def test_breaker_opens_after_repeated_failures(self, mock_get):
+        """Test that a failing provider is skipped without a network call."""
+        mock_get.side_effect = requests.exceptions.Timeout("too slow")
+        
+        for _ in range(provider_health.FAILURE_THRESHOLD):
+            with self.assertRaises(requests.exceptions.Timeout):
+                http_client.get("https://down.example.com/data")
+        
+        mock_get.reset_mock()
+        with self.assertRaises(provider_health.CircuitOpenError):
+            http_client.get("https://down.example.com/data")
+        mock_get.assert_not_called()
+        
+        # Other providers are not affected
+        mock_get.side_effect = None
+        mock_get.return_value = Mock(status_code=200)
+        http_client.get("https://up.example.com/data")
+        mock_get.assert_called_once()
+    
+    @patch('requests.Session.get')
+    def test_breaker_recovers_after_cooldown(self, mock_get):
+        """Test that one successful trial request closes the breaker again."""
+        mock_get.return_value = Mock(status_code=503)
+        for _ in range(provider_health.FAILURE_THRESHOLD):
+            http_client.get("https://flaky.example.com/data")
+        
+        stats = provider_health.get_all_provider_stats()["flaky.example.com"]
+        self.assertEqual(stats["state"], provider_health.STATE_OPEN)
+        
+        mock_get.return_value = Mock(status_code=200)
+        with patch.object(provider_health, 'OPEN_COOLDOWN', 0):
+            http_client.get("https://flaky.example.com/data")
+        
+        stats = provider_health.get_all_provider_stats()["flaky.example.com"]
+        self.assertEqual(stats["state"], provider_health.STATE_CLOSED)
+    
+    def test_not_found_is_not_a_failure(self):
+        """Test that a 404 (unknown city) doesn't count against the provider."""
+        self.assertFalse(provider_health.is_failure_response(Mock(status_code=404)))
+        self.assertTrue(provider_health.is_failure_response(Mock(status_code=503)))
+    
+    def test_timeout_follows_p95_latency(self):
+        """Test that the timeout shrinks for a fast provider."""
+        health = provider_health.ProviderHealth("fast.example.com")
+        self.assertEqual(health.get_timeout((3.05, 10)), (3.05, 10))
+        
+        for _ in range(20):
+            health.record_success(0.2)
+        health.record_success(1.0)  # one slow outlier
+        
+        _, read_timeout = health.get_timeout((3.05, 10))
+        self.assertEqual(read_timeout, provider_health.MIN_READ_TIMEOUT)
+        
+        for _ in range(20):
+            health.record_success(2.5)
+        _, read_timeout = health.get_timeout((3.05, 10))
+        self.assertEqual(read_timeout, 7.5)
+    
+    @patch('api.http_client.get')
+    def test_weatherdb_down_uses_last_good_answer(self, mock_get):
+        """Test that a recent good answer is shown while WeatherDB is down."""
+        mock_get.return_value = Mock(status_code=200, json=lambda: {"main": {"temp": 18}})
+        api._request_weatherdb("Oslo", "en")
+        
+        mock_get.side_effect = provider_health.CircuitOpenError("down")
+        data, error = api._request_weatherdb("Oslo", "en")
+        self.assertIsNone(error)
+        self.assertEqual(data["main"]["temp"], 18)
+
+
+def make_png(color, size=(256, 256)):
+    """Create a small PNG image (used as a fake map tile)."""
+    from io import BytesIO
+    output = BytesIO()
+    Image.new("RGBA", size, color).save(output, format="PNG")
+    return output.getvalue()
+
+
+@unittest.skipUnless(TILE_SERVER_AVAILABLE, "Tile server needs Flask and Pillow")
+class TestTileCache(unittest.TestCase):
+    """
+    Test the memory + disk cache used by the map tile server.
+    """
+    
+    def setUp(self):
+        """Use a temporary folder for the disk level."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = TileCache(directory=self.temp_dir.name)
+    
+    def tearDown(self):
+        """Delete the temporary folder."""
+        self.temp_dir.cleanup()
+    
+    def test_tile_survives_memory_clear(self):
+        """Test that a tile comes back from disk after memory is emptied."""
+        self.cache.put("base", "osm", 5, 10, 12, b"tile-bytes")
+        self.cache.clear()
+        
+        self.assertEqual(self.cache.get("base", "osm", 5, 10, 12), b"tile-bytes")
+        self.assertEqual(self.cache.get_stats()["disk_hits"], 1)
+    
+    def test_overlay_expires_before_base(self):
+        """Test that overlay tiles use a shorter TTL than base tiles."""
+        cache = TileCache(directory=self.temp_dir.name, ttls={"overlay": 0})
+        cache.put("base", "osm", 1, 0, 0, b"base")
+        cache.put("overlay", "temp_new", 1, 0, 0, b"overlay")
+        
+        self.assertEqual(cache.get("base", "osm", 1, 0, 0), b"base")
+        self.assertIsNone(cache.get("overlay", "temp_new", 1, 0, 0))
+    
+    def test_memory_limit_evicts_oldest(self):
+        """Test that the least recently used tile leaves memory first."""
+        cache = TileCache(directory=self.temp_dir.name, memory_bytes=20, disk_bytes=0)
+        cache.put("base", "osm", 1, 0, 0, b"a" * 8)
+        cache.put("base", "osm", 1, 0, 1, b"b" * 8)
+        cache.get("base", "osm", 1, 0, 0)             # tile 0 is now the newest
+        cache.put("base", "osm", 1, 1, 0, b"c" * 8)   # pushes out tile 1
+        
+        self.assertIsNotNone(cache.get("base", "osm", 1, 0, 0))
+        self.assertIsNone(cache.get("base", "osm", 1, 0, 1))
+    
+    def test_disk_limit_evicts_files(self):
+        """Test that the disk level stays under its size limit."""
+        cache = TileCache(directory=self.temp_dir.name, disk_bytes=1000)
+        for x in range(10):
+            cache.put("base", "osm", 3, x, 0, b"x" * 200)
+        
+        self.assertLessEqual(cache._measure_disk(), 1000)
+        self.assertGreater(cache.get_stats()["disk_evictions"], 0)
+
+
+@unittest.skipUnless(TILE_SERVER_AVAILABLE, "Tile server needs Flask and Pillow")
+class TestTileServer(unittest.TestCase):
+    """
+    Test the local tile server that mixes map tiles with weather overlays.
+    """
+    
+    def setUp(self):
+        """Give the server an empty cache and fake upstream tiles."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_patch = patch.object(tile_server, 'tile_cache', TileCache(directory=self.temp_dir.name))
+        self.cache_patch.start()
+        tile_server.metrics.reset()
+        self.client = tile_server.app.test_client()
+        
+        self.base_png = make_png((200, 200, 200, 255))
+        self.overlay_png = make_png((255, 0, 0, 128))
+    
+    def tearDown(self):
+        """Put the real cache back."""
+        self.cache_patch.stop()
+        self.temp_dir.cleanup()
+    
+    def fake_upstream(self, url, **kwargs):
+        """Answer like OpenStreetMap / the overlay service would."""
+        body = self.base_png if "openstreetmap" in url else self.overlay_png
+        return Mock(status_code=200, content=body)
+    
+    def test_repeat_tile_served_from_cache(self):
+        """Test that panning back to a tile doesn't download it again."""
+        with patch.object(http_client, 'get', side_effect=self.fake_upstream) as mock_get:
+            first = self.client.get("/tiles/temp_new/5/10/12.png")
+            second = self.client.get("/tiles/temp_new/5/10/12.png")
+            other_layer = self.client.get("/tiles/wind_new/5/10/12.png")
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(other_layer.status_code, 200)
+        
+        # base + overlay for the first tile, then only the new overlay
+        self.assertEqual(mock_get.call_count, 3)
+    
+    def test_base_passed_through_without_overlay(self):
+        """Test that the base tile is sent unchanged when there is no overlay."""
+        def base_only(url, **kwargs):
+            if "openstreetmap" in url:
+                return Mock(status_code=200, content=self.base_png)
+            return Mock(status_code=404, content=b"")
+        
+        with patch.object(http_client, 'get', side_effect=base_only):
+            response = self.client.get("/tiles/temp_new/3/1/1.png")
+        
+        self.assertEqual(response.data, self.base_png)
+
+    def test_overlay_endpoint_sends_only_the_overlay(self):
+        """Test that overlay-only tiles never download the base map."""
+        from io import BytesIO
+
+        with patch.object(http_client, 'get', side_effect=self.fake_upstream) as mock_get:
+            first = self.client.get("/overlay/temp_new/5/10/12.png")
+            second = self.client.get("/overlay/temp_new/5/10/12.png")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data, second.data)
+
+        # One overlay download, no base tile, and the repeat came from the cache
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertNotIn("openstreetmap", mock_get.call_args[0][0])
+
+        # Still see-through, and toned down like composed tiles
+        overlay = Image.open(BytesIO(first.data))
+        self.assertEqual(overlay.mode, "RGBA")
+        red, _, _, alpha = overlay.getpixel((0, 0))
+        self.assertEqual(alpha, 128)
+        self.assertLess(red, 255)
+
+    def test_missing_overlay_is_transparent(self):
+        """Test that a missing overlay gives an empty tile, not an error."""
+        from io import BytesIO
+
+        with patch.object(http_client, 'get', return_value=Mock(status_code=404, content=b"")):
+            response = self.client.get("/overlay/temp_new/12/1/1.png")
+
+        self.assertEqual(response.status_code, 200)
+        overlay = Image.open(BytesIO(response.data))
+        self.assertEqual(overlay.getextrema()[3], (0, 0))
+
+    def test_stats_endpoint_reports_requests_cache_and_timings(self):
+        """Test that /stats shows where tile time goes."""
+        with patch.object(http_client, 'get', side_effect=self.fake_upstream):
+            first = self.client.get("/tiles/temp_new/5/10/12.png")
+            self.client.get("/tiles/temp_new/5/10/12.png")
+            self.client.get("/overlay/wind_new/5/10/12.png")
+        
+        stats = self.client.get("/stats").get_json()
+        
+        self.assertEqual(stats["requests"]["temp_new"]["serve_tile"], 2)
+        self.assertEqual(stats["requests"]["wind_new"]["serve_overlay"], 1)
+        self.assertEqual(stats["cache"]["temp_new"], {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+        self.assertEqual(stats["upstream"]["base"]["count"], 1)
+        self.assertEqual(stats["upstream"]["overlay"]["count"], 2)
+        self.assertEqual(stats["upstream"]["overlay"]["errors"], 0)
+        self.assertEqual(stats["stages"]["compose"]["count"], 2)
+        self.assertEqual(stats["stages"]["encode"]["count"], 2)
+        self.assertGreaterEqual(stats["bytes_served"], 2 * len(first.data))
+        self.assertEqual(stats["in_flight"], 1)  # The /stats request itself
+        self.assertIn("hit_ratio", stats["tile_cache"])
+    
+    def test_metrics_endpoint_uses_prometheus_format(self):
+        """Test that /metrics can be read by Prometheus."""
+        with patch.object(http_client, 'get', side_effect=requests.exceptions.ConnectionError("down")):
+            self.client.get("/tiles/temp_new/1/0/0.png")
+        
+        response = self.client.get("/metrics")
+        text = response.get_data(as_text=True)
+        
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn('tile_requests_total{endpoint="serve_tile",layer="temp_new"} 1', text)
+        self.assertIn('tile_responses_total{status="500"} 1', text)
+        self.assertIn('tile_upstream_errors_total{kind="base"} 1', text)
+        self.assertIn('tile_upstream_seconds_bucket{kind="base",le="+Inf"} 1', text)
+        self.assertIn("# TYPE tile_stage_seconds histogram", text)
+        self.assertIn('tile_store_bytes{level="memory"}', text)
+    
+    def test_tiles_around_covers_view_ring_and_zoom_levels(self):
+        """Test which tiles are picked for prefetching around a city."""
+        # London at zoom 6 in a 600x350 view: 3 tiles each way + 1 ring = 7 x 5
+        tiles = tile_server.tiles_around(51.5, -0.12, 6, 600, 350)
+
+        self.assertEqual(tiles[0], (6, 31, 21))  # Centre tile comes first
+        self.assertEqual(sum(1 for z, _, _ in tiles if z == 6), 7 * 5)
+        self.assertEqual({z for z, _, _ in tiles}, {5, 6, 7})
+        self.assertEqual(len(tiles), len(set(tiles)))
+
+        # Zoomed in comes before zoomed out
+        zooms = [z for z, _, _ in tiles]
+        self.assertLess(zooms.index(7), zooms.index(5))
+
+        # Never above the highest zoom, and x wraps around the date line
+        capped = tile_server.tiles_around(0, 179.9, 10, max_zoom=10)
+        self.assertEqual({z for z, _, _ in capped}, {9, 10})
+        self.assertIn((10, 0, 512), capped)
+
+    def test_prefetch_warms_overlay_cache(self):
+        """Test that prefetched tiles are served without going upstream."""
+        tiles = tile_server.tiles_around(51.5, -0.12, 6, 256, 256, ring=0, zoom_levels=0)
+
+        with patch.object(http_client, 'get', side_effect=self.fake_upstream) as mock_get:
+            queued = tile_server.prefetch_tiles("temp_new", tiles)
+            # Wait for the background workers to finish
+            tile_server._prefetch_executor.submit(lambda: None).result(timeout=5)
+            time.sleep(0.1)
+            downloads = mock_get.call_count
+
+            z, x, y = tiles[0]
+            response = self.client.get(f"/overlay/temp_new/{z}/{x}/{y}.png")
+
+        self.assertEqual(queued, len(tiles))
+        self.assertEqual(downloads, len(tiles))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, downloads)
+
+        # Nothing to prefetch without an overlay
+        self.assertEqual(tile_server.prefetch_tiles("none", tiles), 0)
+
+    def test_newer_prefetch_cancels_older(self):
+        """Test that searching another city drops the old city's queued tiles."""
+        started = []
+        with patch.object(tile_server, 'get_processed_overlay', side_effect=lambda *a: started.append(a)):
+            # Keep both workers busy so everything else stays queued
+            gate = threading.Event()
+            blockers = [tile_server._prefetch_executor.submit(gate.wait, 5)
+                        for _ in range(tile_server.PREFETCH_WORKERS)]
+            tile_server.prefetch_tiles("temp_new", [(3, 1, 1), (3, 1, 2)])
+            tile_server.prefetch_tiles("wind_new", [(4, 2, 2)])
+            gate.set()
+            for blocker in blockers:
+                blocker.result(timeout=5)
+            tile_server._prefetch_executor.submit(lambda: None).result(timeout=5)
+            time.sleep(0.1)
+
+        self.assertEqual(started, [("wind_new", 4, 2, 2)])
+
+    def test_frame_timestamps_are_whole_hours(self):
+        """Test that time-lapse frames line up on shared, cacheable times."""
+        frames = tile_server.frame_timestamps(count=3, step=3600, now=7200 + 1234)
+
+        self.assertEqual(frames, [0, 3600, 7200])
+        self.assertEqual(frames, tile_server.frame_timestamps(count=3, step=3600, now=7200 + 3599))
+
+    def test_prefetch_frames_caches_every_frame(self):
+        """Test that each frame is downloaded once, then played from the cache."""
+        frames = [3600, 7200]
+        tiles = [(3, 1, 1), (3, 1, 2)]
+
+        with patch.object(http_client, 'get', side_effect=self.fake_upstream) as mock_get:
+            job = tile_server.prefetch_frames("temp_new", frames, tiles)
+            self.assertTrue(job.wait(timeout=5))
+            downloads = [call[0][0] for call in mock_get.call_args_list]
+
+            response = self.client.get("/frames/overlay/temp_new/7200/3/1/2.png")
+            latest = self.client.get("/overlay/temp_new/3/1/2.png")
+
+        self.assertTrue(job.done())
+        self.assertEqual(job.progress(), (4, 4))
+        self.assertEqual(len(downloads), 4)
+        self.assertEqual(sum("&date=3600" in url for url in downloads), 2)
+        self.assertEqual(sum("&date=7200" in url for url in downloads), 2)
+
+        # The frame came from the cache; the latest weather is a different tile
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(latest.status_code, 200)
+        self.assertEqual(mock_get.call_count, 5)
+        self.assertNotIn("&date=", mock_get.call_args[0][0])
+
+    def test_lookup_table_matches_image_enhance(self):
+        """Test that the one-pass lookup table looks like the old two-pass version."""
+        from PIL import ImageChops, ImageEnhance
+        from io import BytesIO
+        
+        # A gradient overlay with varying transparency
+        overlay = Image.new("RGBA", (64, 64))
+        overlay.putdata([(x * 4, y * 4, (x + y) * 2, 60 + x) for y in range(64) for x in range(64)])
+        output = BytesIO()
+        overlay.save(output, format="PNG")
+        
+        expected = ImageEnhance.Contrast(ImageEnhance.Brightness(overlay).enhance(0.3)).enhance(0.8)
+        actual = tile_server.process_overlay(output.getvalue())
+        
+        # Largest difference in any channel of any pixel
+        extrema = ImageChops.difference(expected, actual).getextrema()
+        self.assertLessEqual(max(high for _, high in extrema), 2)
+
+
+class TestRegionPacks(unittest.TestCase):
+    """
+    Test downloading offline map tiles around saved cities.
+    """
+    
+    def setUp(self):
+        """Use a temporary tile database."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "tiles.db")
+    
+    def tearDown(self):
+        """Delete the temporary database."""
+        self.temp_dir.cleanup()
+    
+    def download(self, **kwargs):
+        """Download a small pack for London with fake tiles."""
+        with patch.object(region_packs, 'get_coordinates', return_value=(51.5, -0.12)):
+            return region_packs.download_region_packs(
+                ["London"], radius_km=5, max_zoom=8, db_path=self.db_path,
+                requests_per_second=0, **kwargs)
+    
+    def test_pack_downloaded_once(self):
+        """Test that a second run downloads nothing."""
+        expected = region_packs.tiles_in_box(region_packs.bounding_box(51.5, -0.12, 5), 0, 8)
+        
+        with patch.object(http_client, 'get', return_value=Mock(status_code=200, content=b"png")) as mock_get:
+            first = self.download()
+            second = self.download()
+        
+        self.assertEqual(first["downloaded"], len(expected))
+        self.assertEqual(second["downloaded"], 0)
+        self.assertEqual(second["skipped"], len(expected))
+        self.assertEqual(mock_get.call_count, len(expected))
+    
+    def test_tiles_readable_by_map_widget(self):
+        """Test that tiles are stored the way the map widget looks them up."""
+        import sqlite3
+        
+        with patch.object(http_client, 'get', return_value=Mock(status_code=200, content=b"png")):
+            self.download()
+        
+        connection = sqlite3.connect(self.db_path)
+        # Same query as LayeredMapView / TkinterMapView
+        row = connection.execute("SELECT t.tile_image FROM tiles t WHERE t.zoom=? AND t.x=? AND t.y=? AND t.server=?;",
+                                 (0, 0, 0, region_packs.OSM_TILE_SERVER)).fetchone()
+        sections = connection.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+        connection.close()
+        
+        self.assertEqual(row[0], b"png")
+        self.assertEqual(sections, 1)
+    
+    def test_interrupted_download_resumes(self):
+        """Test that failed tiles are retried and stored tiles are not."""
+        calls = []
+        
+        def flaky(url, **kwargs):
+            calls.append(url)
+            if len(calls) % 3 == 0:
+                raise requests.exceptions.ConnectionError("network dropped")
+            return Mock(status_code=200, content=b"png")
+        
+        with patch.object(http_client, 'get', side_effect=flaky):
+            first = self.download()
+        self.assertGreater(first["failed"], 0)
+        
+        with patch.object(http_client, 'get', return_value=Mock(status_code=200, content=b"png")) as mock_get:
+            second = self.download()
+        
+        self.assertEqual(second["downloaded"], first["failed"])
+        self.assertEqual(second["failed"], 0)
+        self.assertEqual(mock_get.call_count, first["failed"])
+    
+    def test_rate_limit_and_unknown_cities(self):
+        """Test the download speed limit and cities that can't be found."""
+        limiter = region_packs.RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        
+        with patch.object(region_packs, 'get_coordinates', return_value=(None, None)):
+            summary = region_packs.download_region_packs(["Atlantis"], db_path=self.db_path)
+        self.assertEqual(summary["unknown_cities"], ["Atlantis"])
+        self.assertEqual(summary["downloaded"], 0)
+
+
+@unittest.skipUnless(TILE_SERVER_AVAILABLE, "Tile server needs Flask, Pillow and NumPy")
+class TestLocalTemperatureOverlay(unittest.TestCase):
+    """
+    Test the temperature layer the tile server draws by itself.
+    """
+    
+    def setUp(self):
+        """Start every test without observations and with an empty tile cache."""
+        local_overlay.set_observations([])
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_patch = patch.object(tile_server, 'tile_cache', TileCache(directory=self.temp_dir.name))
+        self.cache_patch.start()
+        self.client = tile_server.app.test_client()
+    
+    def tearDown(self):
+        """Forget observations and put the real cache back."""
+        local_overlay.set_observations([])
+        self.cache_patch.stop()
+        self.temp_dir.cleanup()
+    
+    def test_idw_matches_stations_and_blends_between(self):
+        """Test the interpolation at and between two cities."""
+        lats = np.array([50.0])
+        lons = np.array([0.0, 1.0, 2.0])
+        temps, nearest = local_overlay.interpolate_temperatures(
+            lats, lons, np.array([50.0, 50.0]), np.array([0.0, 2.0]), np.array([10.0, 20.0]))
+        
+        self.assertAlmostEqual(temps[0, 0], 10.0, places=3)   # On the first city
+        self.assertAlmostEqual(temps[0, 1], 15.0, places=3)   # Halfway
+        self.assertAlmostEqual(temps[0, 2], 20.0, places=3)   # On the second city
+        self.assertAlmostEqual(nearest[0, 1], 71.6, delta=1)  # ~72 km to either city
+    
+    def test_render_tile(self):
+        """Test drawing a tile near and far from any city."""
+        from io import BytesIO
+        
+        self.assertIsNone(local_overlay.render_tile(6, 31, 21))
+        
+        local_overlay.set_observations([(51.5, -0.12, 12.0), (48.85, 2.35, 18.0)])
+        tile = Image.open(BytesIO(local_overlay.render_tile(6, 31, 21)))
+        
+        self.assertEqual(tile.size, (256, 256))
+        self.assertEqual(tile.mode, "RGBA")
+        self.assertGreater(tile.getextrema()[3][1], 0)
+        
+        # The other side of the world has no cities nearby
+        self.assertIsNone(local_overlay.render_tile(6, 0, 40))
+    
+    def test_data_version(self):
+        """Test that only new temperatures give a new data version."""
+        first = local_overlay.set_observations([(51.5, -0.12, 12.0)])
+        same = local_overlay.set_observations([(51.5, -0.12, 12.0)])
+        warmer = local_overlay.set_observations([(51.5, -0.12, 14.0)])
+        
+        self.assertEqual(first, same)
+        self.assertNotEqual(first, warmer)
+        self.assertEqual(local_overlay.get_data_version(), warmer)
+    
+    def test_update_uses_batch_weather(self):
+        """Test that temperatures come from one batch weather call."""
+        results = [("London", {"temperature": 12.0}), ("Paris", {"temperature": None, "error": "down"})]
+        with patch.object(local_overlay, 'get_current_weather_many', return_value=iter(results)) as mock_batch, \
+             patch.object(local_overlay, 'get_coordinates', return_value=(51.5, -0.12)):
+            version = local_overlay.update_observations(["London", "Paris"])
+        
+        mock_batch.assert_called_once()
+        self.assertTrue(version)
+        self.assertEqual(local_overlay.get_observation_info()["stations"], 1)
+    
+    def test_served_without_upstream_and_redrawn_on_new_data(self):
+        """Test that the tile server draws temp_local itself, per data version."""
+        local_overlay.set_observations([(51.5, -0.12, 0.0)])
+        with patch.object(http_client, 'get') as mock_get:
+            cold = self.client.get("/overlay/temp_local/6/31/21.png")
+            local_overlay.set_observations([(51.5, -0.12, 35.0)])
+            hot = self.client.get("/overlay/temp_local/6/31/21.png")
+        
+        mock_get.assert_not_called()
+        self.assertEqual(cold.status_code, 200)
+        self.assertNotEqual(cold.data, hot.data)
+
+    def test_local_layer_keeps_its_colours(self):
+        """Test that temp_local isn't darkened like the weather service's tiles."""
+        local_overlay.set_observations([(51.5, -0.12, 12.0), (48.85, 2.35, 18.0)])
+        drawn = local_overlay.render_tile(6, 31, 21)
+
+        with patch.object(tile_server, 'process_overlay') as darken:
+            served = tile_server.get_processed_overlay(local_overlay.LOCAL_TEMP_LAYER, 6, 31, 21)
+        darken.assert_not_called()
+        self.assertEqual(served, drawn)
+
+    def test_empty_tiles_are_cached(self):
+        """Test that a tile with no city nearby is only worked out once."""
+        local_overlay.set_observations([(51.5, -0.12, 12.0)])
+        with patch.object(local_overlay, 'render_tile', wraps=local_overlay.render_tile) as render:
+            first = tile_server.get_processed_overlay(local_overlay.LOCAL_TEMP_LAYER, 6, 0, 40)
+            second = tile_server.get_processed_overlay(local_overlay.LOCAL_TEMP_LAYER, 6, 0, 40)
+
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(render.call_count, 1)
+
+        # New temperatures are a new data version, so the tile is looked at again
+        local_overlay.set_observations([(51.5, -0.12, 14.0)])
+        with patch.object(local_overlay, 'render_tile', wraps=local_overlay.render_tile) as render:
+            tile_server.get_processed_overlay(local_overlay.LOCAL_TEMP_LAYER, 6, 0, 40)
+        self.assertEqual(render.call_count, 1)
+
+
+@unittest.skipUnless(TILE_SERVER_AVAILABLE, "Tile server needs Flask and Pillow")
+class TestTileServerLifecycle(unittest.TestCase):
+    """
+    Test starting and stopping the shared tile server.
+    """
+    
+    def tearDown(self):
+        """Never leave a server running after a test."""
+        tile_server.stop_tile_server()
+    
+    def test_started_once_and_ready(self):
+        """Test that opening the map again reuses the running server."""
+        with patch.object(tile_server, 'TILE_SERVER_PORT', 0):
+            first_url = tile_server.start_tile_server()
+            second_url = tile_server.start_tile_server()
+        
+        self.assertEqual(first_url, second_url)
+        self.assertEqual(tile_server.get_tile_server_url(), first_url)
+        self.assertTrue(tile_server.is_tile_server_ready())
+        self.assertEqual(sum(t.name == "tile-server" for t in threading.enumerate()), 1)
+    
+    def test_stop_releases_thread_and_port(self):
+        """Test that closing the app shuts the server down cleanly."""
+        url = tile_server.start_tile_server(port=0)
+        tile_server.stop_tile_server()
+        
+        self.assertIsNone(tile_server.get_tile_server_url())
+        self.assertFalse(tile_server.is_tile_server_ready())
+        self.assertFalse(any(t.name == "tile-server" for t in threading.enumerate()))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            requests.get(f"{url}/health", timeout=1)
+        
+        # Stopping twice is harmless
+        tile_server.stop_tile_server()
+    
+    def test_busy_port_falls_back_to_free_port(self):
+        """Test that a port used by something else doesn't stop the map."""
+        import socket
+        
+        blocker = socket.socket()
+        blocker.bind(("127.0.0.1", 0))
+        blocker.listen(1)
+        try:
+            busy_port = blocker.getsockname()[1]
+            url = tile_server.start_tile_server(port=busy_port)
+            self.assertNotEqual(url, f"http://127.0.0.1:{busy_port}")
+            self.assertTrue(tile_server.is_tile_server_ready())
+        finally:
+            blocker.close()
+
+
+@unittest.skipUnless(TILE_SERVER_AVAILABLE, "Tile server needs Flask and Pillow")
+class TestTileServerThroughput(unittest.TestCase):
+    """
+    Measure how fast a full map view loads through the real, threaded tile server.
+    
+    Two small local web servers stand in for OpenStreetMap and the overlay
+    service, each taking UPSTREAM_DELAY seconds per tile. Loading the
+    VIEWPORT_TILES tiles of one map view one by one, with base and overlay
+    fetched one after the other, would take about 20 x 2 x 0.05 = 2 seconds.
+    """
+    
+    UPSTREAM_DELAY = 0.05     # Seconds each stand-in upstream takes per tile
+    VIEWPORT_TILES = 20       # Tiles in a typical map view
+    CLIENT_THREADS = 8        # Tiles the map widget requests at once
+    TARGET_SECONDS = 1.0      # Throughput target for a cold 20-tile view
+    
+    def setUp(self):
+        """Start the stand-in upstreams and the tile server on free ports."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from werkzeug.serving import make_server
+        import logging
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No request log lines
+        
+        base_png = make_png((200, 200, 200, 255))
+        overlay_png = make_png((255, 0, 0, 128))
+        delay = self.UPSTREAM_DELAY
+        
+        def make_handler(body):
+            class StandInTileHandler(BaseHTTPRequestHandler):
+                protocol_version = "HTTP/1.1"  # Keep connections open like real servers
+                
+                def do_GET(self):
+                    time.sleep(delay)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, *args):
+                    pass  # Keep test output quiet
+            return StandInTileHandler
+        
+        self.servers = []
+        self.base_server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(base_png))
+        self.overlay_server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(overlay_png))
+        self.tile_server = make_server("127.0.0.1", 0, tile_server.app, threaded=True)
+        for server in (self.base_server, self.overlay_server, self.tile_server):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        
+        self.temp_dir = tempfile.TemporaryDirectory()
+        base_port = self.base_server.server_address[1]
+        overlay_port = self.overlay_server.server_address[1]
+        self.patches = [
+            patch.object(tile_server, 'tile_cache', TileCache(directory=self.temp_dir.name)),
+            patch.object(tile_server, 'OSM_BASE_TILE_URL', f"http://127.0.0.1:{base_port}/{{z}}/{{x}}/{{y}}.png"),
+            patch.object(tile_server, 'weatherdb_tile_url', f"http://127.0.0.1:{overlay_port}/map"),
+        ]
+        for p in self.patches:
+            p.start()
+        self.tile_url = f"http://127.0.0.1:{self.tile_server.server_port}/tiles/temp_new"
+    
+    def tearDown(self):
+        """Stop every server and undo the patches."""
+        for p in self.patches:
+            p.stop()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        http_client.close_session()
+        provider_health.reset_provider_health()
+        self.temp_dir.cleanup()
+    
+    def load_viewport(self):
+        """Request a 5 x 4 block of tiles the way the map widget does."""
+        from concurrent.futures import ThreadPoolExecutor
+        urls = [f"{self.tile_url}/6/{x}/{y}.png" for x in range(30, 35) for y in range(20, 24)]
+        self.assertEqual(len(urls), self.VIEWPORT_TILES)
+        
+        with requests.Session() as session, ThreadPoolExecutor(self.CLIENT_THREADS) as pool:
+            start = time.perf_counter()
+            statuses = list(pool.map(lambda url: session.get(url, timeout=10).status_code, urls))
+            elapsed = time.perf_counter() - start
+        
+        self.assertEqual(statuses, [200] * self.VIEWPORT_TILES)
+        return elapsed
+    
+    def test_cold_viewport_meets_target(self):
+        """Test that a 20-tile view with nothing cached loads within the target."""
+        elapsed = self.load_viewport()
+        self.assertLess(elapsed, self.TARGET_SECONDS,
+                        f"20-tile viewport took {elapsed:.2f}s (target {self.TARGET_SECONDS}s)")
+    
+    def test_warm_viewport_is_local(self):
+        """Test that loading the same view again is much faster than the upstream."""
+        self.load_viewport()
+        elapsed = self.load_viewport()
+        self.assertLess(elapsed, self.UPSTREAM_DELAY * self.VIEWPORT_TILES / 2)
+
+
 @unittest.skipUnless(LANGUAGE_AVAILABLE, "Language system not available")
 class TestLanguageSystem(unittest.TestCase):
     """
@@ -406,7 +1976,23 @@ def run_tests():
         TestTemperatureConversions,  # Test temperature conversion
         TestCityValidation,          # Test city validation (security)
         TestWeatherStorage,          # Test data storage
-        TestAPIFunctions             # Test API functions
+        TestHistoryIndex,            # Test the SQLite history index and background writer
+        TestHistorySnapshot,         # Test the in-memory history snapshot
+        TestDailyArchive,            # Test the NumPy daily weather archive
+        TestAPIFunctions,            # Test API functions
+        TestCurrentWeatherCache,     # Test stale-while-revalidate cache
+        TestGeocodingCache,          # Test shared geocoding cache
+        TestCitySnapshot,            # Test combined Open-Meteo request
+        TestSingleFlight,            # Test duplicate request merging
+        TestCassette,                # Test offline record/replay
+        TestProviderHealth,          # Test circuit breaker and timeouts
+        TestTileCache,               # Test map tile cache
+        TestTileServer,              # Test map tile server
+        TestRegionPacks,             # Test offline map tile downloads
+        TestLocalTemperatureOverlay, # Test the locally drawn temperature layer
+        TestTileServerLifecycle,     # Test tile server start/stop
+        TestTileServerThroughput,    # Test map view load time
+        TestHTTPClient               # Test shared connection pool
     ]
     
     # Add language tests only if the language system is available
@@ -8,19 +8,28 @@ Key functions:
 - Convert city names to map coordinates
 - Get current weather from multiple sources
 - Combine data from different APIs for complete weather picture
+- Fetch several cities at once with one shared Open-Meteo request
+- Show recently viewed cities instantly from a stale-while-revalidate cache
 - Handle errors gracefully when internet is slow or APIs are down
 - Support multiple languages for weather descriptions
 
 APIs used:
-- Open-Meteo: Free weather data
+- Open-Meteo: Free weather data (one combined "snapshot" request per city)
 - WeatherDB: Detailed current conditions
 - Geocoding: Convert city names to coordinates
 """
 
-import requests
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 from dotenv import load_dotenv
 
+from weather_dashboard.config import http_client, not_found_cache, weather_cache
+from weather_dashboard.config.geocoding import get_coordinates, normalize_city_name
+from weather_dashboard.config.city_snapshot import fetch_city_snapshot, fetch_city_snapshots, get_current_conditions
+from weather_dashboard.config.single_flight import coalesce
+
 # Load API keys and settings from .env file
 load_dotenv()
 
@@ -28,12 +37,39 @@ load_dotenv()
 API_KEY = os.getenv("weatherdb_api_key")
 BASE_URL = os.getenv("weatherdb_base_url")
 
+# CONCURRENCY SETTINGS
+
+# How long to wait (seconds) for the main WeatherDB answer
+PRIMARY_DEADLINE = 10
+
+# How long to wait (seconds, from the start of the search) for the extra
+# Open-Meteo details before showing what we already have
+SECONDARY_DEADLINE = 4
+
+# Shared worker threads so WeatherDB and Open-Meteo can be asked at the same time
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="weather-api")
+
+# Most WeatherDB requests a multi-city batch may have running at once
+WEATHERDB_BATCH_CONCURRENCY = 4
+
+# FALLBACK DATA
+
+# How old (seconds) the last good WeatherDB answer may be and still be shown
+# when WeatherDB is down or its circuit breaker is open
+LAST_GOOD_MAX_AGE = 1800  # 30 minutes
+
+# Last successful WeatherDB answer per request: {(city, language): (timestamp, data)}
+_last_good = {}
+_last_good_lock = threading.Lock()
+
 
 def get_lat_lon(city):
     """
     Convert a city name to map coordinates.
     
     This is needed because weather APIs use coordinates, not city names.
+    Lookups go through the shared geocoding cache, so a city is only
+    fetched from the internet the first time it is seen.
     
     Args:
         city (str): Name of the city
@@ -41,43 +77,7 @@ def get_lat_lon(city):
     Returns:
         tuple: (latitude, longitude) as numbers, or (None, None) if city not found        
     """
-    # Check if the input is valid
-    if not isinstance(city, str):
-        return None, None
-    
-    # Build the URL for the geocoding API
-    url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
-    
-    try:
-        # Make the HTTP request to the geocoding service
-        response = requests.get(url, timeout=10)  # Wait max 10 seconds
-        
-        # Check if the request was successful (HTTP 200 = OK)
-        if response.status_code != 200:
-            return None, None
-
-        # Convert the response from JSON format to a Python dictionary
-        data = response.json()
-        
-        # Get the search results from the response
-        results = data.get("results")
-        
-        # Check if we found any matching cities
-        if results and len(results) > 0:
-            # Get coordinates from the first result
-            lat = results[0].get("latitude")
-            lon = results[0].get("longitude")
-            
-            # Make sure both coordinates are valid numbers
-            if lat is not None and lon is not None:
-                return lat, lon
-        
-        # If we get here, no city was found
-        return None, None
-        
-    except Exception:
-        # If anything goes wrong return None values
-        return None, None
+    return get_coordinates(city)
 
 
 def resolve_coordinates_by_city(city_name):
@@ -92,24 +92,7 @@ def resolve_coordinates_by_city(city_name):
     Returns:
         tuple: (latitude, longitude) or (None, None) if not found
     """
-    # Build the geocoding API URL
-    url = f"https://geocoding-api.open-meteo.com/v1/search?name={city_name}"
-    
-    # Make the HTTP request
-    response = requests.get(url)
-    
-    # Parse the JSON response
-    data = response.json()
-    
-    # Check if we got valid results
-    if data.get("results"):
-        # Extract coordinates from the first result
-        lat = data["results"][0]["latitude"]
-        lon = data["results"][0]["longitude"]
-        return lat, lon
-    
-    # Return None values if no results found
-    return None, None
+    return get_coordinates(city_name)
 
 
 def get_basic_weather_from_weatherdb(city_name, language="en"):
@@ -128,6 +111,29 @@ def get_basic_weather_from_weatherdb(city_name, language="en"):
                If successful: (data, None)
                If failed: (None, error_message)
     """
+    # WeatherDB said this name doesn't exist a moment ago - don't ask again
+    if not_found_cache.is_not_found("weatherdb", city_name):
+        return None, f"City '{city_name}' not found."
+    
+    # Searches, comparisons and refreshes can ask for the same city at the
+    # same moment - share one request between them
+    request_key = {"q": str(city_name).strip().lower(), "lang": language}
+    return coalesce("weatherdb", request_key, _request_weatherdb, city_name, language)
+
+
+def _request_weatherdb(city_name, language):
+    """
+    Send the actual WeatherDB request (see get_basic_weather_from_weatherdb).
+    
+    Args:
+        city_name (str): Name of the city to get weather for
+        language (str): Language code for weather descriptions
+        
+    Returns:
+        tuple: (weather_data_dict, error_message)
+    """
+    fallback_key = (str(city_name).strip().lower(), language)
+    
     try:
         # Set up the parameters for the API request
         params = {
@@ -138,18 +144,29 @@ def get_basic_weather_from_weatherdb(city_name, language="en"):
         }
         
         # Make the HTTP request to WeatherDB API
-        response = requests.get(BASE_URL, params=params)
+        response = http_client.get(BASE_URL, params=params)
         
         # Check if the request was successful
         if response.status_code == 200:
-            # Success: Return the weather data and no error
-            return response.json(), None
+            # Success: Remember it in case WeatherDB goes down later
+            data = response.json()
+            with _last_good_lock:
+                _last_good[fallback_key] = (time.time(), data)
+            return data, None
         else:
-            # Failed: Return no data and an error message
+            # Failed: Return no data and an error message.
+            # A 404 means the city really doesn't exist, so remember that.
+            if response.status_code == 404:
+                not_found_cache.remember_not_found("weatherdb", city_name)
             return None, f"City '{city_name}' not found."
             
     except Exception as e:
-        # If anything goes wrong, return the error message
+        # WeatherDB is unreachable (or known to be down) - show the last
+        # good answer for this city if it is recent enough
+        with _last_good_lock:
+            cached = _last_good.get(fallback_key)
+        if cached and time.time() - cached[0] < LAST_GOOD_MAX_AGE:
+            return cached[1], None
         return None, str(e)
 
 
@@ -158,7 +175,8 @@ def get_detailed_environmental_data(city):
     Get detailed environmental data from Open-Meteo API.
     
     This API provides additional data like UV index, visibility,
-    and precipitation.
+    and precipitation. The data comes from the shared city snapshot, so
+    the history and sun/moon features reuse the same single request.
     
     Args:
         city (str): Name of the city
@@ -166,29 +184,7 @@ def get_detailed_environmental_data(city):
     Returns:
         dict: Detailed weather data, or None if request failed
     """
-    # First, convert city name to coordinates
-    lat, lon = get_lat_lon(city)
-    
-    # If we couldn't find the city, return None
-    if not lat or not lon:
-        return None
-    
-    # Build the Open-Meteo API URL with all the data we want
-    url = (
-        "https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}"
-        "&current=temperature_2m,relative_humidity_2m,wind_speed_10m,surface_pressure,visibility"
-        "&daily=uv_index_max,precipitation_sum"
-        "&timezone=auto"  # Use the local timezone for the city
-    )
-    
-    # Make the HTTP request
-    resp = requests.get(url)
-    
-    # Return the data if successful, None if failed
-    if resp.status_code == 200:
-        return resp.json()
-    return None
+    return get_current_conditions(fetch_city_snapshot(city))
 
 
 def get_current_weather(city, language="en"):
@@ -198,6 +194,10 @@ def get_current_weather(city, language="en"):
     This is the main function that other parts of the app use to get weather data.
     It combines data from multiple sources to provide the most complete picture.
     
+    WeatherDB and Open-Meteo are asked in parallel, so the wait is roughly the
+    slower of the two instead of both added together. If Open-Meteo misses its
+    deadline, the WeatherDB data is returned on its own with "partial" set.
+    
     Args:
         city (str): Name of the city to get weather for
         language (str): Language code for weather descriptions (en, es, hi)
@@ -206,13 +206,215 @@ def get_current_weather(city, language="en"):
         dict: Complete weather data with all available information
               Always returns a dict, even if some data is missing
     """
-    # Step 1: Get basic weather data from WeatherDB with language support
-    weather_data, err = get_basic_weather_from_weatherdb(city, language)
+    # Step 1: Ask WeatherDB and Open-Meteo at the same time.
+    # The Open-Meteo task geocodes through the shared cache first.
+    start_time = time.monotonic()
+    basic_future = _executor.submit(get_basic_weather_from_weatherdb, city, language)
+    detailed_future = _executor.submit(get_detailed_environmental_data, city)
     
-    # Step 2: Get detailed environmental data from Open-Meteo
-    detailed_data = get_detailed_environmental_data(city)
+    # Step 2: Wait for the main WeatherDB answer (we can't show anything without it)
+    try:
+        weather_data, err = basic_future.result(timeout=PRIMARY_DEADLINE)
+    except FuturesTimeoutError:
+        weather_data, err = None, "Request timeout"
+    except Exception as e:
+        weather_data, err = None, str(e)
     
     # Step 3: Handle the case where basic weather data failed
+    if not weather_data:
+        return _combine_weather_data(None, err, None, False)
+    
+    # Step 4: Give Open-Meteo whatever is left of its deadline.
+    # If it is still slow, return the WeatherDB data on its own.
+    detailed_data = None
+    partial = False
+    remaining = SECONDARY_DEADLINE - (time.monotonic() - start_time)
+    try:
+        detailed_data = detailed_future.result(timeout=max(0, remaining))
+    except FuturesTimeoutError:
+        partial = True
+    except Exception:
+        detailed_data = None
+    
+    # Step 5: Merge both answers into one dictionary
+    return _combine_weather_data(weather_data, err, detailed_data, partial)
+
+
+def get_current_weather_cached(city, language="en", on_refresh=None):
+    """
+    Get current weather, answering from the current-conditions cache when possible.
+    
+    - Fresh cached data is returned straight away
+    - Stale cached data is returned straight away AND refreshed in the
+      background; on_refresh(new_data) is called when the refresh finishes
+    - Missing or expired data is downloaded now (the caller waits)
+    
+    Args:
+        city (str): Name of the city to get weather for
+        language (str): Language code for weather descriptions (en, es, hi)
+        on_refresh (callable): Called from a background thread with the new
+                               data after a stale entry was refreshed (optional)
+        
+    Returns:
+        dict: Same as get_current_weather(), plus "cache_status" which is
+              "fresh", "stale" or "network" (downloaded just now)
+    """
+    # Step 1: Look in the cache
+    cached, state = weather_cache.lookup(city, language)
+    
+    if state == weather_cache.FRESH:
+        return dict(cached, cache_status=weather_cache.FRESH)
+    
+    # Step 2: Stale - show it now and refresh it in the background
+    if state == weather_cache.STALE:
+        if weather_cache.start_refresh(city, language):
+            # A plain thread, because get_current_weather() itself uses _executor
+            threading.Thread(
+                target=_refresh_cached_weather,
+                args=(city, language, on_refresh),
+                daemon=True
+            ).start()
+        return dict(cached, cache_status=weather_cache.STALE)
+    
+    # Step 3: Nothing usable - download it and wait
+    weather_data = get_current_weather(city, language)
+    weather_cache.store(city, language, weather_data, stale=weather_data.get("partial", False))
+    return dict(weather_data, cache_status="network")
+
+
+def _refresh_cached_weather(city, language, on_refresh):
+    """
+    Background task that replaces a stale cache entry with new data.
+    
+    Args:
+        city (str): City name
+        language (str): Language code
+        on_refresh (callable): Called with the new data if it downloaded fine
+    """
+    try:
+        weather_data = get_current_weather(city, language)
+        if weather_data.get("error"):
+            return
+        
+        weather_cache.store(city, language, weather_data, stale=weather_data.get("partial", False))
+        if on_refresh:
+            on_refresh(dict(weather_data, cache_status="network"))
+    except Exception:
+        pass
+    finally:
+        weather_cache.finish_refresh(city, language)
+
+
+def get_current_weather_many(cities, language="en"):
+    """
+    Get current weather for several cities at once.
+    
+    Instead of one full search per city, this sends:
+    - ONE Open-Meteo request with all the cities' coordinates
+    - WeatherDB requests in parallel, at most WEATHERDB_BATCH_CONCURRENCY at a time
+    
+    Results are handed back as soon as each city is ready, so the fastest
+    city can be shown without waiting for the slowest.
+    
+    Args:
+        cities (list): City names
+        language (str): Language code for weather descriptions (en, es, hi)
+        
+    Yields:
+        tuple: (city, weather_dict) in the order they finish. weather_dict
+               has the same shape as get_current_weather() returns.
+    """
+    cities = [city for city in cities if city]
+    if not cities:
+        return
+    
+    # Step 1: Start the WeatherDB requests, a limited number at a time
+    start_time = time.monotonic()
+    pool = ThreadPoolExecutor(
+        max_workers=min(WEATHERDB_BATCH_CONCURRENCY, len(cities)),
+        thread_name_prefix="weather-batch"
+    )
+    try:
+        basic_futures = {
+            pool.submit(get_basic_weather_from_weatherdb, city, language): city
+            for city in cities
+        }
+        
+        # Step 2: Geocode every city and send the single Open-Meteo request
+        details_future = _executor.submit(_get_detailed_environmental_data_many, cities)
+        
+        def details_for(city):
+            """Get one city's Open-Meteo details, waiting no longer than the deadline."""
+            remaining = SECONDARY_DEADLINE - (time.monotonic() - start_time)
+            try:
+                details = details_future.result(timeout=max(0, remaining))
+            except FuturesTimeoutError:
+                return None, True
+            except Exception:
+                return None, False
+            return details.get(normalize_city_name(city)), False
+        
+        # Step 3: Hand back each city as soon as its WeatherDB answer arrives
+        finished = set()
+        try:
+            for future in as_completed(basic_futures, timeout=PRIMARY_DEADLINE):
+                finished.add(future)
+                city = basic_futures[future]
+                try:
+                    weather_data, err = future.result()
+                except Exception as e:
+                    weather_data, err = None, str(e)
+                
+                if not weather_data:
+                    yield city, _combine_weather_data(None, err, None, False)
+                    continue
+                
+                detailed_data, partial = details_for(city)
+                result = _combine_weather_data(weather_data, err, detailed_data, partial)
+                weather_cache.store(city, language, result, stale=partial)
+                yield city, result
+        except FuturesTimeoutError:
+            # Step 4: Cities whose WeatherDB answer never came
+            for future, city in basic_futures.items():
+                if future not in finished:
+                    yield city, _combine_weather_data(None, "Request timeout", None, False)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_detailed_environmental_data_many(cities):
+    """
+    Get Open-Meteo details for several cities with one request.
+    
+    Args:
+        cities (list): City names
+        
+    Returns:
+        dict: {normalized_city_name: details dict or None}
+    """
+    # Look up any coordinates not cached yet in parallel, so the batch
+    # request below doesn't have to wait for them one by one
+    with ThreadPoolExecutor(max_workers=min(WEATHERDB_BATCH_CONCURRENCY, len(cities))) as geocode_pool:
+        list(geocode_pool.map(get_coordinates, cities))
+    
+    snapshots = fetch_city_snapshots(cities)
+    return {key: get_current_conditions(snapshot) for key, snapshot in snapshots.items()}
+
+
+def _combine_weather_data(weather_data, err, detailed_data, partial):
+    """
+    Merge a WeatherDB answer and Open-Meteo details into the app's weather dictionary.
+    
+    Args:
+        weather_data (dict): WeatherDB response, or None if it failed
+        err (str): Error message from WeatherDB (used when weather_data is None)
+        detailed_data (dict): Open-Meteo current conditions, or None
+        partial (bool): True if the Open-Meteo details were too slow
+        
+    Returns:
+        dict: Complete weather data with all available information
+    """
+    # Step 1: Handle the case where basic weather data failed
     if not weather_data:
         return {
             "temperature": None,
@@ -224,20 +426,20 @@ def get_current_weather(city, language="en"):
             "description": "No description"
         }
     
-    # Step 4: Extract data from the basic weather response
+    # Step 2: Extract data from the basic weather response
     main = weather_data.get("main", {})      # Temperature, humidity, pressure
     wind = weather_data.get("wind", {})      # Wind information
     weather_list = weather_data.get("weather", [{}])  # Weather conditions
     
-    # Step 5: Get weather icon and description
+    # Step 3: Get weather icon and description
     icon = weather_list[0].get("icon", "01d")  # Default to clear day icon
     description = weather_list[0].get("description", "No description").capitalize()
     
-    # Step 6: Initialize additional data with default values
+    # Step 4: Initialize additional data with default values
     uv_index = None
     precipitation = None
     
-    # Step 7: Extract additional data from Open-Meteo if available
+    # Step 5: Extract additional data from Open-Meteo if available
     if detailed_data:
         # Try to get UV index (maximum for today)
         uv_index_list = detailed_data.get("daily", {}).get("uv_index_max")
@@ -249,7 +451,7 @@ def get_current_weather(city, language="en"):
         if precipitation_list and isinstance(precipitation_list, list) and len(precipitation_list) > 0:
             precipitation = precipitation_list[0]
     
-    # Step 8: Return comprehensive weather data dictionary
+    # Step 6: Return comprehensive weather data dictionary
     return {
         "temperature": main.get("temp"),         # Temperature in Celsius
         "humidity": main.get("humidity"),        # Humidity percentage
@@ -260,5 +462,6 @@ def get_current_weather(city, language="en"):
         "uv_index": uv_index if uv_index is not None else "N/A",
         "precipitation": precipitation if precipitation is not None else "N/A",
         "error": None,                           # No error occurred
-        "description": description               # Human-readable weather description
-    }
\ No newline at end of file
+        "description": description,              # Human-readable weather description
+        "partial": partial                       # True if Open-Meteo details were too slow
+    }
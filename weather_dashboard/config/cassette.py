@@ -0,0 +1,365 @@
+"""
+Record/Replay Cassette Module
+=============================
+
+This module can save every response the app gets from the internet and
+play it back later, so the app (and its benchmarks) can run with no
+network at all.
+
+Every outbound request already goes through http_client.get(), so this
+is the single place where responses are recorded or replayed. That covers
+WeatherDB, Open-Meteo (forecast, archive, geocoding), Sunrise-Sunset,
+Nominatim and the OpenStreetMap / OpenWeatherMap map tiles.
+
+Modes:
+- "off"     Normal behaviour, nothing is saved (the default)
+- "record"  Make real requests and save each response to the cassette folder
+- "replay"  Never touch the network, answer from the cassette folder instead
+
+Each response is saved as one JSON file named after a hash of the request,
+grouped in a folder per host:
+    data/cassettes/api.open-meteo.com/3f2a....json
+
+API keys are removed from the saved request (both from params and from the
+URL itself), so cassettes can be shared.
+
+Choosing a mode:
+    Set these in the environment (or the .env file):
+        WEATHER_CASSETTE_MODE=replay
+        WEATHER_CASSETTE_DIR=data/cassettes
+        WEATHER_CASSETTE_LATENCY=0.2        # seconds, or "recorded"
+
+    Or from code (useful in tests and benchmarks):
+        from weather_dashboard.config import cassette
+        cassette.configure("replay", latency=0.05)
+
+Latency in replay mode is either a fixed number of seconds added to every
+response, or "recorded" to wait as long as the real request originally took.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+
+# Valid modes
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODES = (MODE_OFF, MODE_RECORD, MODE_REPLAY)
+
+# Default folder for cassette files
+DEFAULT_CASSETTE_DIR = "data/cassettes"
+
+# Special latency value meaning "wait as long as the original request took"
+RECORDED_LATENCY = "recorded"
+
+# Query parameters that hold secrets and must never be saved
+SECRET_PARAMS = ("appid", "apikey", "api_key", "key", "token")
+
+# Content types stored as readable text instead of base64
+TEXT_CONTENT_TYPES = ("application/json", "text/", "application/xml")
+
+# Current settings
+_settings = {
+    "mode": MODE_OFF,
+    "directory": DEFAULT_CASSETTE_DIR,
+    "latency": 0.0,
+}
+_settings_lock = threading.Lock()
+
+# Counters for record/replay activity
+_stats = {"recorded": 0, "replayed": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode when no recording exists for a request.
+
+    It is a ConnectionError so the app handles it exactly like being
+    offline and falls back the same way.
+    """
+
+
+def _parse_latency(value):
+    """
+    Turn a latency setting into a number of seconds or RECORDED_LATENCY.
+
+    Args:
+        value: Number, numeric string, "recorded" or None
+
+    Returns:
+        float or str: Seconds to wait, or RECORDED_LATENCY
+    """
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, str) and value.strip().lower() == RECORDED_LATENCY:
+        return RECORDED_LATENCY
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def configure(mode=None, directory=None, latency=None):
+    """
+    Change the cassette settings.
+
+    Args:
+        mode (str): "off", "record" or "replay" (unchanged if None)
+        directory (str): Folder for cassette files (unchanged if None)
+        latency (float or str): Replay delay in seconds or "recorded" (unchanged if None)
+    """
+    with _settings_lock:
+        if mode is not None:
+            mode = str(mode).strip().lower()
+            _settings["mode"] = mode if mode in MODES else MODE_OFF
+        if directory is not None:
+            _settings["directory"] = directory
+        if latency is not None:
+            _settings["latency"] = _parse_latency(latency)
+
+
+def configure_from_environment():
+    """Load the settings from WEATHER_CASSETTE_* environment variables."""
+    configure(
+        mode=os.getenv("WEATHER_CASSETTE_MODE", MODE_OFF),
+        directory=os.getenv("WEATHER_CASSETTE_DIR", DEFAULT_CASSETTE_DIR),
+        latency=os.getenv("WEATHER_CASSETTE_LATENCY", "0"),
+    )
+
+
+def get_mode():
+    """Get the current mode ("off", "record" or "replay")."""
+    with _settings_lock:
+        return _settings["mode"]
+
+
+def is_active():
+    """Check whether recording or replaying is switched on."""
+    return get_mode() != MODE_OFF
+
+
+# REQUEST KEYS
+
+def _clean_params(params):
+    """
+    Remove secret values and sort parameters so the key is stable.
+
+    Args:
+        params (dict): Query parameters (may be None)
+
+    Returns:
+        list: Sorted (name, value) pairs without secrets
+    """
+    if not params:
+        return []
+    return sorted(
+        (str(name), str(value))
+        for name, value in params.items()
+        if str(name).lower() not in SECRET_PARAMS and value is not None
+    )
+
+
+def _clean_url(url):
+    """
+    Remove secret values from the query string written into a URL.
+
+    Some requests (like the map overlay tiles) put the API key straight in
+    the address instead of in params, so it has to be removed here too.
+
+    Args:
+        url (str): Request address
+
+    Returns:
+        str: The address without secret query parameters
+    """
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name.lower() not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _request_key(url, params):
+    """
+    Build the text that identifies a request.
+
+    Args:
+        url (str): Request address
+        params (dict): Query parameters
+
+    Returns:
+        str: "url?sorted_params" with secrets removed
+    """
+    url = _clean_url(url)
+    query = urlencode(_clean_params(params))
+    return f"{url}?{query}" if query else url
+
+
+def _cassette_path(url, params):
+    """
+    Work out which file holds the recording for a request.
+
+    Args:
+        url (str): Request address
+        params (dict): Query parameters
+
+    Returns:
+        str: Path to the JSON cassette file
+    """
+    with _settings_lock:
+        directory = _settings["directory"]
+
+    host = urlsplit(url).netloc or "unknown"
+    digest = hashlib.sha1(_request_key(url, params).encode("utf-8")).hexdigest()
+    return os.path.join(directory, host.replace(":", "_"), f"{digest}.json")
+
+
+def _count(field):
+    """Add one to a record/replay counter."""
+    with _stats_lock:
+        _stats[field] += 1
+
+
+# RECORDING
+
+def _is_text(content_type):
+    """Check whether a response body can be stored as plain text."""
+    content_type = (content_type or "").lower()
+    return any(content_type.startswith(kind) for kind in TEXT_CONTENT_TYPES)
+
+
+def record(url, params, response, elapsed):
+    """
+    Save a real response to the cassette folder.
+
+    Failures are ignored - recording must never break the app.
+
+    Args:
+        url (str): Request address
+        params (dict): Query parameters
+        response (requests.Response): Response to save
+        elapsed (float): How long the request took in seconds
+    """
+    try:
+        content_type = response.headers.get("Content-Type", "")
+        content = response.content or b""
+
+        entry = {
+            "request": {"url": _clean_url(url), "params": dict(_clean_params(params))},
+            "status_code": response.status_code,
+            "headers": {"Content-Type": content_type},
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time(),
+        }
+        if _is_text(content_type):
+            entry["text"] = content.decode(response.encoding or "utf-8", errors="replace")
+        else:
+            entry["base64"] = base64.b64encode(content).decode("ascii")
+
+        path = _cassette_path(url, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so a half-written cassette is never read
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+        _count("recorded")
+    except Exception:
+        pass
+
+
+# REPLAYING
+
+def _build_response(url, entry):
+    """
+    Turn a saved cassette entry back into a requests.Response.
+
+    Args:
+        url (str): Request address
+        entry (dict): Loaded cassette data
+
+    Returns:
+        requests.Response: Response that behaves like the original
+    """
+    response = requests.Response()
+    response.status_code = entry.get("status_code", 200)
+    response.url = url
+    response.headers.update(entry.get("headers", {}))
+
+    if "base64" in entry:
+        response._content = base64.b64decode(entry["base64"])
+    else:
+        response._content = entry.get("text", "").encode("utf-8")
+        response.encoding = "utf-8"
+
+    return response
+
+
+def replay(url, params):
+    """
+    Answer a request from the cassette folder.
+
+    Args:
+        url (str): Request address
+        params (dict): Query parameters
+
+    Returns:
+        requests.Response: The recorded response
+
+    Raises:
+        CassetteMissError: If the request was never recorded
+    """
+    path = _cassette_path(url, params)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        raise CassetteMissError(f"No cassette recorded for {_request_key(url, params)}")
+
+    # Simulate network delay
+    with _settings_lock:
+        latency = _settings["latency"]
+    delay = entry.get("elapsed", 0.0) if latency == RECORDED_LATENCY else latency
+    if delay:
+        time.sleep(delay)
+
+    _count("replayed")
+    return _build_response(url, entry)
+
+
+def get_cassette_stats():
+    """
+    Get record/replay counters and current settings.
+
+    Returns:
+        dict: Counts of recorded, replayed and missing responses, plus settings
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    with _settings_lock:
+        stats.update(_settings)
+    return stats
+
+
+def reset_cassette_stats():
+    """Set the record/replay counters back to zero."""
+    with _stats_lock:
+        for field in _stats:
+            _stats[field] = 0
+
+
+# Pick up settings from the environment when the module is first imported
+configure_from_environment()
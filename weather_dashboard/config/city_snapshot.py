@@ -0,0 +1,419 @@
+"""
+City Snapshot Module
+====================
+
+This module gets almost everything the app needs to know about a city's
+weather from Open-Meteo in a single request.
+
+Before this existed, every search made three separate calls:
+- Open-Meteo forecast for current conditions, UV index and precipitation
+- Open-Meteo archive for the last 7 days of temperatures
+- Sunrise-Sunset API for sunrise and sunset times
+
+Open-Meteo's forecast endpoint can return all of that at once using
+"past_days", so we ask for one "snapshot" and hand the pieces out to the
+features that need them:
+- get_current_conditions()  -> main weather display (UV, precipitation, visibility)
+- get_past_days()           -> history tracker and tomorrow's prediction
+- get_today_sun_times()     -> sun and moon page
+
+Snapshots are cached for a short time and concurrent requests for the same
+city are merged, so a search costs one Open-Meteo call in total. If
+Open-Meteo is down, a recent older snapshot is used instead.
+
+Several cities can also be fetched together with fetch_city_snapshots(),
+which sends all their coordinates in one request (Open-Meteo accepts
+comma-separated latitude/longitude lists).
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from weather_dashboard.config import http_client
+from weather_dashboard.config.geocoding import get_coordinates, normalize_city_name
+from weather_dashboard.config.single_flight import coalesce
+
+
+# Open-Meteo forecast endpoint
+SNAPSHOT_URL = "https://api.open-meteo.com/v1/forecast"
+
+# How many past days of history to include
+PAST_DAYS = 7
+
+# Values for "right now"
+CURRENT_FIELDS = "temperature_2m,relative_humidity_2m,wind_speed_10m,surface_pressure,visibility"
+
+# Values for each day (past days plus today)
+DAILY_FIELDS = (
+    "temperature_2m_max,temperature_2m_min,temperature_2m_mean,"
+    "uv_index_max,precipitation_sum,sunrise,sunset,daylight_duration"
+)
+
+# How long to keep a snapshot (seconds)
+SNAPSHOT_CACHE_DURATION = 120  # 2 minutes
+
+# How old a snapshot may be and still be used when Open-Meteo is down
+SNAPSHOT_STALE_MAX_AGE = 3600  # 1 hour
+
+# Cache structure: {normalized_city: (timestamp_when_saved, snapshot)}
+_snapshot_cache = {}
+_snapshot_lock = threading.Lock()
+
+
+def fetch_city_snapshot(city):
+    """
+    Get the combined Open-Meteo snapshot for a city.
+
+    Args:
+        city (str): Name of the city
+
+    Returns:
+        dict: Raw Open-Meteo response with "current" and "daily" sections,
+              or None if the city or the data couldn't be found
+    """
+    key = normalize_city_name(city)
+    if not key:
+        return None
+
+    # Step 1: Use the cached snapshot if it is still fresh
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(key)
+    if cached and time.time() - cached[0] < SNAPSHOT_CACHE_DURATION:
+        return cached[1]
+
+    # Step 2: Download it (merged with any identical request already running)
+    return coalesce("snapshot", {"city": key}, _download_snapshot, city, key)
+
+
+def _snapshot_params(latitude, longitude):
+    """
+    Build the query parameters for a snapshot request.
+
+    Args:
+        latitude: One latitude, or several joined with commas
+        longitude: One longitude, or several joined with commas
+
+    Returns:
+        dict: Parameters for the Open-Meteo forecast endpoint
+    """
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "current": CURRENT_FIELDS,
+        "daily": DAILY_FIELDS,
+        "past_days": PAST_DAYS,
+        "forecast_days": 1,
+        "timezone": "auto",  # Use the local timezone for the city
+    }
+
+
+def _is_complete(snapshot):
+    """Check that a snapshot has the daily data we rely on."""
+    daily = snapshot.get("daily") if isinstance(snapshot, dict) else None
+    return bool(daily and daily.get("time"))
+
+
+def _download_snapshot(city, key):
+    """
+    Send the combined Open-Meteo request and cache the answer.
+
+    Args:
+        city (str): Name of the city
+        key (str): Normalized cache key
+
+    Returns:
+        dict: Raw snapshot, or None if the request failed
+    """
+    lat, lon = get_coordinates(city)
+    if lat is None or lon is None:
+        return _stale_snapshot(key)
+
+    try:
+        response = http_client.get(SNAPSHOT_URL, params=_snapshot_params(lat, lon))
+        if response.status_code != 200:
+            return _stale_snapshot(key)
+
+        snapshot = response.json()
+    except Exception:
+        # Includes the circuit breaker failing fast while Open-Meteo is down
+        return _stale_snapshot(key)
+
+    # Make sure the parts we rely on are really there
+    if not _is_complete(snapshot):
+        return _stale_snapshot(key)
+
+    with _snapshot_lock:
+        _snapshot_cache[key] = (time.time(), snapshot)
+
+    return snapshot
+
+
+def fetch_city_snapshots(cities):
+    """
+    Get snapshots for several cities with a single Open-Meteo request.
+
+    Cities that already have a fresh cached snapshot are not requested
+    again. The rest are sent together as comma-separated coordinates.
+
+    Args:
+        cities (list): City names
+
+    Returns:
+        dict: {normalized_city_name: snapshot or None}
+    """
+    results = {}
+    missing = {}  # {key: (lat, lon)}
+
+    # Step 1: Use cached snapshots where we can, geocode the rest
+    for city in cities:
+        key = normalize_city_name(city)
+        if not key or key in results or key in missing:
+            continue
+
+        with _snapshot_lock:
+            cached = _snapshot_cache.get(key)
+        if cached and time.time() - cached[0] < SNAPSHOT_CACHE_DURATION:
+            results[key] = cached[1]
+            continue
+
+        lat, lon = get_coordinates(city)
+        if lat is None or lon is None:
+            results[key] = _stale_snapshot(key)
+        else:
+            missing[key] = (lat, lon)
+
+    if not missing:
+        return results
+
+    # Step 2: One request for all remaining cities
+    keys = list(missing)
+    params = _snapshot_params(
+        ",".join(str(missing[key][0]) for key in keys),
+        ",".join(str(missing[key][1]) for key in keys),
+    )
+    request_key = {"cities": "|".join(keys)}
+    snapshots = coalesce("snapshot_batch", request_key, _download_snapshot_batch, params, len(keys))
+
+    # Step 3: Cache and return each city's part of the answer
+    for key, snapshot in zip(keys, snapshots):
+        if _is_complete(snapshot):
+            with _snapshot_lock:
+                _snapshot_cache[key] = (time.time(), snapshot)
+            results[key] = snapshot
+        else:
+            results[key] = _stale_snapshot(key)
+
+    return results
+
+
+def _download_snapshot_batch(params, count):
+    """
+    Send a multi-city snapshot request.
+
+    Args:
+        params (dict): Request parameters with comma-separated coordinates
+        count (int): How many cities were requested
+
+    Returns:
+        list: One snapshot (or None) per city, in request order
+    """
+    try:
+        response = http_client.get(SNAPSHOT_URL, params=params)
+        if response.status_code != 200:
+            return [None] * count
+
+        data = response.json()
+    except Exception:
+        return [None] * count
+
+    # Open-Meteo returns a list for several locations and a plain object for one
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or len(data) != count:
+        return [None] * count
+
+    return data
+
+
+def _stale_snapshot(key):
+    """
+    Get an expired snapshot to use while Open-Meteo can't be reached.
+
+    Args:
+        key (str): Normalized cache key
+
+    Returns:
+        dict: Snapshot up to SNAPSHOT_STALE_MAX_AGE old, or None
+    """
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(key)
+    if cached and time.time() - cached[0] < SNAPSHOT_STALE_MAX_AGE:
+        return cached[1]
+    return None
+
+
+def clear_snapshot_cache():
+    """Forget all cached snapshots."""
+    with _snapshot_lock:
+        _snapshot_cache.clear()
+
+
+# HELPERS FOR FEATURES
+
+def _today_index(snapshot):
+    """
+    Find which position in the daily lists is "today" for the city.
+
+    Args:
+        snapshot (dict): Raw snapshot
+
+    Returns:
+        int: Index into the daily lists
+    """
+    dates = snapshot.get("daily", {}).get("time", [])
+    current_time = snapshot.get("current", {}).get("time") or ""
+
+    # Open-Meteo gives local time like "2025-06-24T17:45"
+    today = current_time[:10]
+    if today in dates:
+        return dates.index(today)
+
+    # Fall back to "the day after the past days"
+    return min(PAST_DAYS, len(dates) - 1)
+
+
+def get_current_conditions(snapshot):
+    """
+    Get the current-conditions part of a snapshot.
+
+    The result has the same shape the old separate forecast call returned,
+    with today's values first in each daily list.
+
+    Args:
+        snapshot (dict): Raw snapshot
+
+    Returns:
+        dict: {"current": {...}, "daily": {"uv_index_max": [...], "precipitation_sum": [...]}}
+              or None if there is no snapshot
+    """
+    if not snapshot:
+        return None
+
+    daily = snapshot.get("daily", {})
+    today = _today_index(snapshot)
+
+    def today_value(field):
+        values = daily.get(field) or []
+        return [values[today]] if today < len(values) else []
+
+    return {
+        "current": snapshot.get("current", {}),
+        "daily": {
+            "time": today_value("time"),
+            "uv_index_max": today_value("uv_index_max"),
+            "precipitation_sum": today_value("precipitation_sum"),
+        }
+    }
+
+
+def get_past_days(snapshot, days=PAST_DAYS):
+    """
+    Get the daily temperature history (the days before today).
+
+    Args:
+        snapshot (dict): Raw snapshot
+        days (int): How many past days to return
+
+    Returns:
+        dict: Lists for time, temperature_2m_max, temperature_2m_min and
+              temperature_2m_mean, or empty dict if the data is incomplete
+    """
+    if not snapshot:
+        return {}
+
+    daily = snapshot.get("daily", {})
+    today = _today_index(snapshot)
+    start = max(0, today - days)
+
+    history = {}
+    for field in ("time", "temperature_2m_max", "temperature_2m_min", "temperature_2m_mean"):
+        values = daily.get(field)
+        if not values or len(values) < today:
+            return {}
+        history[field] = values[start:today]
+
+    # Every list must be non-empty and the same length
+    lengths = {len(values) for values in history.values()}
+    if len(lengths) != 1 or 0 in lengths:
+        return {}
+
+    return history
+
+
+def _local_to_utc_iso(local_time, utc_offset_seconds):
+    """
+    Convert Open-Meteo local time ("2025-06-24T04:43") to UTC ISO format.
+
+    The sun/moon code expects UTC times like the Sunrise-Sunset API gives.
+
+    Args:
+        local_time (str): Local time without timezone
+        utc_offset_seconds (int): City's offset from UTC
+
+    Returns:
+        str: Time like "2025-06-24T03:43:00+00:00", or None if invalid
+    """
+    try:
+        local_dt = datetime.fromisoformat(local_time)
+        utc_dt = (local_dt - timedelta(seconds=utc_offset_seconds)).replace(tzinfo=timezone.utc)
+        return utc_dt.isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def get_today_sun_times(snapshot):
+    """
+    Get today's sunrise, sunset, solar noon and day length.
+
+    Args:
+        snapshot (dict): Raw snapshot
+
+    Returns:
+        dict: sunrise, sunset and solar_noon as UTC ISO strings and
+              day_length in seconds, or None if not available
+    """
+    if not snapshot:
+        return None
+
+    daily = snapshot.get("daily", {})
+    today = _today_index(snapshot)
+    offset = snapshot.get("utc_offset_seconds", 0) or 0
+
+    sunrises = daily.get("sunrise") or []
+    sunsets = daily.get("sunset") or []
+    if today >= len(sunrises) or today >= len(sunsets):
+        return None
+
+    sunrise = _local_to_utc_iso(sunrises[today], offset)
+    sunset = _local_to_utc_iso(sunsets[today], offset)
+    if not sunrise or not sunset:
+        return None
+
+    # Solar noon is halfway between sunrise and sunset
+    sunrise_dt = datetime.fromisoformat(sunrise)
+    sunset_dt = datetime.fromisoformat(sunset)
+    solar_noon = (sunrise_dt + (sunset_dt - sunrise_dt) / 2).isoformat()
+
+    durations = daily.get("daylight_duration") or []
+    if today < len(durations) and durations[today] is not None:
+        day_length = int(durations[today])
+    else:
+        day_length = int((sunset_dt - sunrise_dt).total_seconds())
+
+    return {
+        "sunrise": sunrise,
+        "sunset": sunset,
+        "solar_noon": solar_noon,
+        "day_length": day_length,
+    }
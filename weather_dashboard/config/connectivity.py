@@ -0,0 +1,128 @@
+"""
+Connectivity Monitor Module
+===========================
+
+This module keeps track of whether the computer is online, without
+slowing down every request to find out.
+
+Before this existed, the app opened a test connection to 8.8.8.8 before
+every weather request, adding up to 3 seconds to each search. Now a
+background thread checks every CHECK_INTERVAL seconds and everyone else
+just reads the last answer.
+
+Key features:
+- is_online() returns instantly using the remembered state
+- A background thread re-checks the connection on a timer
+- Any successful HTTP response also counts as proof we are online
+- The app starts "optimistic" (assumes online) until the first check finishes
+"""
+
+import socket
+import threading
+import time
+
+
+# Address used for the connection test (Google public DNS)
+PROBE_HOST = "8.8.8.8"
+PROBE_PORT = 53
+
+# How long to wait for the test connection (seconds)
+PROBE_TIMEOUT = 3
+
+# How often the background thread re-checks (seconds)
+CHECK_INTERVAL = 30
+
+# Current state
+_state = {
+    "online": True,        # Optimistic until the first check says otherwise
+    "checked_at": None,    # When the state was last updated
+}
+_state_lock = threading.Lock()
+
+# Background thread control
+_monitor_thread = None
+_stop_event = threading.Event()
+_monitor_lock = threading.Lock()
+
+
+def probe_connection():
+    """
+    Test the connection right now (slow - up to PROBE_TIMEOUT seconds).
+
+    Returns:
+        bool: True if a connection could be opened
+    """
+    try:
+        connection = socket.create_connection((PROBE_HOST, PROBE_PORT), timeout=PROBE_TIMEOUT)
+        connection.close()
+        return True
+    except OSError:
+        return False
+
+
+def _set_online(online):
+    """Update the remembered state."""
+    with _state_lock:
+        _state["online"] = online
+        _state["checked_at"] = time.time()
+
+
+def mark_online():
+    """Record that a request just succeeded, so we must be online."""
+    _set_online(True)
+
+
+def _monitor_loop():
+    """Background thread: re-check the connection until asked to stop."""
+    while not _stop_event.is_set():
+        _set_online(probe_connection())
+        _stop_event.wait(CHECK_INTERVAL)
+
+
+def start_monitor():
+    """Start the background checking thread if it isn't running yet."""
+    global _monitor_thread
+
+    with _monitor_lock:
+        if _monitor_thread is not None and _monitor_thread.is_alive():
+            return
+        _stop_event.clear()
+        _monitor_thread = threading.Thread(target=_monitor_loop, name="connectivity-monitor", daemon=True)
+        _monitor_thread.start()
+
+
+def stop_monitor():
+    """Stop the background checking thread (called when the app closes)."""
+    global _monitor_thread
+
+    with _monitor_lock:
+        _stop_event.set()
+        _monitor_thread = None
+
+
+def is_online():
+    """
+    Check whether we are online, using the remembered state.
+
+    Starts the background monitor on first use.
+
+    Returns:
+        bool: True if the last check (or request) succeeded
+    """
+    start_monitor()
+    with _state_lock:
+        return _state["online"]
+
+
+def get_connectivity_info():
+    """
+    Get the remembered connection state.
+
+    Returns:
+        dict: online flag, when it was last checked and whether the monitor runs
+    """
+    with _state_lock:
+        info = dict(_state)
+    with _monitor_lock:
+        info["monitor_running"] = _monitor_thread is not None and _monitor_thread.is_alive()
+    return info
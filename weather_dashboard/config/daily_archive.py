@@ -0,0 +1,451 @@
+"""
+Daily Weather Archive Module
+============================
+
+This module loads the full-year daily weather exports in data/ (like
+data/combined.csv and data/city.csv, downloaded from Open-Meteo) as NumPy
+columns, so a city's whole year can be looked up without reading CSV text.
+
+How it works:
+1. The first time a file is used, it is parsed once: every column becomes
+   one NumPy array (numbers, dates or times), and rows are grouped by city
+2. The arrays are saved next to the CSV as .npy files
+   (data/combined.csv -> data/combined_columns/)
+3. Later loads open those .npy files memory-mapped: nothing is parsed, and
+   only the parts actually used are read from disk
+4. If the CSV changes (different size or modification time), the .npy
+   files are built again
+
+Key features:
+- One array per column, with short names ("temperature_2m_max") and the
+  units from the CSV header kept separately ("°F")
+- Dates as datetime64[D], sunrise/sunset as datetime64[m], missing values as NaN
+- Rows exported in Open-Meteo's other column orders are put back in line
+- City -> row range index, so a city's year is a slice (no copying)
+- Date range lookups with a binary search
+- Loaded archives are shared by the whole app (thread-safe)
+
+Example:
+    from weather_dashboard.config.daily_archive import load_daily_archive
+
+    archive = load_daily_archive("data/combined.csv")
+    phoenix = archive.city("Phoenix")
+    hot_days = (phoenix["temperature_2m_max"] > 104).sum()
+"""
+
+import csv
+import json
+import os
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    # Without NumPy there is no archive (callers get None)
+    NUMPY_AVAILABLE = False
+
+
+# Archive used when no file is given
+DEFAULT_ARCHIVE = "data/combined.csv"
+
+# Bump when the saved format changes - older .npy files are then rebuilt
+FORMAT_VERSION = 1
+
+# Name of the file describing the saved columns (written last, so a
+# half-written cache is never used)
+META_FILE = "meta.json"
+
+# Other column orders found in Open-Meteo exports. data/combined.csv was
+# glued together from downloads made with different settings, so its
+# Lebrija, Columbus, Phoenix and Denver rows each use one of these. Every row
+# is checked and put back in the header's order.
+ALTERNATE_LAYOUTS = [
+    ["city", "time", "temperature_2m_mean", "temperature_2m_max", "temperature_2m_min",
+     "wind_speed_10m_max", "weather_code", "sunrise", "sunset", "sunshine_duration",
+     "rain_sum", "snowfall_sum", "cloud_cover_mean", "visibility_mean",
+     "relative_humidity_2m_mean", "surface_pressure_mean", "precipitation_probability_mean"],
+    ["city", "time", "weather_code", "temperature_2m_max", "temperature_2m_min",
+     "sunset", "sunrise", "temperature_2m_mean", "rain_sum", "snowfall_sum",
+     "sunshine_duration", "wind_speed_10m_max", "visibility_mean", "surface_pressure_mean",
+     "relative_humidity_2m_mean", "cloud_cover_mean", "precipitation_probability_mean"],
+    ["city", "time", "temperature_2m_max", "temperature_2m_min", "weather_code",
+     "temperature_2m_mean", "sunrise", "sunset", "rain_sum", "snowfall_sum",
+     "wind_speed_10m_max", "sunshine_duration", "visibility_mean", "surface_pressure_mean",
+     "relative_humidity_2m_mean", "cloud_cover_mean", "precipitation_probability_mean"],
+    ["city", "time", "weather_code", "temperature_2m_mean", "temperature_2m_max",
+     "temperature_2m_min", "sunrise", "sunset", "rain_sum", "snowfall_sum",
+     "wind_speed_10m_max", "sunshine_duration", "visibility_mean", "surface_pressure_mean",
+     "relative_humidity_2m_mean", "cloud_cover_mean", "precipitation_probability_mean"],
+]
+
+# Loaded archives: {absolute CSV path: DailyArchive}
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def cache_dir(csv_path):
+    """Get the folder holding the .npy files for an archive CSV."""
+    return os.path.splitext(csv_path)[0] + "_columns"
+
+
+def _split_header(title):
+    """
+    Split a CSV header like "temperature_2m_max (°F)" into name and unit.
+
+    Returns:
+        tuple: (name, unit) - unit is "" if there is none
+    """
+    name, _, unit = title.partition(" (")
+    return name.strip(), unit.rstrip(")").strip()
+
+
+def _to_array(name, unit, values):
+    """
+    Turn one column of CSV text into the right kind of NumPy array.
+
+    Args:
+        name (str): Short column name
+        unit (str): Unit from the header
+        values (list): Text of every row
+
+    Returns:
+        numpy.ndarray: Dates, times or numbers (NaN / NaT where empty)
+    """
+    text = np.array(values, dtype=str)
+    if name == "time":
+        return text.astype("datetime64[D]")
+    if unit == "iso8601":
+        return text.astype("datetime64[m]")
+
+    # Empty cells become NaN, so they are skipped by nanmean() and friends.
+    # (Replaced before making the array: a column of only empty cells would
+    # otherwise hold 1-character strings, and "nan" would be cut to "n".)
+    return np.array([value or "nan" for value in values], dtype=str).astype(np.float64)
+
+
+def _parse_csv(csv_path):
+    """
+    Read an archive CSV into columns, with rows grouped by city and sorted by date.
+
+    Returns:
+        tuple: (columns dict, units dict, list of city names)
+    """
+    with open(csv_path, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        rows = [row for row in reader if row]
+
+    names_and_units = [_split_header(title) for title in header]
+    names = [name for name, _ in names_and_units]
+    city_position = names.index("city")
+
+    # Put rows written in another column order back in the header's order
+    layouts = [layout for layout in ALTERNATE_LAYOUTS if layout != names and sorted(layout) == sorted(names)]
+    if layouts:
+        units = dict(names_and_units)
+        rows = [_reorder_row(row, names, layouts, units) for row in rows]
+
+    # Number the cities in the order they first appear
+    city_names = []
+    city_numbers = {}
+    for row in rows:
+        if row[city_position] not in city_numbers:
+            city_numbers[row[city_position]] = len(city_names)
+            city_names.append(row[city_position])
+
+    columns = {}
+    units = {}
+    for position, (name, unit) in enumerate(names_and_units):
+        values = [row[position] if position < len(row) else "" for row in rows]
+        if name == "city":
+            columns["city_id"] = np.array([city_numbers[value] for value in values], dtype=np.int32)
+        else:
+            columns[name] = _to_array(name, unit, values)
+            units[name] = unit
+
+    # Group rows by city (keeping each city's days in date order)
+    if "time" in columns:
+        order = np.lexsort((columns["time"], columns["city_id"]))
+    else:
+        order = np.argsort(columns["city_id"], kind="stable")
+    columns = {name: values[order] for name, values in columns.items()}
+    return columns, units, city_names
+
+
+def _number(text):
+    """Get a CSV value as a number (None if it is empty or not a number)."""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _looks_right(values, units):
+    """
+    Check that a row's values make sense for the columns they are in.
+
+    A row read with the wrong column order almost always breaks one of
+    these: times where numbers should be, a weather code like 64.6, or a
+    minimum temperature above the maximum.
+
+    Args:
+        values (dict): {column name: text}
+        units (dict): {column name: unit from the header}
+
+    Returns:
+        bool: True if nothing looks out of place
+    """
+    numbers = {}
+    for name, text in values.items():
+        if name in ("city", "time") or text == "":
+            continue
+        if units.get(name) == "iso8601":
+            if "T" not in text:
+                return False
+            continue
+        number = _number(text)
+        if number is None:
+            return False
+        if units.get(name) == "%" and not 0 <= number <= 100:
+            return False
+        numbers[name] = number
+
+    code = numbers.get("weather_code")
+    if code is not None and (code != int(code) or not 0 <= code <= 99):
+        return False
+
+    # Daily temperatures: minimum <= mean <= maximum
+    temperatures = [numbers.get(name) for name in
+                    ("temperature_2m_min", "temperature_2m_mean", "temperature_2m_max")]
+    temperatures = [value for value in temperatures if value is not None]
+    return temperatures == sorted(temperatures)
+
+
+def _reorder_row(row, names, layouts, units):
+    """
+    Put a row in the header's column order.
+
+    Rows that make sense in the header's order are returned unchanged.
+    Otherwise the first alternate layout they make sense in is used, and
+    if there is none the row is left as it is.
+
+    Returns:
+        list: The row's values in header order
+    """
+    if _looks_right(dict(zip(names, row)), units):
+        return row
+    for layout in layouts:
+        if len(row) == len(layout):
+            values = dict(zip(layout, row))
+            if _looks_right(values, units):
+                return [values[name] for name in names]
+    return row
+
+
+def _city_ranges(city_ids, city_count):
+    """
+    Find where each city's rows start and stop.
+
+    Returns:
+        list: [start, stop] for each city number
+    """
+    starts = np.searchsorted(city_ids, np.arange(city_count), side="left")
+    stops = np.searchsorted(city_ids, np.arange(city_count), side="right")
+    return [[int(start), int(stop)] for start, stop in zip(starts, stops)]
+
+
+def _source_info(csv_path):
+    """Get what identifies one version of a CSV file (size and modification time)."""
+    info = os.stat(csv_path)
+    return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def _save_columns(folder, columns, meta):
+    """Save every column as a .npy file, then the description of them."""
+    os.makedirs(folder, exist_ok=True)
+
+    # Remove the old description first: if we stop half way, the cache is rebuilt
+    meta_path = os.path.join(folder, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    for name, values in columns.items():
+        np.save(os.path.join(folder, f"{name}.npy"), values, allow_pickle=False)
+
+    temp_path = meta_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as metafile:
+        json.dump(meta, metafile, ensure_ascii=False)
+    os.replace(temp_path, meta_path)
+
+
+def _load_saved_columns(folder, source):
+    """
+    Open the saved .npy files memory-mapped, if they match the CSV.
+
+    Returns:
+        tuple: (columns dict, meta dict), or None if they're missing or out of date
+    """
+    try:
+        with open(os.path.join(folder, META_FILE), "r", encoding="utf-8") as metafile:
+            meta = json.load(metafile)
+        if meta.get("version") != FORMAT_VERSION or meta.get("source") != source:
+            return None
+        columns = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                   for name in meta["columns"]}
+        return columns, meta
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class DailyArchive:
+    """A year (or more) of daily weather for several cities, stored as NumPy columns."""
+
+    def __init__(self, columns, units, city_names, city_ranges, source):
+        self.columns = columns            # {column name: array with one value per row}
+        self.units = units                # {column name: unit text from the CSV header}
+        self.city_names = city_names      # City names in row order
+        self.source = source              # Size and modification time of the CSV
+        self._ranges = {name.casefold(): (start, stop) for name, (start, stop) in zip(city_names, city_ranges)}
+
+    def __len__(self):
+        return len(self.columns["city_id"])
+
+    def cities(self):
+        """Get the names of every city in the archive."""
+        return list(self.city_names)
+
+    def column_names(self):
+        """Get the names of the weather columns (like "temperature_2m_max")."""
+        return [name for name in self.columns if name != "city_id"]
+
+    def rows_for(self, city):
+        """
+        Get the row range of a city.
+
+        Args:
+            city (str): City name (any capitalization)
+
+        Returns:
+            slice: The city's rows, or None if the city isn't in the archive
+        """
+        if not isinstance(city, str):
+            return None
+        span = self._ranges.get(city.strip().casefold())
+        return slice(*span) if span else None
+
+    def city(self, city, start=None, end=None):
+        """
+        Get every column for one city, optionally between two dates.
+
+        The arrays are views into the archive - don't modify them.
+
+        Args:
+            city (str): City name (any capitalization)
+            start (str): First date to include, like "2024-06-01" (default: first day)
+            end (str): Last date to include (default: last day)
+
+        Returns:
+            dict: {column name: array}, or None if the city isn't in the archive
+        """
+        rows = self.rows_for(city)
+        if rows is None:
+            return None
+
+        if (start is not None or end is not None) and "time" in self.columns:
+            # The city's dates are sorted, so a binary search finds the range
+            dates = self.columns["time"][rows]
+            first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+            last = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+            rows = slice(rows.start + first, rows.start + last)
+
+        return {name: values[rows] for name, values in self.columns.items() if name != "city_id"}
+
+    def column(self, name, city=None):
+        """
+        Get one column, for every city or just one.
+
+        Args:
+            name (str): Column name (like "rain_sum")
+            city (str): City name (default: every city)
+
+        Returns:
+            numpy.ndarray: The values, or None if the column or city doesn't exist
+        """
+        values = self.columns.get(name)
+        if values is None or name == "city_id":
+            return None
+        if city is None:
+            return values
+        rows = self.rows_for(city)
+        return values[rows] if rows is not None else None
+
+
+def _build(csv_path):
+    """
+    Load an archive from its saved columns, or parse the CSV and save them.
+
+    Returns:
+        DailyArchive: The loaded archive
+    """
+    source = _source_info(csv_path)
+    folder = cache_dir(csv_path)
+
+    saved = _load_saved_columns(folder, source)
+    if saved is not None:
+        columns, meta = saved
+        return DailyArchive(columns, meta["units"], meta["cities"], meta["city_ranges"], source)
+
+    columns, units, city_names = _parse_csv(csv_path)
+    city_ranges = _city_ranges(columns["city_id"], len(city_names))
+    meta = {
+        "version": FORMAT_VERSION,
+        "source": source,
+        "columns": list(columns),
+        "units": units,
+        "cities": city_names,
+        "city_ranges": city_ranges,
+    }
+    try:
+        _save_columns(folder, columns, meta)
+    except OSError:
+        # Can't save (read-only folder?) - it still works, just parsed again next run
+        pass
+    return DailyArchive(columns, units, city_names, city_ranges, source)
+
+
+def load_daily_archive(csv_path=DEFAULT_ARCHIVE):
+    """
+    Get a daily weather archive, loading it the first time it is asked for.
+
+    Args:
+        csv_path (str): Archive CSV (default: data/combined.csv)
+
+    Returns:
+        DailyArchive: The archive, or None if the file is missing, unreadable
+                      or NumPy isn't installed
+    """
+    if not NUMPY_AVAILABLE:
+        return None
+
+    key = os.path.abspath(csv_path)
+    try:
+        source = _source_info(csv_path)
+    except OSError:
+        return None
+
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None or archive.source != source:
+            try:
+                archive = _build(csv_path)
+            except (OSError, ValueError, StopIteration):
+                return None
+            _archives[key] = archive
+        return archive
+
+
+def forget_daily_archives():
+    """Drop every loaded archive from memory (the .npy files stay on disk)."""
+    with _archives_lock:
+        _archives.clear()
@@ -0,0 +1,399 @@
+"""
+Geocoding Service Module
+========================
+
+This module turns city names into map coordinates for the whole app.
+
+Before this existed, every feature (current weather, history, sun/moon,
+map) looked the same city up on its own, so one search could geocode the
+same name five times. Now they all ask this module instead.
+
+Key features:
+- One lookup function shared by every feature
+- City names are normalized ("  new   YORK " and "New York" are the same key)
+- Fast in-memory LRU cache for cities used this session
+- SQLite file on disk so lookups survive app restarts
+- Records which provider answered and the city's timezone
+- Open-Meteo geocoding first, Nominatim (OpenStreetMap) as a fallback
+- Names that no provider knows are remembered for a while (not_found_cache.py)
+
+Coordinates for a city never change, so once a city has been looked up
+it is served from the cache with zero network calls from then on.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from weather_dashboard.config import http_client, not_found_cache
+from weather_dashboard.config.single_flight import coalesce
+
+
+# Where the on-disk geocoding cache lives
+GEOCODE_DB_PATH = "data/geocode_cache.db"
+
+# How many cities to keep in memory
+MEMORY_CACHE_SIZE = 256
+
+# Provider endpoints
+OPEN_METEO_GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+
+# Nominatim requires a descriptive User-Agent
+NOMINATIM_HEADERS = {"User-Agent": "Tkinter Weather App 1.0"}
+
+# In-memory LRU cache: {normalized_name: location_record}
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+# Serializes writes to the SQLite file
+_db_lock = threading.Lock()
+
+# Returned by a provider that answered but doesn't know the city
+# (different from None, which means the provider couldn't be asked)
+NOT_FOUND = "not_found"
+
+
+def normalize_city_name(city):
+    """
+    Turn a city name into the key used by the cache.
+
+    Args:
+        city (str): City name as typed by the user
+
+    Returns:
+        str: Lowercase name with single spaces, or "" if invalid
+    """
+    if not isinstance(city, str):
+        return ""
+    return " ".join(city.split()).casefold()
+
+
+# MEMORY CACHE
+
+def _memory_get(key):
+    """Get a record from the LRU cache and mark it as recently used."""
+    with _memory_lock:
+        record = _memory_cache.get(key)
+        if record is not None:
+            _memory_cache.move_to_end(key)
+        return record
+
+
+def _memory_put(key, record):
+    """Store a record in the LRU cache, evicting the oldest if full."""
+    with _memory_lock:
+        _memory_cache[key] = record
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+# DISK CACHE
+
+def _connect(db_path):
+    """
+    Open the SQLite cache, creating the file and table if needed.
+
+    Args:
+        db_path (str): Path to the SQLite file
+
+    Returns:
+        sqlite3.Connection: Open connection
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS geocode (
+            name_key     TEXT PRIMARY KEY,
+            query        TEXT,
+            latitude     REAL NOT NULL,
+            longitude    REAL NOT NULL,
+            display_name TEXT,
+            country      TEXT,
+            timezone     TEXT,
+            provider     TEXT,
+            created_at   REAL
+        )
+        """
+    )
+    return conn
+
+
+def _disk_get(key):
+    """Load a record from the SQLite cache, or None if not stored."""
+    try:
+        conn = _connect(GEOCODE_DB_PATH)
+        try:
+            row = conn.execute(
+                "SELECT query, latitude, longitude, display_name, country, timezone, provider "
+                "FROM geocode WHERE name_key = ?",
+                (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+    if row is None:
+        return None
+
+    return {
+        "query": row[0],
+        "latitude": row[1],
+        "longitude": row[2],
+        "name": row[3],
+        "country": row[4],
+        "timezone": row[5],
+        "provider": row[6],
+    }
+
+
+def _disk_put(key, record):
+    """Save a record to the SQLite cache. Failures are ignored."""
+    try:
+        with _db_lock:
+            conn = _connect(GEOCODE_DB_PATH)
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO geocode "
+                        "(name_key, query, latitude, longitude, display_name, country, timezone, provider, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            key, record.get("query"), record["latitude"], record["longitude"],
+                            record.get("name"), record.get("country"), record.get("timezone"),
+                            record.get("provider"), time.time()
+                        )
+                    )
+            finally:
+                conn.close()
+    except sqlite3.Error:
+        pass
+
+
+# PROVIDERS
+
+def _lookup_open_meteo(city):
+    """
+    Ask the Open-Meteo geocoding API for a city.
+
+    Args:
+        city (str): City name
+
+    Returns:
+        dict: Location record, NOT_FOUND if the city is unknown, or None on errors
+    """
+    try:
+        params = {"name": city, "count": 1, "language": "en", "format": "json"}
+        response = http_client.get(OPEN_METEO_GEOCODING_URL, params=params)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+        results = data.get("results") if isinstance(data, dict) else None
+        if not results:
+            return NOT_FOUND
+
+        first = results[0]
+        lat = first.get("latitude")
+        lon = first.get("longitude")
+        if lat is None or lon is None:
+            return None
+
+        return {
+            "query": city,
+            "latitude": lat,
+            "longitude": lon,
+            "name": first.get("name"),
+            "country": first.get("country"),
+            "timezone": first.get("timezone"),
+            "provider": "open-meteo",
+        }
+    except Exception:
+        return None
+
+
+def _lookup_nominatim(city):
+    """
+    Ask OpenStreetMap's Nominatim service for a city.
+
+    Used when Open-Meteo can't find the name. Nominatim does not return
+    a timezone, so that field is left empty.
+
+    Args:
+        city (str): City name
+
+    Returns:
+        dict: Location record, NOT_FOUND if the city is unknown, or None on errors
+    """
+    try:
+        params = {"q": city, "format": "json", "limit": 1}
+        response = http_client.get(NOMINATIM_SEARCH_URL, params=params, headers=NOMINATIM_HEADERS)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+        if not isinstance(data, list) or not data:
+            return NOT_FOUND
+
+        first = data[0]
+        return {
+            "query": city,
+            "latitude": float(first["lat"]),
+            "longitude": float(first["lon"]),
+            "name": first.get("display_name"),
+            "country": None,
+            "timezone": None,
+            "provider": "nominatim",
+        }
+    except Exception:
+        return None
+
+
+# Providers in the order we try them
+_PROVIDERS = (_lookup_open_meteo, _lookup_nominatim)
+
+
+# PUBLIC API
+
+def geocode_city(city):
+    """
+    Look up a city and return everything we know about its location.
+
+    Checks memory first, then the disk cache, and only goes to the
+    network if the city has never been seen before.
+
+    Args:
+        city (str): City name
+
+    Returns:
+        dict: Location record with latitude, longitude, name, country,
+              timezone and provider, or None if the city wasn't found
+    """
+    key = normalize_city_name(city)
+    if not key:
+        return None
+
+    # Step 1: Memory cache
+    record = _memory_get(key)
+    if record is not None:
+        return record
+
+    # Step 2: Disk cache
+    record = _disk_get(key)
+    if record is not None:
+        _memory_put(key, record)
+        return record
+
+    # Step 3: Don't ask again about a name no provider knew a moment ago
+    if not_found_cache.is_not_found("geocode", key):
+        return None
+
+    # Step 4: Ask the providers. If another thread is already looking
+    # up the same name, wait for its answer instead.
+    return coalesce("geocode", {"name": key}, _lookup_and_store, key, city.strip())
+
+
+def _lookup_and_store(key, city):
+    """
+    Ask each provider in turn and cache the first answer.
+
+    Args:
+        key (str): Normalized cache key
+        city (str): City name to send to the providers
+
+    Returns:
+        dict: Location record, or None if no provider found the city
+    """
+    all_not_found = True
+    for provider in _PROVIDERS:
+        record = provider(city)
+        if record == NOT_FOUND:
+            continue
+        if record is None:
+            # Provider couldn't be reached - that says nothing about the city
+            all_not_found = False
+            continue
+
+        _memory_put(key, record)
+        _disk_put(key, record)
+        return record
+
+    # Every provider answered and none knew the name - remember that
+    if all_not_found:
+        not_found_cache.remember_not_found("geocode", key)
+    return None
+
+
+def get_coordinates(city):
+    """
+    Convert a city name to (latitude, longitude).
+
+    Args:
+        city (str): City name
+
+    Returns:
+        tuple: (latitude, longitude), or (None, None) if not found
+    """
+    record = geocode_city(city)
+    if record is None:
+        return None, None
+    return record["latitude"], record["longitude"]
+
+
+def clear_geocode_cache(include_disk=False):
+    """
+    Clear cached locations.
+
+    Args:
+        include_disk (bool): Also delete everything in the SQLite file
+    """
+    with _memory_lock:
+        _memory_cache.clear()
+
+    if include_disk:
+        try:
+            with _db_lock:
+                conn = _connect(GEOCODE_DB_PATH)
+                try:
+                    with conn:
+                        conn.execute("DELETE FROM geocode")
+                finally:
+                    conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def get_geocode_cache_info():
+    """
+    Get information about the geocoding cache.
+
+    Returns:
+        dict: Number of cities in memory and on disk
+    """
+    with _memory_lock:
+        memory_entries = len(_memory_cache)
+
+    disk_entries = 0
+    try:
+        conn = _connect(GEOCODE_DB_PATH)
+        try:
+            disk_entries = conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+    return {
+        "memory_entries": memory_entries,
+        "memory_capacity": MEMORY_CACHE_SIZE,
+        "disk_entries": disk_entries,
+        "db_path": GEOCODE_DB_PATH,
+    }
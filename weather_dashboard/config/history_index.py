@@ -0,0 +1,462 @@
+"""
+Weather History Index Module
+============================
+
+This module keeps an SQLite copy of the weather history CSV, so questions
+like "what are London's last 10 records?" don't have to read the whole file.
+
+The CSV file stays the real history: it is what save_weather appends to
+and what people open in a spreadsheet. The index is built from it on first
+use and then follows it - every query first checks the file's size, and if
+the file only grew, just the new lines at the end are added.
+
+Key features:
+- Index on (city, timestamp): per-city queries only touch that city's rows
+- Table of known city names, so listing searched cities doesn't scan history
+- Running statistics per city and overall (record count, temperature
+  min/max/sum, first/last timestamp, conditions histogram), updated as rows
+  are added, so reading them costs the same however long the history is
+- Records come back exactly like csv.DictReader would give them
+- Rebuilt from scratch if the CSV was replaced or shrank
+- Lives next to the CSV (data/weather_history.csv -> data/weather_history.db)
+
+Example:
+    from weather_dashboard.config import history_index
+
+    records = history_index.recent_records("data/weather_history.csv", "London", 10)
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import sqlite3
+import threading
+
+
+# Bytes at the start of the CSV remembered to notice when the file was replaced
+SIGNATURE_SIZE = 256
+
+# Bump when the tables change - an older index is then rebuilt from the CSV
+SCHEMA_VERSION = 2
+
+# Statistics are kept for the whole history and for each city
+ALL_SCOPE = "all"
+
+# Only one thread updates an index at a time
+_sync_lock = threading.Lock()
+
+
+def index_path(csv_path):
+    """Get the SQLite file used for a history CSV (same name, .db extension)."""
+    return os.path.splitext(csv_path)[0] + ".db"
+
+
+def _connect(db_path):
+    """
+    Open an index, creating its tables if needed.
+
+    Args:
+        db_path (str): Path to the SQLite file
+
+    Returns:
+        sqlite3.Connection: Open connection
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=5)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Made by an older version of the app - start again from the CSV
+        conn.executescript(
+            """
+            DROP TABLE IF EXISTS records;
+            DROP TABLE IF EXISTS cities;
+            DROP TABLE IF EXISTS stats;
+            DROP TABLE IF EXISTS conditions;
+            DROP TABLE IF EXISTS source;
+            """
+        )
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS records (
+            id          INTEGER PRIMARY KEY,
+            city_key    TEXT NOT NULL,
+            timestamp   TEXT NOT NULL,
+            temperature REAL,
+            fields      TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS records_city_time ON records (city_key, timestamp);
+        CREATE TABLE IF NOT EXISTS cities (
+            city        TEXT PRIMARY KEY,
+            records     INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stats (
+            scope       TEXT PRIMARY KEY,
+            records     INTEGER NOT NULL,
+            temp_count  INTEGER NOT NULL,
+            temp_sum    REAL NOT NULL,
+            temp_min    REAL,
+            temp_max    REAL,
+            first_time  TEXT,
+            last_time   TEXT
+        );
+        CREATE TABLE IF NOT EXISTS conditions (
+            scope       TEXT NOT NULL,
+            description TEXT NOT NULL,
+            records     INTEGER NOT NULL,
+            PRIMARY KEY (scope, description)
+        );
+        CREATE TABLE IF NOT EXISTS source (
+            id          INTEGER PRIMARY KEY CHECK (id = 1),
+            size        INTEGER NOT NULL,
+            mtime_ns    INTEGER NOT NULL,
+            offset      INTEGER NOT NULL,
+            signature   BLOB NOT NULL,
+            header      TEXT
+        );
+        """
+    )
+    return conn
+
+
+def to_record(header, fields):
+    """
+    Turn a CSV row into a dictionary, the same way csv.DictReader does.
+
+    Extra values go in a list under the key None, and missing values are None.
+    """
+    record = dict(zip(header, fields))
+    if len(fields) > len(header):
+        record[None] = fields[len(header):]
+    else:
+        for key in header[len(fields):]:
+            record[key] = None
+    return record
+
+
+def _parse_temperature(value):
+    """Get a temperature as a number, or None if it isn't one."""
+    try:
+        temperature = float(value)
+    except (ValueError, TypeError):
+        return None
+    # "nan" and "inf" are valid floats but not temperatures
+    return temperature if math.isfinite(temperature) else None
+
+
+def city_scope(city):
+    """Get the statistics scope of one city (any capitalization)."""
+    return "city:" + (city or "").lower()
+
+
+def read_new_rows(csv_path, offset):
+    """
+    Read the complete lines added to the CSV after a byte position.
+
+    A line that is still being written (no newline yet) is left for next time.
+
+    Returns:
+        tuple: (list of rows as lists of strings, byte position after the last full line)
+    """
+    with open(csv_path, "rb") as csvfile:
+        csvfile.seek(offset)
+        data = csvfile.read()
+
+    end = data.rfind(b"\n") + 1
+    if end == 0:
+        return [], offset
+    text = data[:end].decode("utf-8", errors="replace")
+    rows = [row for row in csv.reader(io.StringIO(text, newline="")) if row]
+    return rows, offset + end
+
+
+def _reset(conn):
+    """Forget everything in the index."""
+    conn.execute("DELETE FROM records")
+    conn.execute("DELETE FROM cities")
+    conn.execute("DELETE FROM stats")
+    conn.execute("DELETE FROM conditions")
+    conn.execute("DELETE FROM source")
+
+
+def sync(conn, csv_path):
+    """
+    Bring the index up to date with the CSV file.
+
+    Args:
+        conn (sqlite3.Connection): Open index
+        csv_path (str): History CSV
+
+    Returns:
+        list: The CSV's column names (empty if there is no history)
+    """
+    try:
+        info = os.stat(csv_path)
+    except OSError:
+        info = None
+
+    with _sync_lock:
+        source = _read_source(conn)
+        if info is None and source is None:
+            # No history yet, and nothing to forget
+            return []
+        if info is not None and source is not None and (source[0], source[1]) == (info.st_size, info.st_mtime_ns):
+            # Nothing changed since last time
+            return json.loads(source[4]) if source[4] else []
+
+        # Lock the index file too, in case another copy of the app is updating it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            header = _update(conn, csv_path, info, _read_source(conn))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return header
+
+
+def _read_source(conn):
+    """Get what the index knows about the CSV it was built from (None if nothing)."""
+    return conn.execute("SELECT size, mtime_ns, offset, signature, header FROM source").fetchone()
+
+
+def _update(conn, csv_path, info, source):
+    """Add the CSV's new lines to the index, or rebuild it (caller handles the transaction)."""
+    if info is None:
+        # No history file (never saved, or cleared)
+        _reset(conn)
+        return []
+
+    with open(csv_path, "rb") as csvfile:
+        signature = csvfile.read(SIGNATURE_SIZE)
+
+    # The file only grew if it's at least as big and starts the same way
+    grew = (source is not None and info.st_size >= source[2]
+            and signature[:len(source[3])] == source[3])
+
+    if grew:
+        offset, header = source[2], json.loads(source[4]) if source[4] else None
+    else:
+        _reset(conn)
+        offset, header = 0, None
+
+    rows, new_offset = read_new_rows(csv_path, offset)
+    if header is None and rows:
+        # The first row holds the column names
+        header, rows = rows[0], rows[1:]
+
+    _add_rows(conn, header, rows)
+    conn.execute(
+        "INSERT OR REPLACE INTO source (id, size, mtime_ns, offset, signature, header) "
+        "VALUES (1, ?, ?, ?, ?, ?)",
+        (info.st_size, info.st_mtime_ns, new_offset, signature[:new_offset],
+         json.dumps(header) if header is not None else None)
+    )
+    return header or []
+
+
+def _add_rows(conn, header, rows):
+    """Insert rows into the index and add them to the running statistics."""
+    if not rows:
+        return
+
+    new_records = []
+    city_counts = {}
+    stats = {}       # {scope: [records, temp_count, temp_sum, temp_min, temp_max, first_time, last_time]}
+    conditions = {}  # {(scope, description): records}
+    for fields in rows:
+        record = to_record(header, fields)
+        city = record.get("city") or ""
+        timestamp = record.get("timestamp") or ""
+        temperature = _parse_temperature(record.get("temperature"))
+        description = str(record.get("description", "Unknown"))
+
+        new_records.append((city.lower(), timestamp, temperature, json.dumps(fields)))
+        city_counts[city] = city_counts.get(city, 0) + 1
+
+        for scope in (ALL_SCOPE, city_scope(city)):
+            totals = stats.setdefault(scope, [0, 0, 0.0, None, None, None, None])
+            totals[0] += 1
+            if temperature is not None:
+                totals[1] += 1
+                totals[2] += temperature
+                totals[3] = temperature if totals[3] is None else min(totals[3], temperature)
+                totals[4] = temperature if totals[4] is None else max(totals[4], temperature)
+            if timestamp:
+                totals[5] = timestamp if totals[5] is None else min(totals[5], timestamp)
+                totals[6] = timestamp if totals[6] is None else max(totals[6], timestamp)
+            conditions[(scope, description)] = conditions.get((scope, description), 0) + 1
+
+    conn.executemany("INSERT INTO records (city_key, timestamp, temperature, fields) VALUES (?, ?, ?, ?)",
+                     new_records)
+    conn.executemany("INSERT INTO cities (city, records) VALUES (?, ?) "
+                     "ON CONFLICT (city) DO UPDATE SET records = records + excluded.records",
+                     list(city_counts.items()))
+
+    # Merge this batch into the stored totals. SQLite's two-argument MIN/MAX
+    # give NULL if either side is NULL, hence the COALESCE on both sides.
+    conn.executemany(
+        """
+        INSERT INTO stats (scope, records, temp_count, temp_sum, temp_min, temp_max, first_time, last_time)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (scope) DO UPDATE SET
+            records    = records + excluded.records,
+            temp_count = temp_count + excluded.temp_count,
+            temp_sum   = temp_sum + excluded.temp_sum,
+            temp_min   = MIN(COALESCE(temp_min, excluded.temp_min), COALESCE(excluded.temp_min, temp_min)),
+            temp_max   = MAX(COALESCE(temp_max, excluded.temp_max), COALESCE(excluded.temp_max, temp_max)),
+            first_time = MIN(COALESCE(first_time, excluded.first_time), COALESCE(excluded.first_time, first_time)),
+            last_time  = MAX(COALESCE(last_time, excluded.last_time), COALESCE(excluded.last_time, last_time))
+        """,
+        [(scope, *totals) for scope, totals in stats.items()]
+    )
+    conn.executemany("INSERT INTO conditions (scope, description, records) VALUES (?, ?, ?) "
+                     "ON CONFLICT (scope, description) DO UPDATE SET records = records + excluded.records",
+                     [(scope, description, count) for (scope, description), count in conditions.items()])
+
+
+def open_index(csv_path):
+    """
+    Open the index for a history CSV and bring it up to date.
+
+    Returns:
+        tuple: (sqlite3.Connection, list of CSV column names) - close the connection when done
+    """
+    conn = _connect(index_path(csv_path))
+    try:
+        header = sync(conn, csv_path)
+    except Exception:
+        conn.close()
+        raise
+    return conn, header
+
+
+def update_index(csv_path):
+    """
+    Bring the index up to date right away.
+
+    The history writer calls this after each batch, so the new rows and
+    statistics are ready before anyone asks for them.
+    """
+    conn, _ = open_index(csv_path)
+    conn.close()
+
+
+def recent_records(csv_path, city, limit=10):
+    """
+    Get a city's newest records, newest first.
+
+    Args:
+        csv_path (str): History CSV
+        city (str): City name (any capitalization)
+        limit (int): Most records to return
+
+    Returns:
+        list: Records as dictionaries
+    """
+    conn, header = open_index(csv_path)
+    try:
+        rows = conn.execute(
+            "SELECT fields FROM records WHERE city_key = ? ORDER BY timestamp DESC, id LIMIT ?",
+            (city.lower(), max(0, limit))
+        ).fetchall()
+    finally:
+        conn.close()
+    return [to_record(header, json.loads(row[0])) for row in rows]
+
+
+def city_records(csv_path, city, limit=None):
+    """
+    Get a city's records in the order they were saved.
+
+    Args:
+        csv_path (str): History CSV
+        city (str): City name (any capitalization)
+        limit (int): Only the newest this many (default: all)
+
+    Returns:
+        list: Records as dictionaries, oldest first
+    """
+    conn, header = open_index(csv_path)
+    try:
+        rows = conn.execute(
+            "SELECT fields FROM records WHERE city_key = ? ORDER BY id DESC LIMIT ?",
+            (city.lower(), -1 if limit is None else max(0, limit))
+        ).fetchall()
+    finally:
+        conn.close()
+    return [to_record(header, json.loads(row[0])) for row in reversed(rows)]
+
+
+def city_names(csv_path):
+    """
+    Get every city name in the history, exactly as it was saved.
+
+    Returns:
+        list: City names (one per different spelling)
+    """
+    conn, _ = open_index(csv_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT city FROM cities")]
+    finally:
+        conn.close()
+
+
+def summary(csv_path, city=None):
+    """
+    Get the running statistics of the whole history or of one city.
+
+    Args:
+        csv_path (str): History CSV
+        city (str): City name (default: the whole history)
+
+    Returns:
+        dict: total_records, earliest, latest, and min/max/avg temperature (None if unknown)
+    """
+    scope = ALL_SCOPE if city is None else city_scope(city)
+    conn, _ = open_index(csv_path)
+    try:
+        row = conn.execute(
+            "SELECT records, temp_count, temp_sum, temp_min, temp_max, first_time, last_time "
+            "FROM stats WHERE scope = ?",
+            (scope,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    if row is None:
+        return {"total_records": 0, "earliest": None, "latest": None, "min": None, "max": None, "avg": None}
+    records, temp_count, temp_sum, low, high, earliest, latest = row
+    return {"total_records": records, "earliest": earliest, "latest": latest,
+            "min": low, "max": high, "avg": temp_sum / temp_count if temp_count else None}
+
+
+def condition_counts(csv_path, city=None):
+    """
+    Count how often each weather description was saved.
+
+    Args:
+        csv_path (str): History CSV
+        city (str): City name (default: the whole history)
+
+    Returns:
+        dict: {description: number of records}
+    """
+    scope = ALL_SCOPE if city is None else city_scope(city)
+    conn, _ = open_index(csv_path)
+    try:
+        rows = conn.execute("SELECT description, records FROM conditions WHERE scope = ?", (scope,)).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def remove_index(csv_path):
+    """Delete the index file for a history CSV (it is rebuilt when needed)."""
+    path = index_path(csv_path)
+    if os.path.isfile(path):
+        os.remove(path)
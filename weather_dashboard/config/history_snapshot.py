@@ -0,0 +1,171 @@
+"""
+Weather History Snapshot Module
+===============================
+
+This module keeps the parsed weather history in memory, so reading the
+history again doesn't parse the whole CSV file again.
+
+Before this existed, load_weather_history() read and parsed every line of
+the file each time it was called - even when nothing had changed since
+the last call a second ago.
+
+How it works:
+1. The first read parses the file and remembers the records, together
+   with the file's size, modification time and first bytes
+2. Later reads check the file's size and modification time (one quick
+   system call). If they haven't changed, the remembered records are used
+3. If the file only grew (the normal case - history is appended to), just
+   the new lines at the end are read and added
+4. If the file was replaced or shrank, it is parsed again from the start
+
+Key features:
+- One snapshot per history file, shared by the whole app
+- Thread-safe (graphs load history on background threads)
+- Records are exactly what csv.DictReader would give
+- Records are kept as a tuple: it can be handed to every caller without
+  copying, and a tuple handed out earlier never changes when the file grows
+
+Example:
+    from weather_dashboard.config import history_snapshot
+
+    records = history_snapshot.get_records("data/weather_history.csv")
+"""
+
+import csv
+import io
+import os
+import threading
+
+from weather_dashboard.config.history_index import SIGNATURE_SIZE, read_new_rows, to_record
+
+
+# Snapshots: {absolute file path: snapshot dictionary}
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _read_unfinished_line(csv_path, offset):
+    """
+    Parse the last line of the file if it doesn't end with a newline yet.
+
+    Such a line is included in the results (like csv.DictReader would),
+    but read again next time, in case more of it is written.
+
+    Returns:
+        list: Rows (empty, or the one unfinished line)
+    """
+    with open(csv_path, "rb") as csvfile:
+        csvfile.seek(offset)
+        data = csvfile.read()
+    text = data.decode("utf-8", errors="replace")
+    return [row for row in csv.reader(io.StringIO(text, newline="")) if row]
+
+
+def _refresh(csv_path, info, snapshot):
+    """
+    Build a new snapshot, reusing the old one if the file only grew.
+
+    Args:
+        csv_path (str): History CSV
+        info (os.stat_result): Current size and modification time of the file
+        snapshot (dict): Previous snapshot, or None
+
+    Returns:
+        dict: The up-to-date snapshot
+    """
+    with open(csv_path, "rb") as csvfile:
+        signature = csvfile.read(SIGNATURE_SIZE)
+
+    grew = (snapshot is not None and info.st_size >= snapshot["offset"]
+            and signature[:len(snapshot["signature"])] == snapshot["signature"])
+
+    if grew:
+        # Carry on from the end of the last full line we read
+        offset, header, records = snapshot["offset"], snapshot["header"], snapshot["records"]
+    else:
+        offset, header, records = 0, None, ()
+
+    rows, offset = read_new_rows(csv_path, offset)
+    if header is None and rows:
+        # The first row holds the column names
+        header, rows = rows[0], rows[1:]
+    new_records = tuple(to_record(header, fields) for fields in rows)
+
+    unfinished = []
+    if offset < info.st_size:
+        unfinished = _read_unfinished_line(csv_path, offset)
+        if header is None and unfinished:
+            # A file that is only an unfinished header line has no records
+            unfinished = []
+    unfinished_records = tuple(to_record(header, fields) for fields in unfinished)
+
+    # A new tuple: records handed out before stay exactly as they were, and
+    # a failed read can't leave the old snapshot half-updated
+    records = records + new_records
+
+    return {
+        "size": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "offset": offset,
+        "signature": signature[:offset],
+        "header": header,
+        "records": records,
+        "unfinished": unfinished_records,
+    }
+
+
+def get_records(csv_path):
+    """
+    Get every record in a history CSV, using the snapshot when possible.
+
+    Args:
+        csv_path (str): History CSV
+
+    Returns:
+        tuple: Records as dictionaries, in file order (an empty list if
+               there is no file). The same tuple is returned until the file
+               changes, so the dictionaries are shared - don't modify them.
+    """
+    key = os.path.abspath(csv_path)
+    try:
+        info = os.stat(csv_path)
+    except OSError:
+        # No history file (never saved, or cleared)
+        forget(csv_path)
+        return []
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None or (snapshot["size"], snapshot["mtime_ns"]) != (info.st_size, info.st_mtime_ns):
+            snapshot = _refresh(csv_path, info, snapshot)
+            _snapshots[key] = snapshot
+        if snapshot["unfinished"]:
+            # Rare: the last line is still being written
+            return snapshot["records"] + snapshot["unfinished"]
+        return snapshot["records"]
+
+
+def forget(csv_path=None):
+    """
+    Drop the snapshot of a history file (or of every file).
+
+    Args:
+        csv_path (str): History CSV (default: all of them)
+    """
+    with _snapshots_lock:
+        if csv_path is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(os.path.abspath(csv_path), None)
+
+
+def get_snapshot_info():
+    """
+    Get information about the snapshots in memory.
+
+    Returns:
+        dict: {file path: number of records remembered}
+    """
+    with _snapshots_lock:
+        return {path: len(snapshot["records"]) + len(snapshot["unfinished"])
+                for path, snapshot in _snapshots.items()}
@@ -0,0 +1,237 @@
+"""
+Weather History Writer Module
+=============================
+
+This module writes weather history to the CSV file in the background.
+
+Before this existed, every search opened the history file, appended one
+line and closed it again - on the thread that fetched the weather. A kiosk
+refreshing twenty cities did that twenty times in a row. Now saving just
+puts the record in a queue, and a background thread writes whatever has
+collected in one go.
+
+Key features:
+- Saving never waits for the disk (records are queued, not written)
+- Records are written in the order they were saved
+- A burst of saves is written with one file open and one sync
+- The same city saved twice in the same minute is written once (newest data wins)
+- The history index and its statistics are updated right after each batch
+- Pending records are written when enough have collected, shortly after
+  the first one arrived, when someone reads the history, or when the app closes
+
+Example:
+    from weather_dashboard.config import history_writer
+
+    history_writer.enqueue("data/weather_history.csv", "London", row)
+    ...
+    history_writer.flush()   # Write everything now
+"""
+
+import atexit
+import csv
+import os
+import threading
+from collections import OrderedDict
+
+from weather_dashboard.config import history_index
+
+
+# Columns of the weather history CSV
+HISTORY_COLUMNS = [
+    "timestamp", "city", "temperature", "description",
+    "humidity", "wind_speed", "pressure", "visibility",
+    "uv_index", "precipitation"
+]
+
+# Write as soon as this many records are waiting
+FLUSH_SIZE = 50
+
+# Otherwise write this long after the first record arrived (seconds).
+# A kiosk refreshing all its cities saves them within a few milliseconds,
+# so a short wait is enough to catch the whole burst.
+FLUSH_DELAY = 0.1
+
+# Records waiting to be written: {(filepath, city_key, minute): row}, oldest first
+_pending = OrderedDict()
+_pending_lock = threading.Lock()
+
+# Only one batch is written at a time, so batches can't overtake each other
+_write_lock = threading.Lock()
+
+# Counters for get_writer_info()
+_counts = {"written": 0, "coalesced": 0, "batches": 0}
+
+# Background thread control
+_writer_thread = None
+_writer_lock = threading.Lock()
+_has_pending = threading.Event()   # Set when a record is queued
+_flush_now = threading.Event()     # Set when the queue is full or the writer should stop
+_stop_requested = False
+
+
+def _coalesce_key(filepath, city, row):
+    """Records for the same file, city and minute replace each other."""
+    return (filepath, (city or "").lower(), str(row[0])[:16])
+
+
+def enqueue(filepath, city, row):
+    """
+    Queue a history row to be written (returns immediately).
+
+    Args:
+        filepath (str): History CSV to append to
+        city (str): City the row is about
+        row (list): Values in HISTORY_COLUMNS order, timestamp first
+    """
+    key = _coalesce_key(filepath, city, row)
+    with _pending_lock:
+        if key in _pending:
+            _counts["coalesced"] += 1
+        # Newest data wins, and moves to the end so the file stays in time order
+        _pending[key] = row
+        _pending.move_to_end(key)
+        waiting = len(_pending)
+
+    start_writer()
+    _has_pending.set()
+    if waiting >= FLUSH_SIZE:
+        _flush_now.set()
+
+
+def _append_rows(filepath, rows):
+    """
+    Append rows to a history CSV with one open and one sync.
+
+    Args:
+        filepath (str): History CSV
+        rows (list): Rows to write, in order
+    """
+    try:
+        # Make sure the folder exists to save the file
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A new file gets the column headers first
+        file_exists = os.path.isfile(filepath)
+
+        with open(filepath, "a", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            if not file_exists:
+                writer.writerow(HISTORY_COLUMNS)
+            writer.writerows(rows)
+
+            # Make sure the whole batch reached the disk
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+
+        with _pending_lock:
+            _counts["written"] += len(rows)
+            _counts["batches"] += 1
+
+    except Exception as e:
+        # If something goes wrong, just continue - saving history is optional
+        return
+
+    try:
+        # Add the batch to the index and its running statistics now,
+        # so reading stats later doesn't have to
+        history_index.update_index(filepath)
+    except Exception as e:
+        # The index catches up on its own the next time it is read
+        pass
+
+
+def flush(filepath=None):
+    """
+    Write pending records now, on the calling thread.
+
+    Args:
+        filepath (str): Only write records for this file (default: all files)
+    """
+    with _write_lock:
+        batches = OrderedDict()
+        with _pending_lock:
+            for key in list(_pending):
+                if filepath is None or key[0] == filepath:
+                    batches.setdefault(key[0], []).append(_pending.pop(key))
+
+        for path, rows in batches.items():
+            _append_rows(path, rows)
+
+
+def discard(filepath):
+    """
+    Drop pending records for a file without writing them (used when clearing history).
+
+    Args:
+        filepath (str): History CSV
+    """
+    with _write_lock:
+        with _pending_lock:
+            for key in [key for key in _pending if key[0] == filepath]:
+                del _pending[key]
+
+
+def _writer_loop():
+    """Background thread: write pending records in batches until asked to stop."""
+    while not _stop_requested:
+        _has_pending.wait()
+        # Let the rest of the burst arrive, unless the batch is already full
+        _flush_now.wait(FLUSH_DELAY)
+        _has_pending.clear()
+        _flush_now.clear()
+        flush()
+
+
+def start_writer():
+    """Start the background writer thread if it isn't running yet."""
+    global _writer_thread, _stop_requested
+
+    with _writer_lock:
+        if _writer_thread is not None and _writer_thread.is_alive():
+            return
+        _stop_requested = False
+        _writer_thread = threading.Thread(target=_writer_loop, name="history-writer", daemon=True)
+        _writer_thread.start()
+
+
+def stop_writer(timeout=5):
+    """
+    Write everything that is still pending and stop the writer thread (called when the app closes).
+
+    Args:
+        timeout (float): Longest time to wait for the thread (seconds)
+    """
+    global _writer_thread, _stop_requested
+
+    with _writer_lock:
+        thread = _writer_thread
+        _stop_requested = True
+        _writer_thread = None
+        _has_pending.set()
+        _flush_now.set()
+
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+
+    # Anything queued while stopping
+    flush()
+
+
+def get_writer_info():
+    """
+    Get information about the history writer.
+
+    Returns:
+        dict: Records pending, written and coalesced, batches written, and whether the thread runs
+    """
+    with _pending_lock:
+        info = dict(_counts, pending=len(_pending))
+    with _writer_lock:
+        info["writer_running"] = _writer_thread is not None and _writer_thread.is_alive()
+    return info
+
+
+# Don't lose queued records if the app exits without calling stop_writer()
+atexit.register(flush)
@@ -0,0 +1,242 @@
+"""
+Shared HTTP Client Module
+=========================
+
+This module owns the one HTTP session that every part of the app uses to
+talk to weather, geocoding, astronomy and map tile services.
+
+Key features:
+- One process-wide requests.Session, created lazily and shared by all threads
+- Keep-alive connection pools sized per host, so repeat calls skip TCP/TLS setup
+- Timeouts for every request, adapted to each provider's real latency
+- Circuit breaker that fails fast when a provider keeps failing (see provider_health.py)
+- Automatic retries with exponential backoff for flaky responses (429/5xx)
+- A common User-Agent header, as required by OpenStreetMap services
+- Optional record/replay of every response (see cassette.py) for offline runs
+
+How to use it:
+    from weather_dashboard.config import http_client
+    response = http_client.get(url, params={...})
+
+The returned object is a normal requests.Response, and failures raise the
+usual requests.exceptions, so existing error handling keeps working.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from weather_dashboard.config import cassette, connectivity, provider_health
+
+
+# TIMEOUTS
+
+# (connect timeout, read timeout) in seconds used until a provider has
+# enough latency history for an adaptive timeout
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# RETRIES
+
+# How many times to retry a failed GET before giving up
+RETRY_TOTAL = 2
+
+# Backoff between retries: 0.3s, 0.6s, 1.2s, ...
+RETRY_BACKOFF_FACTOR = 0.3
+
+# HTTP status codes that are worth retrying
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# CONNECTION POOLS
+
+# Keep-alive connections kept per host when the host is not listed below
+DEFAULT_POOL_SIZE = 4
+
+# How many unlisted hosts keep their pools open at the same time
+OTHER_HOSTS_KEPT = 10
+
+# Hosts we talk to a lot get bigger pools.
+# Map tiles are requested dozens at a time, so they need the most.
+HOST_POOL_SIZES = {
+    "api.openweathermap.org": 8,
+    "tile.openweathermap.org": 16,
+    "api.open-meteo.com": 8,
+    "archive-api.open-meteo.com": 4,
+    "geocoding-api.open-meteo.com": 4,
+    "api.sunrise-sunset.org": 2,
+    "nominatim.openstreetmap.org": 2,
+    "tile.openstreetmap.org": 16,
+    "a.tile.openstreetmap.org": 16,
+}
+
+# Headers sent with every request unless the caller overrides them
+DEFAULT_HEADERS = {
+    "User-Agent": "SmartWeatherApp/1.0"
+}
+
+# The shared session and the lock that protects its creation
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_retry():
+    """
+    Create the retry policy shared by all adapters.
+
+    Returns:
+        Retry: urllib3 retry configuration
+    """
+    return Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        # Hand the last response back instead of raising, so callers can
+        # keep checking status_code like they always have
+        raise_on_status=False,
+    )
+
+
+def _build_adapter(pool_size, host_count=1):
+    """
+    Create an HTTP adapter with a keep-alive pool of the given size.
+
+    Args:
+        pool_size (int): Maximum connections kept open for one host
+        host_count (int): How many different hosts the adapter keeps pools for
+
+    Returns:
+        HTTPAdapter: Adapter ready to be mounted on a session
+    """
+    return HTTPAdapter(
+        pool_connections=host_count,
+        pool_maxsize=pool_size,
+        max_retries=_build_retry(),
+        # Wait for a free connection instead of opening throwaway ones
+        pool_block=True,
+    )
+
+
+def _build_session():
+    """
+    Build a new session with per-host connection pools.
+
+    Returns:
+        requests.Session: Configured session
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    # Catch-all adapters for hosts we don't know about. They serve many
+    # hosts, so keep a pool for each instead of reopening them in turn.
+    session.mount("https://", _build_adapter(DEFAULT_POOL_SIZE, OTHER_HOSTS_KEPT))
+    session.mount("http://", _build_adapter(DEFAULT_POOL_SIZE, OTHER_HOSTS_KEPT))
+
+    # Dedicated, bigger pools for the hosts we use most.
+    # requests picks the longest matching prefix, so these win.
+    for host, pool_size in HOST_POOL_SIZES.items():
+        adapter = _build_adapter(pool_size)
+        session.mount(f"https://{host}/", adapter)
+        session.mount(f"http://{host}/", adapter)
+
+    return session
+
+
+def get_session():
+    """
+    Get the shared HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: The process-wide session
+    """
+    global _session
+
+    # Fast path: session already exists
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        # Another thread may have created it while we waited
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def get(url, params=None, headers=None, timeout=None, **kwargs):
+    """
+    Make a GET request through the shared session.
+
+    Args:
+        url (str): Address to request
+        params (dict): Query string parameters (optional)
+        headers (dict): Extra headers for this request (optional)
+        timeout (float or tuple): Timeout override, defaults to the provider's
+                                  adaptive timeout
+        **kwargs: Any other arguments accepted by requests
+
+    Returns:
+        requests.Response: The server's response
+
+    Raises:
+        provider_health.CircuitOpenError: If the provider is currently down
+    """
+    mode = cassette.get_mode()
+
+    # Replay mode: answer from the cassette folder, never use the network
+    if mode == cassette.MODE_REPLAY:
+        return cassette.replay(url, params)
+
+    # Fail fast if this provider has been failing recently
+    health = provider_health.get_provider_health(url)
+    if not health.allow_request():
+        raise provider_health.CircuitOpenError(f"{health.name} is unavailable, skipping request")
+
+    if timeout is None:
+        timeout = health.get_timeout(DEFAULT_TIMEOUT)
+
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+    except Exception:
+        health.record_failure()
+        raise
+
+    elapsed = time.perf_counter() - start
+
+    # Any answer at all proves we are online
+    connectivity.mark_online()
+
+    if provider_health.is_failure_response(response):
+        health.record_failure()
+    else:
+        health.record_success(elapsed)
+
+    # Record mode: save a copy of the response for later replay
+    if mode == cassette.MODE_RECORD:
+        cassette.record(url, params, response, elapsed)
+
+    return response
+
+
+def close_session():
+    """
+    Close all pooled connections.
+
+    Called when the app shuts down. A new session is created automatically
+    if anything makes a request afterwards.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            try:
+                _session.close()
+            except Exception:
+                pass
+            _session = None
@@ -0,0 +1,112 @@
+"""
+Not-Found (Negative) Cache Module
+=================================
+
+This module remembers city names that a service said do not exist.
+
+When someone types "Londn", the geocoder and WeatherDB both answer
+"not found" and the app shows an error screen. Without this cache, typing
+the same typo again would send the same pointless requests again.
+
+Key features:
+- Remembers "not found" answers per service (geocoding, WeatherDB, ...)
+- Entries expire after a short time, in case a service was briefly wrong
+- Only real "not found" answers are stored - network errors are not,
+  because those say nothing about whether the city exists
+
+Example:
+    from weather_dashboard.config import not_found_cache
+
+    if not_found_cache.is_not_found("weatherdb", city):
+        return None, "City not found"
+    ...
+    if response.status_code == 404:
+        not_found_cache.remember_not_found("weatherdb", city)
+"""
+
+import threading
+import time
+
+
+# How long to remember that a name wasn't found (seconds)
+NOT_FOUND_TTL = 300  # 5 minutes
+
+# Most names remembered at once (oldest are dropped first)
+MAX_ENTRIES = 500
+
+# Cache structure: {(service, city_key): timestamp_when_saved}
+_entries = {}
+_entries_lock = threading.Lock()
+
+
+def _normalize(city):
+    """
+    Turn a city name into a cache key.
+
+    Same rule as geocoding.normalize_city_name (which can't be imported
+    here, because the geocoding module itself uses this cache).
+    """
+    if not isinstance(city, str):
+        return ""
+    return " ".join(city.split()).casefold()
+
+
+def remember_not_found(service, city):
+    """
+    Remember that a service couldn't find a city.
+
+    Args:
+        service (str): Short name of the service (like "geocode" or "weatherdb")
+        city (str): City name that wasn't found
+    """
+    key = (service, _normalize(city))
+    if not key[1]:
+        return
+
+    with _entries_lock:
+        _entries.pop(key, None)
+        _entries[key] = time.time()
+        while len(_entries) > MAX_ENTRIES:
+            _entries.pop(next(iter(_entries)))
+
+
+def is_not_found(service, city):
+    """
+    Check whether a service recently said a city doesn't exist.
+
+    Args:
+        service (str): Short name of the service
+        city (str): City name
+
+    Returns:
+        bool: True if the city is known not to exist for this service
+    """
+    key = (service, _normalize(city))
+    with _entries_lock:
+        saved_at = _entries.get(key)
+        if saved_at is None:
+            return False
+        if time.time() - saved_at < NOT_FOUND_TTL:
+            return True
+        # Too old - forget it and let the caller ask again
+        del _entries[key]
+        return False
+
+
+def forget_not_found(city):
+    """
+    Forget every "not found" answer for a city (for all services).
+
+    Args:
+        city (str): City name
+    """
+    city_key = _normalize(city)
+    with _entries_lock:
+        for key in [key for key in _entries if key[1] == city_key]:
+            del _entries[key]
+
+
+def clear_not_found_cache():
+    """Forget all remembered "not found" answers."""
+    with _entries_lock:
+        _entries.clear()
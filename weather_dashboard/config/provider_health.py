@@ -0,0 +1,268 @@
+"""
+Provider Health & Circuit Breaker Module
+========================================
+
+This module keeps track of how well each online service is behaving and
+stops the app from waiting on services that are clearly down.
+
+Every request goes through http_client.get(), which asks this module two
+questions before sending anything:
+1. "Is this provider healthy enough to try?"  (the circuit breaker)
+2. "How long should we wait for it?"          (the adaptive timeout)
+
+Key features:
+- One tracker per provider (grouped by host name, e.g. api.open-meteo.com)
+- Timeouts based on the provider's real p95 latency instead of a fixed 10s
+- Circuit breaker that "opens" after several failures in a row
+- While open, requests fail instantly so callers use cached/fallback data
+- After a cool-down, one trial request is let through to test recovery
+
+Circuit breaker states:
+    closed     Normal - every request is sent
+    open       Provider is failing - requests fail immediately
+    half-open  Cool-down is over - one trial request decides what happens next
+"""
+
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+
+
+# CIRCUIT BREAKER SETTINGS
+
+# Failures in a row before the breaker opens
+FAILURE_THRESHOLD = 3
+
+# Seconds to wait before letting a trial request through
+OPEN_COOLDOWN = 30
+
+# ADAPTIVE TIMEOUT SETTINGS
+
+# How many recent response times to remember per provider
+LATENCY_WINDOW = 50
+
+# Need at least this many samples before trusting the p95
+MIN_SAMPLES = 5
+
+# Read timeout = p95 latency x this multiplier (gives slow-but-working calls room)
+TIMEOUT_MULTIPLIER = 3.0
+
+# Never wait less or more than this for a response (seconds)
+MIN_READ_TIMEOUT = 2.0
+MAX_READ_TIMEOUT = 10.0
+
+# Connect timeout stays fixed - connecting should always be quick
+CONNECT_TIMEOUT = 3.05
+
+# Responses with these status codes mean the provider itself is struggling
+FAILURE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# State names
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request to a provider that is known to be down.
+
+    It is a ConnectionError so every existing "offline" fallback in the app
+    handles it without changes.
+    """
+
+
+def _percentile(values, percent):
+    """
+    Get a percentile from a list of numbers.
+
+    Args:
+        values (list): Numbers (does not need to be sorted)
+        percent (float): Percentile between 0 and 100
+
+    Returns:
+        float: The value at that percentile
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ProviderHealth:
+    """Latency history and circuit breaker for one provider."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "trips": 0}
+
+    def allow_request(self):
+        """
+        Decide whether a request may be sent right now.
+
+        Returns:
+            bool: True to send it, False to fail fast
+        """
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+
+            if self._state == STATE_OPEN:
+                if time.time() - self._opened_at < OPEN_COOLDOWN:
+                    self._stats["rejected"] += 1
+                    return False
+                # Cool-down is over - let one trial request through
+                self._state = STATE_HALF_OPEN
+
+            # Half-open: only one trial at a time
+            if self._trial_in_progress:
+                self._stats["rejected"] += 1
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self, latency):
+        """
+        Remember a successful response.
+
+        Args:
+            latency (float): How long the request took in seconds
+        """
+        with self._lock:
+            self._latencies.append(latency)
+            self._consecutive_failures = 0
+            self._state = STATE_CLOSED
+            self._trial_in_progress = False
+            self._stats["successes"] += 1
+
+    def record_failure(self):
+        """Remember a failed request and open the breaker if needed."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._stats["failures"] += 1
+
+            # A failed trial, or too many failures in a row, opens the breaker
+            if self._state == STATE_HALF_OPEN or self._consecutive_failures >= FAILURE_THRESHOLD:
+                if self._state != STATE_OPEN:
+                    self._stats["trips"] += 1
+                self._state = STATE_OPEN
+                self._opened_at = time.time()
+            self._trial_in_progress = False
+
+    def get_timeout(self, default):
+        """
+        Work out the timeout to use for the next request.
+
+        Args:
+            default (tuple): (connect, read) timeout used until we have enough samples
+
+        Returns:
+            tuple: (connect timeout, read timeout) in seconds
+        """
+        with self._lock:
+            samples = list(self._latencies)
+
+        if len(samples) < MIN_SAMPLES:
+            return default
+
+        read_timeout = _percentile(samples, 95) * TIMEOUT_MULTIPLIER
+        read_timeout = min(MAX_READ_TIMEOUT, max(MIN_READ_TIMEOUT, read_timeout))
+        return (CONNECT_TIMEOUT, round(read_timeout, 2))
+
+    def get_stats(self):
+        """
+        Get a summary of this provider's health.
+
+        Returns:
+            dict: State, failure streak, p50/p95 latency and counters
+        """
+        with self._lock:
+            samples = list(self._latencies)
+            stats = dict(self._stats)
+            stats["state"] = self._state
+            stats["consecutive_failures"] = self._consecutive_failures
+
+        stats["samples"] = len(samples)
+        stats["p50_latency"] = round(_percentile(samples, 50), 3) if samples else None
+        stats["p95_latency"] = round(_percentile(samples, 95), 3) if samples else None
+        return stats
+
+
+# REGISTRY OF PROVIDERS
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider_name(url):
+    """
+    Get the provider name used for a URL (its host name).
+
+    Args:
+        url (str): Request address
+
+    Returns:
+        str: Host name like "api.open-meteo.com"
+    """
+    return urlsplit(url).netloc.lower() or "unknown"
+
+
+def get_provider_health(url):
+    """
+    Get (or create) the health tracker for the provider behind a URL.
+
+    Args:
+        url (str): Request address
+
+    Returns:
+        ProviderHealth: Tracker for that provider
+    """
+    name = provider_name(url)
+    with _providers_lock:
+        health = _providers.get(name)
+        if health is None:
+            health = ProviderHealth(name)
+            _providers[name] = health
+        return health
+
+
+def is_failure_response(response):
+    """
+    Check whether a response means the provider is unhealthy.
+
+    A 404 for an unknown city is a perfectly healthy answer, so only
+    rate limiting and server errors count as failures.
+
+    Args:
+        response (requests.Response): Response to check
+
+    Returns:
+        bool: True if it should count against the provider
+    """
+    return response.status_code in FAILURE_STATUS_CODES
+
+
+def get_all_provider_stats():
+    """
+    Get health information for every provider used so far.
+
+    Returns:
+        dict: {provider_name: stats}
+    """
+    with _providers_lock:
+        providers = dict(_providers)
+    return {name: health.get_stats() for name, health in providers.items()}
+
+
+def reset_provider_health():
+    """Forget all health history (used by tests and after network changes)."""
+    with _providers_lock:
+        _providers.clear()
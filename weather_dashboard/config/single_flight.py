@@ -0,0 +1,171 @@
+"""
+Single-Flight Request Coalescing Module
+=======================================
+
+This module makes sure the same request is only sent once at a time.
+
+Right after a search, the prediction, history, sun/moon and graph
+features all start asking for data about the same city - often at the
+exact same moment from different threads. Without coordination each of
+them would send its own identical request.
+
+How it works:
+1. Every request is given a key made from its endpoint name and parameters
+2. The first thread to ask for a key actually runs the request
+3. Any other thread asking for the same key while it is running just waits
+4. When the request finishes, every waiting thread gets the same result
+5. Counters record how many calls were saved this way
+
+Example:
+    from weather_dashboard.config.single_flight import coalesce
+    data = coalesce("archive", {"city": "london"}, fetch_func, "London")
+"""
+
+import threading
+
+
+class _InFlightCall:
+    """One request that is currently running, plus the threads waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Group of requests where duplicates running at the same time are merged.
+
+    Only requests that overlap in time are merged. Once a request finishes,
+    the next call with the same key runs again - caching results for longer
+    is left to the callers' own caches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def _count(self, endpoint, field):
+        """Add one to a counter for an endpoint (lock must be held)."""
+        endpoint_stats = self._stats.setdefault(endpoint, {"requested": 0, "executed": 0, "coalesced": 0})
+        endpoint_stats[field] += 1
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run func once for all callers that ask for the same key at the same time.
+
+        Args:
+            key (tuple): (endpoint, params) identifying the request
+            func (callable): Function that performs the request
+            *args, **kwargs: Passed to func
+
+        Returns:
+            Whatever func returns. If func raises, every waiting caller
+            gets the same exception.
+        """
+        endpoint = key[0]
+
+        with self._lock:
+            self._count(endpoint, "requested")
+            call = self._calls.get(key)
+            if call is not None:
+                # Someone is already fetching this - wait for them
+                call.waiters += 1
+                self._count(endpoint, "coalesced")
+                is_leader = False
+            else:
+                # We are first - we do the actual work
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._count(endpoint, "executed")
+                is_leader = True
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def get_stats(self):
+        """
+        Get counters showing how many calls were saved.
+
+        Returns:
+            dict: Totals and a per-endpoint breakdown
+        """
+        with self._lock:
+            endpoints = {name: dict(values) for name, values in self._stats.items()}
+            in_flight = len(self._calls)
+
+        return {
+            "requested": sum(e["requested"] for e in endpoints.values()),
+            "executed": sum(e["executed"] for e in endpoints.values()),
+            "coalesced": sum(e["coalesced"] for e in endpoints.values()),
+            "in_flight": in_flight,
+            "endpoints": endpoints,
+        }
+
+    def reset_stats(self):
+        """Set all counters back to zero."""
+        with self._lock:
+            self._stats.clear()
+
+
+def make_key(endpoint, params=None):
+    """
+    Build a hashable key from an endpoint name and its parameters.
+
+    Args:
+        endpoint (str): Short name of the API endpoint (like "archive")
+        params (dict): Request parameters
+
+    Returns:
+        tuple: (endpoint, sorted parameter pairs)
+    """
+    if not params:
+        return (endpoint, ())
+    return (endpoint, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+
+
+# The group shared by every feature in the app
+_default_group = SingleFlight()
+
+
+def coalesce(endpoint, params, func, *args, **kwargs):
+    """
+    Run a request through the shared single-flight group.
+
+    Args:
+        endpoint (str): Short name of the API endpoint
+        params (dict): Parameters that identify the request
+        func (callable): Function that performs the request
+        *args, **kwargs: Passed to func
+
+    Returns:
+        The result of func (shared with any concurrent identical callers)
+    """
+    return _default_group.do(make_key(endpoint, params), func, *args, **kwargs)
+
+
+def get_single_flight_stats():
+    """Get the shared group's counters (see SingleFlight.get_stats)."""
+    return _default_group.get_stats()
+
+
+def reset_single_flight_stats():
+    """Reset the shared group's counters."""
+    _default_group.reset_stats()
@@ -6,17 +6,28 @@ This module handles saving and loading weather data to/from CSV files.
 It stores every weather search so you can look back at historical data.
 
 Key features:
-- Save weather data automatically when you search for a city
-- Load historical weather data for charts and analysis
+- Save weather data automatically when you search for a city, without
+  waiting for the disk (see history_writer.py)
+- Load historical weather data for charts and analysis (kept in memory
+  between calls, see history_snapshot.py)
 - Track which cities you've searched for
-- Get statistics about your weather data collection
+- Get statistics about your weather data collection (kept as running
+  totals, so they are instant no matter how much history there is)
 - Clean and manage old data
+- Per-city questions answered from an SQLite index of the history
+  (see history_index.py), so they stay fast as the history grows
+
+The CSV file is still the real history. If the index can't be used (for
+example a read-only data folder), every function falls back to reading
+the CSV directly.
 """
 
-import csv
 import os
+import sqlite3
 from datetime import datetime
 
+from weather_dashboard.config import history_index, history_snapshot, history_writer
+
 
 def save_weather(data, city_name=None, filepath="data/weather_history.csv"):
     """
@@ -25,57 +36,38 @@ def save_weather(data, city_name=None, filepath="data/weather_history.csv"):
     Every time you search for weather, this function saves that information
     to a CSV file so you can see historical patterns and trends.
     
+    The record is only queued here - a background thread writes it to the
+    file moments later (see history_writer.py), so searching never waits
+    for the disk. Reading the history always includes queued records.
+    
     Args:
         data (dict): Weather information from the API
         city_name (str): Name of the city (optional, can extract from data)
         filepath (str): Where to save the CSV file
     """
     try:
-        # Step 1: Make sure the folder exists to save the file
-        directory = os.path.dirname(filepath)
-        if directory:
-            # Create the directory if it doesn't exist (like creating a new folder)
-            os.makedirs(directory, exist_ok=True)
-        
-        # Step 2: Check if the CSV file already exists
-        file_exists = os.path.isfile(filepath)
-        
-        # Step 3: Open the CSV file for writing (append mode adds to the end)
-        with open(filepath, "a", newline="", encoding="utf-8") as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Step 4: If this is a new file, write the column headers first
-            if not file_exists:
-                writer.writerow([
-                    "timestamp", "city", "temperature", "description", 
-                    "humidity", "wind_speed", "pressure", "visibility",
-                    "uv_index", "precipitation"
-                ])
-            
-            # Step 5: Extract and prepare the data to save
-            
-            # Create a timestamp for when this data was saved
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Get the city name - try multiple sources
-            city = city_name or data.get('name') or data.get('city') or 'Unknown'
-            
-            # Extract weather measurements, using safe defaults if data is missing
-            temperature = data.get('temperature', 'N/A')
-            description = data.get('description', 'N/A')
-            humidity = data.get('humidity', 'N/A')
-            wind_speed = data.get('wind_speed', 'N/A')
-            pressure = data.get('pressure', 'N/A')
-            visibility = data.get('visibility', 'N/A')
-            uv_index = data.get('uv_index', 'N/A')
-            precipitation = data.get('precipitation', 'N/A')
-            
-            # Step 6: Write the data row to the CSV file
-            writer.writerow([
-                timestamp, city, temperature, description,
-                humidity, wind_speed, pressure, visibility,
-                uv_index, precipitation
-            ])
+        # Step 1: Create a timestamp for when this data was saved
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Step 2: Get the city name - try multiple sources
+        city = city_name or data.get('name') or data.get('city') or 'Unknown'
+        
+        # Step 3: Extract weather measurements, using safe defaults if data is missing
+        temperature = data.get('temperature', 'N/A')
+        description = data.get('description', 'N/A')
+        humidity = data.get('humidity', 'N/A')
+        wind_speed = data.get('wind_speed', 'N/A')
+        pressure = data.get('pressure', 'N/A')
+        visibility = data.get('visibility', 'N/A')
+        uv_index = data.get('uv_index', 'N/A')
+        precipitation = data.get('precipitation', 'N/A')
+        
+        # Step 4: Queue the row (columns in history_writer.HISTORY_COLUMNS order)
+        history_writer.enqueue(filepath, city, [
+            timestamp, city, temperature, description,
+            humidity, wind_speed, pressure, visibility,
+            uv_index, precipitation
+        ])
                         
     except Exception as e:
         # If something goes wrong, just continue - saving weather data
@@ -89,29 +81,23 @@ def load_weather_history(filepath="data/weather_history.csv"):
     This reads all the weather searches you've done in the past
     and returns them as a list of dictionaries.
     
+    The parsed file is kept in memory (see history_snapshot.py): if the file
+    hasn't changed since the last call, nothing is read, and if it only
+    grew, just the new lines are read.
+    
     Args:
         filepath (str): Path to the CSV file to read
         
     Returns:
-        list: List of weather records, each as a dictionary
+        tuple: Weather records, each as a dictionary, in file order
+               (an empty list if there is no history yet)
     """
     try:
-        # Check if the file exists
-        if not os.path.isfile(filepath):
-            return []  # Return empty list if no history file exists yet
-        
-        weather_history = []
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
         
-        # Open and read the CSV file
-        with open(filepath, "r", newline="", encoding="utf-8") as csvfile:
-            # Create a CSV reader that converts each row to a dictionary
-            reader = csv.DictReader(csvfile)
-            
-            # Read each row and add it to our history list
-            for row in reader:
-                weather_history.append(row)
-        
-        return weather_history
+        # Get the records from the in-memory snapshot (empty if no history file exists yet)
+        return history_snapshot.get_records(filepath)
         
     except Exception as e:
         # If reading fails, return empty list so the app can continue
@@ -133,6 +119,15 @@ def get_recent_weather(city, limit=10, filepath="data/weather_history.csv"):
         list: Most recent weather records for the city
     """
     try:
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
+        
+        # Fast path: look the city up in the index
+        try:
+            return history_index.recent_records(filepath, city, limit)
+        except (sqlite3.Error, OSError):
+            pass
+        
         # Load all weather records
         all_records = load_weather_history(filepath)
         
@@ -157,6 +152,43 @@ def get_recent_weather(city, limit=10, filepath="data/weather_history.csv"):
         return []
 
 
+def get_city_history(city, limit=None, filepath="data/weather_history.csv"):
+    """
+    Get a city's weather records in the order they were saved.
+    
+    This is what graphs use to draw a city's trends.
+    
+    Args:
+        city (str): Name of the city (any capitalization)
+        limit (int): Only return the newest this many records (default: all)
+        filepath (str): Path to the CSV file
+        
+    Returns:
+        list: The city's weather records, oldest first
+    """
+    try:
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
+        
+        # Fast path: look the city up in the index
+        try:
+            return history_index.city_records(filepath, city, limit)
+        except (sqlite3.Error, OSError):
+            pass
+        
+        city_records = [
+            record for record in load_weather_history(filepath)
+            if (record.get('city') or '').lower() == city.lower()
+        ]
+        if limit is None:
+            return city_records
+        return city_records[-limit:] if limit > 0 else []
+        
+    except Exception as e:
+        # If something goes wrong, return empty list
+        return []
+
+
 def get_searched_cities(filepath="data/weather_history.csv"):
     """
     Get a list of all unique cities that have been searched.
@@ -167,13 +199,20 @@ def get_searched_cities(filepath="data/weather_history.csv"):
         list: Sorted list of unique city names
     """
     try:
-        # Load all weather records
-        all_records = load_weather_history(filepath)
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
+        
+        # Fast path: the index keeps a list of every city name
+        try:
+            names = history_index.city_names(filepath)
+        except (sqlite3.Error, OSError):
+            # Load all weather records
+            names = [record.get('city', '') for record in load_weather_history(filepath)]
         
         # Extract unique city names
         cities = set()
-        for record in all_records:
-            city = record.get('city', '').strip()
+        for name in names:
+            city = (name or '').strip()
             # Only add non-empty cities that aren't "Unknown"
             if city and city != 'Unknown':
                 cities.add(city)
@@ -199,13 +238,19 @@ def clear_weather_history(filepath="data/weather_history.csv"):
         bool: True if successful, False if there was an error
     """
     try:
+        # Forget records that were saved but not written yet
+        history_writer.discard(filepath)
+        
         # Check if the file exists before trying to delete it
         if os.path.isfile(filepath):
             os.remove(filepath)  # Delete the file
-            return True
-        else:
-            # If file doesn't exist, consider it "successfully cleared"
-            return True
+        
+        # The index would be emptied on next use anyway, but free the space now
+        history_index.remove_index(filepath)
+        history_snapshot.forget(filepath)
+        
+        # If file doesn't exist, consider it "successfully cleared"
+        return True
             
     except Exception as e:
         # If deletion fails, return False
@@ -216,64 +261,192 @@ def get_weather_stats(filepath="data/weather_history.csv"):
     """
     Get statistics about stored weather data.
     
-    This analyzes your weather history and returns statistics
+    This analyzes your weather history and returns statistics.
+    The numbers are kept up to date by the history index as records are
+    added, so this is just as fast with a million records as with ten.
     
     Returns:
         dict: Dictionary containing various statistics
     """
     try:
-        # Load all weather records
-        records = load_weather_history(filepath)
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
         
-        # If no records exist, return basic info
-        if not records:
-            return {"total_records": 0, "cities": [], "date_range": None}
+        # Fast path: read the running totals from the index
+        try:
+            stats = _indexed_weather_stats(filepath)
+            if stats["total_records"]:
+                cities = history_index.city_names(filepath)
+                stats["unique_cities"] = len(cities)
+                stats["cities"] = cities
+            return stats
+        except (sqlite3.Error, OSError):
+            pass
         
-        # Count unique cities
-        cities = list(set(record.get('city', 'Unknown') for record in records))
+        # Load all weather records
+        records = load_weather_history(filepath)
+        stats = _scan_weather_stats(records)
+        if records:
+            # Count unique cities
+            cities = list(set(record.get('city', 'Unknown') for record in records))
+            stats["unique_cities"] = len(cities)
+            stats["cities"] = cities
+        return stats
         
-        # Calculate date range (earliest to latest record)
-        timestamps = [record.get('timestamp', '') for record in records if record.get('timestamp')]
-        timestamps.sort()
+    except Exception as e:
+        # If analysis fails, return error information
+        return {"error": str(e)}
+
+
+def get_city_stats(city, filepath="data/weather_history.csv"):
+    """
+    Get statistics about one city's stored weather data.
+    
+    Args:
+        city (str): Name of the city (any capitalization)
+        filepath (str): Path to the CSV file
         
-        date_range = None
-        if timestamps:
-            date_range = {
-                "earliest": timestamps[0],
-                "latest": timestamps[-1]
-            }
+    Returns:
+        dict: total_records, date_range and temperature_stats for the city
+    """
+    try:
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
         
-        # Calculate temperature statistics
-        temps = []
-        for record in records:
-            try:
-                # Try to convert temperature to a number
-                temp = float(record.get('temperature', 0))
-                temps.append(temp)
-            except (ValueError, TypeError):
-                # Skip invalid temperature values
-                pass
-        
-        # Calculate temperature stats if we have valid temperatures
-        temp_stats = {}
-        if temps:
-            temp_stats = {
-                "min": min(temps),           # Coldest temperature recorded
-                "max": max(temps),           # Hottest temperature recorded
-                "avg": round(sum(temps) / len(temps), 1)  # Average temperature
-            }
-        
-        # Compile all statistics
-        stats = {
-            "total_records": len(records),
-            "unique_cities": len(cities),
-            "cities": cities,
-            "date_range": date_range,
-            "temperature_stats": temp_stats
-        }
+        # Fast path: read the city's running totals from the index
+        try:
+            return _indexed_weather_stats(filepath, city)
+        except (sqlite3.Error, OSError):
+            pass
         
-        return stats
+        return _scan_weather_stats(get_city_history(city, filepath=filepath))
         
     except Exception as e:
         # If analysis fails, return error information
         return {"error": str(e)}
+
+
+def get_condition_counts(city=None, filepath="data/weather_history.csv"):
+    """
+    Count how often each weather description was saved.
+    
+    This is what the conditions pie chart is drawn from.
+    
+    Args:
+        city (str): Only count this city (default: every city)
+        filepath (str): Path to the CSV file
+        
+    Returns:
+        dict: {description: number of records}
+    """
+    try:
+        # Write any records still waiting in the queue first
+        history_writer.flush(filepath)
+        
+        # Fast path: the index keeps a running count per description
+        try:
+            return history_index.condition_counts(filepath, city)
+        except (sqlite3.Error, OSError):
+            pass
+        
+        records = load_weather_history(filepath) if city is None else get_city_history(city, filepath=filepath)
+        counts = {}
+        for record in records:
+            description = str(record.get('description', 'Unknown'))
+            counts[description] = counts.get(description, 0) + 1
+        return counts
+        
+    except Exception as e:
+        # If something goes wrong, return no counts
+        return {}
+
+
+def _scan_weather_stats(records):
+    """
+    Work out record count, date range and temperature statistics by reading every record.
+    
+    Used when the history index can't be opened.
+    
+    Args:
+        records (list): Weather records
+        
+    Returns:
+        dict: total_records, date_range and temperature_stats
+    """
+    # If no records exist, return basic info
+    if not records:
+        return {"total_records": 0, "cities": [], "date_range": None}
+    
+    # Calculate date range (earliest to latest record)
+    timestamps = [record.get('timestamp', '') for record in records if record.get('timestamp')]
+    timestamps.sort()
+    
+    date_range = None
+    if timestamps:
+        date_range = {
+            "earliest": timestamps[0],
+            "latest": timestamps[-1]
+        }
+    
+    # Calculate temperature statistics
+    temps = []
+    for record in records:
+        try:
+            # Try to convert temperature to a number
+            temp = float(record.get('temperature', 0))
+            temps.append(temp)
+        except (ValueError, TypeError):
+            # Skip invalid temperature values
+            pass
+    
+    # Calculate temperature stats if we have valid temperatures
+    temp_stats = {}
+    if temps:
+        temp_stats = {
+            "min": min(temps),           # Coldest temperature recorded
+            "max": max(temps),           # Hottest temperature recorded
+            "avg": round(sum(temps) / len(temps), 1)  # Average temperature
+        }
+    
+    return {
+        "total_records": len(records),
+        "date_range": date_range,
+        "temperature_stats": temp_stats
+    }
+
+
+def _indexed_weather_stats(filepath, city=None):
+    """
+    Build statistics from the running totals in the history index.
+    
+    Args:
+        filepath (str): Path to the CSV file
+        city (str): Only this city (default: every city)
+    
+    Returns:
+        dict: Same statistics as _scan_weather_stats()
+    """
+    summary = history_index.summary(filepath, city)
+    if not summary["total_records"]:
+        return {"total_records": 0, "cities": [], "date_range": None}
+    
+    date_range = None
+    if summary["earliest"]:
+        date_range = {
+            "earliest": summary["earliest"],
+            "latest": summary["latest"]
+        }
+    
+    temp_stats = {}
+    if summary["min"] is not None:
+        temp_stats = {
+            "min": summary["min"],
+            "max": summary["max"],
+            "avg": round(summary["avg"], 1)
+        }
+    
+    return {
+        "total_records": summary["total_records"],
+        "date_range": date_range,
+        "temperature_stats": temp_stats
+    }
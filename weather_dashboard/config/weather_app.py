@@ -21,8 +21,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from weather_dashboard.features.tomorrows_guess.predictor import get_tomorrows_prediction
 from weather_dashboard.config.themes import LIGHT_THEME, DARK_THEME
-from weather_dashboard.config.api import get_current_weather
+from weather_dashboard.config.api import get_current_weather_cached
 from weather_dashboard.config.storage import save_weather
+from weather_dashboard.config.history_writer import stop_writer
+from weather_dashboard.config.http_client import close_session
+from weather_dashboard.config.connectivity import stop_monitor
 from weather_dashboard.gui.main_gui import WeatherGUI
 
 # Try to import error handling if available
@@ -525,8 +528,13 @@ class WeatherApp(tk.Tk):
             # Get current language code for API request
             language_code = self.get_current_language_code()
             
-            # Download current weather data from the internet with language support
-            weather_data = get_current_weather(city, language_code)
+            # Get current weather with language support. Recently viewed cities
+            # come straight from the cache; stale ones are refreshed in the
+            # background and the display is updated when the new data arrives.
+            weather_data = get_current_weather_cached(
+                city, language_code,
+                on_refresh=lambda new_data: self.after(0, lambda: self._apply_refreshed_weather(city, new_data))
+            )
 
             # If there was an error getting weather data, show translated error
             if weather_data.get("error"):
@@ -534,10 +542,12 @@ class WeatherApp(tk.Tk):
                 return
 
             # Try to save the weather data to our history file
-            try:
-                save_weather(weather_data, city)
-            except Exception:
-                pass
+            # (cached readings were already saved when they were downloaded)
+            if weather_data.get("cache_status") == "network":
+                try:
+                    save_weather(weather_data, city)
+                except Exception:
+                    pass
 
             # Store the weather data so other parts of the app can use it
             self.current_weather_data = weather_data
@@ -553,6 +563,30 @@ class WeatherApp(tk.Tk):
             # Show network error in current language
             self.after(0, lambda: self._show_weather_error("network error"))
 
+    def _apply_refreshed_weather(self, city, weather_data):
+        """
+        Show weather that was refreshed in the background (runs on the main thread).
+        
+        Args:
+            city (str): City the refresh was for
+            weather_data (dict): New weather data
+        """
+        # Ignore it if the user has moved on to another city or the error screen
+        if self.current_screen == "error":
+            return
+        current_city = self.city_var.get().strip() or "New York"
+        if current_city.lower() != city.lower():
+            return
+        
+        try:
+            save_weather(weather_data, city)
+        except Exception:
+            pass
+        
+        self.current_weather_data = weather_data
+        self.gui.update_weather_display(weather_data)
+        self.gui.update_background_animation(weather_data)
+
     def update_tomorrow_prediction(self, city):
         """Get and display tomorrow's weather prediction."""
         # Don't update prediction if we're on error screen
@@ -684,6 +718,18 @@ class WeatherApp(tk.Tk):
         if hasattr(self.gui, 'language_controller'):
             self.gui.language_controller.cleanup()
         
+        # Close pooled network connections and stop the connectivity checks
+        close_session()
+        stop_monitor()
+        
+        # Write any weather history still waiting in the queue
+        stop_writer()
+        
+        # Stop the map tile server (only loaded once the map page was opened)
+        tile_server = sys.modules.get("weather_dashboard.features.interactive_map.tile_server")
+        if tile_server is not None:
+            tile_server.stop_tile_server()
+        
         # Actually close the window
         self.destroy()
 
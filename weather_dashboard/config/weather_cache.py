@@ -0,0 +1,160 @@
+"""
+Current Conditions Cache Module
+===============================
+
+This module remembers the current weather for recently viewed cities, so
+switching back to a city doesn't mean waiting for the internet again.
+
+Every cached entry is in one of three states, based on its age:
+- fresh    (younger than FRESH_SECONDS)  -> used as-is, no network call
+- stale    (younger than STALE_SECONDS)  -> shown right away, refreshed in the background
+- expired  (older than that)             -> not used, the caller fetches new data and waits
+
+This is called "stale-while-revalidate": slightly old weather is much
+better than a loading screen, as long as it gets replaced quickly.
+
+Key features:
+- Separate entries per city and language (descriptions are translated)
+- Configurable freshness windows (see configure_freshness)
+- Only one background refresh per city at a time
+- Thread-safe, since searches run on background threads
+"""
+
+import threading
+import time
+
+from weather_dashboard.config.geocoding import normalize_city_name
+
+
+# FRESHNESS WINDOWS (seconds)
+
+# Entries younger than this are returned without any network call
+FRESH_SECONDS = 60
+
+# Entries younger than this are shown while a refresh runs in the background
+STALE_SECONDS = 600  # 10 minutes
+
+# Most cities kept in memory at once (oldest are dropped first)
+MAX_ENTRIES = 100
+
+# States returned by lookup()
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+MISS = "miss"
+
+# Cache structure: {(city_key, language): (timestamp_when_saved, weather_data)}
+_entries = {}
+_entries_lock = threading.Lock()
+
+# Keys that currently have a background refresh running
+_refreshing = set()
+
+
+def configure_freshness(fresh_seconds=None, stale_seconds=None):
+    """
+    Change how long cached weather counts as fresh or stale.
+
+    Args:
+        fresh_seconds (float): New fresh window (unchanged if None)
+        stale_seconds (float): New stale window (unchanged if None)
+    """
+    global FRESH_SECONDS, STALE_SECONDS
+
+    if fresh_seconds is not None:
+        FRESH_SECONDS = max(0, fresh_seconds)
+    if stale_seconds is not None:
+        STALE_SECONDS = max(FRESH_SECONDS, stale_seconds)
+
+
+def _make_key(city, language):
+    """Build the cache key for a city and language."""
+    return normalize_city_name(city), language or "en"
+
+
+def lookup(city, language="en"):
+    """
+    Find cached weather for a city and say how old it is.
+
+    Args:
+        city (str): City name
+        language (str): Language code used for the descriptions
+
+    Returns:
+        tuple: (weather_data, state) where state is FRESH, STALE, EXPIRED or MISS.
+               weather_data is None for EXPIRED and MISS.
+    """
+    key = _make_key(city, language)
+    with _entries_lock:
+        entry = _entries.get(key)
+
+    if entry is None:
+        return None, MISS
+
+    age = time.time() - entry[0]
+    if age < FRESH_SECONDS:
+        return entry[1], FRESH
+    if age < STALE_SECONDS:
+        return entry[1], STALE
+    return None, EXPIRED
+
+
+def store(city, language, weather_data, stale=False):
+    """
+    Save weather for a city.
+
+    Results with an error are never cached.
+
+    Args:
+        city (str): City name
+        language (str): Language code used for the descriptions
+        weather_data (dict): Result from get_current_weather()
+        stale (bool): Save it as already stale (e.g. when some details were
+                      missing), so the next view refreshes it in the background
+    """
+    if not weather_data or weather_data.get("error"):
+        return
+
+    saved_at = time.time()
+    if stale:
+        saved_at -= FRESH_SECONDS
+
+    key = _make_key(city, language)
+    with _entries_lock:
+        _entries.pop(key, None)
+        _entries[key] = (saved_at, weather_data)
+
+        # Drop the oldest cities if there are too many
+        while len(_entries) > MAX_ENTRIES:
+            _entries.pop(next(iter(_entries)))
+
+
+def start_refresh(city, language):
+    """
+    Claim the right to refresh a city in the background.
+
+    Args:
+        city (str): City name
+        language (str): Language code
+
+    Returns:
+        bool: True if the caller should refresh, False if a refresh is already running
+    """
+    key = _make_key(city, language)
+    with _entries_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+
+def finish_refresh(city, language):
+    """Mark a background refresh as finished (see start_refresh)."""
+    with _entries_lock:
+        _refreshing.discard(_make_key(city, language))
+
+
+def clear_weather_cache():
+    """Forget all cached current conditions."""
+    with _entries_lock:
+        _entries.clear()
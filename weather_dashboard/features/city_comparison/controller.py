@@ -7,7 +7,7 @@ Main controller for the city comparison feature.
 
 import tkinter as tk
 import threading
-from config.api import get_current_weather
+from weather_dashboard.config.api import get_current_weather_many
 
 
 class CityComparisonController:
@@ -258,9 +258,11 @@ class CityComparisonController:
             # Get language code for API requests
             language_code = self.app.get_current_language_code()
             
-            # Fetch weather data for both cities
-            weather1 = get_current_weather(city1, language_code)
-            weather2 = get_current_weather(city2, language_code)
+            # Fetch weather data for both cities together
+            # (one Open-Meteo request, WeatherDB calls in parallel)
+            results = dict(get_current_weather_many([city1, city2], language_code))
+            weather1 = results[city1]
+            weather2 = results[city2]
             
             # Update display on main thread ONLY if still active
             if self.is_active:
@@ -32,8 +32,8 @@ except ImportError:
     # If matplotlib isn't installed, we'll show an error message later
     MATPLOTLIB_AVAILABLE = False
 
-from features.history_tracker.api import fetch_world_history
-from config.storage import load_weather_history
+from weather_dashboard.features.history_tracker.api import fetch_world_history
+from weather_dashboard.config.storage import get_city_history, get_condition_counts
 
 
 class WeatherGraphGenerator:
@@ -272,8 +272,7 @@ class WeatherGraphGenerator:
         """
         try:
             # Try to get humidity data from our local storage first
-            history = load_weather_history()
-            city_data = [record for record in history if record.get('city', '').lower() == city.lower()]
+            city_data = get_city_history(city, limit=7)
             
             if len(city_data) >= 3:
                 # Use real stored data if we have enough
@@ -325,18 +324,17 @@ class WeatherGraphGenerator:
         Create a pie chart showing the distribution of different weather conditions.
         """
         try:
-            # Get weather history from our local storage
-            history = load_weather_history()
-            city_data = [record for record in history if record.get('city', '').lower() == city.lower()]
+            # Get this city's condition counts from our local storage
+            # (kept up to date as weather is saved, so no history is re-read)
+            saved_counts = get_condition_counts(city)
             
-            if len(city_data) >= 5:
+            if sum(saved_counts.values()) >= 5:
                 # Count different weather conditions from real data
                 condition_counts = {}
-                for record in city_data:
-                    condition = record.get('description', 'Unknown')
+                for condition, count in saved_counts.items():
                     # Clean up and standardize condition names
                     condition = self._standardize_condition_name(condition)
-                    condition_counts[condition] = condition_counts.get(condition, 0) + 1
+                    condition_counts[condition] = condition_counts.get(condition, 0) + count
                 
                 # Sort by frequency and take top 6 conditions
                 sorted_conditions = sorted(condition_counts.items(), key=lambda x: x[1], reverse=True)
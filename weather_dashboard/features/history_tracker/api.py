@@ -21,8 +21,14 @@ How it works:
 
 import requests
 import datetime
+import threading
 import time
 
+from weather_dashboard.config import http_client
+from weather_dashboard.config.geocoding import get_coordinates
+from weather_dashboard.config.city_snapshot import fetch_city_snapshot, get_past_days
+from weather_dashboard.config.single_flight import coalesce
+
 # CACHING SYSTEM
 
 # Global cache to store recent API responses
@@ -30,6 +36,9 @@ import time
 # Structure: {city_name: (timestamp_when_saved, weather_data)}
 _weather_cache = {}
 
+# Several features read and write the cache from background threads
+_cache_lock = threading.Lock()
+
 # How long to keep cached data
 CACHE_DURATION = 120 # 2 minutes
 
@@ -38,58 +47,16 @@ def get_lat_lon(city):
     """
     Convert a city name to latitude and longitude coordinates.
     
+    Uses the shared geocoding cache, so cities already looked up by
+    other features don't need another network call.
+    
     Args:
         city (str): Name of the city
         
     Returns:
         tuple: as numbers, or (None, None) if city not found
     """
-    
-    # Step 1: Validate input - make sure we have a valid city name
-    if not isinstance(city, str):
-        return None, None
-    
-    # Step 2: Build the URL for the geocoding API
-    url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
-    
-    try:
-        # Step 3: Make the HTTP request to find the city
-        response = requests.get(url)
-        
-        # Step 4: Check if the request was successful
-        if response.status_code != 200:
-            # If the API returned an error status, return None
-            return None, None
-
-        # Step 5: Parse the JSON response
-        data = response.json()
-        
-        # Step 6: Extract the search results
-        results = data.get("results")
-        
-        # Step 7: Get coordinates from the first result
-        if results and len(results) > 0:
-            lat = results[0].get("latitude")
-            lon = results[0].get("longitude")
-            
-            # Make sure both coordinates are valid numbers
-            if lat is not None and lon is not None:
-                return lat, lon
-        
-        # If we get here, no city was found
-        return None, None
-        
-    except requests.exceptions.RequestException as e:
-        # Handle network errors
-        return None, None
-        
-    except ValueError as e:
-        # Handle JSON parsing errors
-        return None, None
-        
-    except Exception as e:
-        # Handle any other unexpected errors
-        return None, None
+    return get_coordinates(city)
 
 
 def _is_cache_valid(city_key):
@@ -102,22 +69,23 @@ def _is_cache_valid(city_key):
     Returns:
         tuple: (is_valid, cached_data) - True/False and the data if valid
     """
-    # Check if we have any cached data for this city
-    if city_key not in _weather_cache:
-        return False, None
-    
-    # Get the cached data and when it was saved
-    cached_time, cached_data = _weather_cache[city_key]
-    current_time = time.time()
-    
-    # Check if the cache is still fresh
-    if current_time - cached_time < CACHE_DURATION:
-        # Cache is still good - use it
-        return True, cached_data
-    else:
-        # Cache is too old - remove it and get fresh data
-        del _weather_cache[city_key]
-        return False, None
+    with _cache_lock:
+        # Check if we have any cached data for this city
+        if city_key not in _weather_cache:
+            return False, None
+        
+        # Get the cached data and when it was saved
+        cached_time, cached_data = _weather_cache[city_key]
+        current_time = time.time()
+        
+        # Check if the cache is still fresh
+        if current_time - cached_time < CACHE_DURATION:
+            # Cache is still good - use it
+            return True, cached_data
+        else:
+            # Cache is too old - remove it and get fresh data
+            del _weather_cache[city_key]
+            return False, None
 
 
 def _cache_data(city_key, data):
@@ -129,13 +97,14 @@ def _cache_data(city_key, data):
         data (dict): Weather data to cache
     """
     current_time = time.time()
-    _weather_cache[city_key] = (current_time, data)
+    with _cache_lock:
+        _weather_cache[city_key] = (current_time, data)
 
 
 def clear_weather_cache():
     """Clear all cached weather data."""
-    global _weather_cache
-    _weather_cache.clear()
+    with _cache_lock:
+        _weather_cache.clear()
 
 
 def fetch_world_history(city):
@@ -176,6 +145,32 @@ def fetch_world_history(city):
         # We have fresh cached data - return
         return cached_data
     
+    # If another feature is already downloading this city, wait for
+    # its answer instead of sending the same request again
+    return coalesce("archive", {"city": city_key}, _download_world_history, city, city_key)
+
+
+def _download_world_history(city, city_key):
+    """
+    Download the last 7 days of weather data and cache it.
+    
+    Args:
+        city (str): Cleaned city name
+        city_key (str): Lowercase city name used as cache key
+        
+    Returns:
+        dict: Daily weather data, or empty dict if failed
+    """
+    
+    # TRY THE SHARED CITY SNAPSHOT FIRST
+    
+    # The snapshot already includes the past 7 days, and the main weather
+    # display has usually just downloaded it for this city
+    daily = get_past_days(fetch_city_snapshot(city))
+    if daily:
+        _cache_data(city_key, daily)
+        return daily
+    
     # GET CITY COORDINATES
     
     # Convert city name to latitude/longitude coordinates
@@ -210,7 +205,7 @@ def fetch_world_history(city):
     
     try:
         # Make the HTTP request with a reasonable timeout
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url)
         
         # Check if the request was successful (HTTP 200 = OK)
         response.raise_for_status()
@@ -281,13 +276,18 @@ def get_cache_info():
         dict: Information about cached cities and their freshness
     """
     current_time = time.time()
+    
+    # Copy the entries so other threads can keep using the cache
+    with _cache_lock:
+        entries = list(_weather_cache.items())
+    
     cache_info = {
-        'total_entries': len(_weather_cache),
+        'total_entries': len(entries),
         'entries': []
     }
     
     # Analyze each cached entry
-    for city_key, (cached_time, data) in _weather_cache.items():
+    for city_key, (cached_time, data) in entries:
         age_seconds = current_time - cached_time
         time_remaining = CACHE_DURATION - age_seconds
         
@@ -9,10 +9,17 @@ Features:
 - Multiple weather overlay options (temperature, wind, precipitation, clouds, pressure, snow, dewpoint)
 - Real-time city location tracking with GPS coordinates
 - Custom tile server integration for weather data visualization
+  (one shared server, started the first time the map is opened)
 - Automatic geocoding to convert city names to map coordinates
 - Dynamic marker placement for selected cities
 - Refresh functionality for live weather updates
+- Background prefetch of nearby tiles and the next zoom levels after a search
+- Offline region packs for saved cities are used before the network
+- Locally drawn temperature layer from the temperatures of saved cities
+- Time-lapse of the last hours of an overlay, with every frame loaded first
 - Seamless integration with OpenStreetMap base tiles
+- Overlays layered by the map widget itself, so switching them keeps
+  the base map tiles that are already downloaded
 
 The controller manages all map interactions and coordinates between the UI,
 weather data services, and the custom tile server for optimal performance.
@@ -20,11 +27,33 @@ weather data services, and the custom tile server for optimal performance.
 
 import tkinter as tk
 from tkinter import ttk
-from tkintermapview import TkinterMapView
-import requests
+import os
 import threading
+import time
 
-from .tile_server import start_tile_server
+from weather_dashboard.config.geocoding import get_coordinates
+from weather_dashboard.config.storage import get_searched_cities
+from .layered_map_view import LayeredMapView
+from .tile_server import start_tile_server, tiles_around, prefetch_tiles, frame_timestamps, prefetch_frames
+from .region_packs import OFFLINE_TILE_DB, OSM_TILE_SERVER
+from . import local_overlay
+
+# How weather overlays reach the map:
+# - "client": the map widget downloads base tiles itself and draws the
+#   transparent overlay tiles from our tile server on top (default)
+# - "server": our tile server sends finished tiles with the overlay drawn in
+OVERLAY_MODE = "client"
+
+# Highest zoom levels with data
+BASE_MAX_ZOOM = 22
+OVERLAY_MAX_ZOOM = 10
+
+# Time-lapse playback speed (frames per second)
+TIMELAPSE_FPS = 2
+
+# How old the temperatures behind the locally drawn layer may get before
+# they are fetched again (seconds)
+LOCAL_TEMPERATURE_MAX_AGE = 600
 
 class MapController:
     def __init__(self, parent, get_city_callback, api_key, show_grid=True, translate_func=None):
@@ -43,9 +72,11 @@ class MapController:
         self.current_zoom = 6
 
         # URL for getting basic map tiles from OpenStreetMap
-        self.base_tile_server = "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"
+        self.base_tile_server = OSM_TILE_SERVER
         # This will store the URL for our custom weather overlay tiles
         self.composite_tile_url = None
+        # True while temperatures for the locally drawn layer are being fetched
+        self.local_refresh_running = False
 
         # Create the main frame that holds all map components
         self.frame = ttk.Frame(parent)
@@ -70,7 +101,8 @@ class MapController:
             "clouds_new": self.translate("overlay_clouds"),
             "pressure_new": self.translate("overlay_pressure"),
             "snow_new": self.translate("overlay_snow"),
-            "dewpoint_new": self.translate("overlay_dewpoint")
+            "dewpoint_new": self.translate("overlay_dewpoint"),
+            local_overlay.LOCAL_TEMP_LAYER: self.translate("overlay_local_temperature")
         }
         self.layer_dropdown['values'] = list(self.layer_options.values())
         self.layer_dropdown.pack(side="left", padx=(0, 10))
@@ -81,6 +113,13 @@ class MapController:
         refresh_button = ttk.Button(control_frame, text=self.translate("refresh"), command=self.refresh)
         refresh_button.pack(side="left")
 
+        # Add a button that plays the last few hours of the overlay as an animation
+        self.timelapse_button = ttk.Button(control_frame, text=self.translate("timelapse_play"),
+                                           command=self.toggle_timelapse)
+        self.timelapse_button.pack(side="left", padx=(10, 0))
+        self.timelapse_running = False
+        self.timelapse_job = None
+
 
 
         # Create main content frame
@@ -91,8 +130,12 @@ class MapController:
         self.map_container = tk.Frame(content_frame, bg='gray')
         self.map_container.pack(fill="both", expand=True)
 
-        # Create the actual map widget
-        self.map_view = TkinterMapView(self.map_container, width=600, height=350, corner_radius=0)
+        # Create the actual map widget.
+        # If offline region packs were downloaded (see region_packs.py), the
+        # widget looks tiles up there before downloading them.
+        offline_db = OFFLINE_TILE_DB if os.path.exists(OFFLINE_TILE_DB) else None
+        self.map_view = LayeredMapView(self.map_container, width=600, height=350, corner_radius=0,
+                                       database_path=offline_db)
         self.map_view.place(x=0, y=0, relwidth=1, relheight=1)
 
         # Create information panel (initially hidden)
@@ -103,11 +146,10 @@ class MapController:
         # Variable to store the current map marker (pin showing city location)
         self.marker = None
 
-        # Start our local tile server that combines map and weather data
-        self.tile_server_port = 5005
-        self.tile_server_url = f"http://localhost:{self.tile_server_port}"
-        # Run the tile server in a separate thread so it doesn't block the GUI
-        threading.Thread(target=start_tile_server, args=(self.api_key, self.tile_server_port), daemon=True).start()
+        # Start our local tile server that combines map and weather data.
+        # It runs in the background and is only started the first time -
+        # coming back to the map page reuses it.
+        self.tile_server_url = start_tile_server()
 
         # Set up the basic map display
         self.setup_base_map()
@@ -252,6 +294,11 @@ class MapController:
                 "title": self.translate("dewpoint_overlay_info"),
                 "description": self.translate("dewpoint_overlay_desc"),
                 "features": self.translate("dewpoint_overlay_features")
+            },
+            local_overlay.LOCAL_TEMP_LAYER: {
+                "title": self.translate("local_temperature_overlay_info"),
+                "description": self.translate("local_temperature_overlay_desc"),
+                "features": self.translate("local_temperature_overlay_features")
             }
         }
         
@@ -260,12 +307,14 @@ class MapController:
     def setup_base_map(self):
         """Set up the basic map without any weather overlays"""
         # Tell the map widget where to get basic map tiles from
-        self.map_view.set_tile_server(self.base_tile_server, max_zoom=22)
+        self.map_view.set_tile_server(self.base_tile_server, max_zoom=BASE_MAX_ZOOM)
         # Set the initial zoom level
         self.map_view.set_zoom(self.current_zoom)
 
     def update_map(self):
         """Update the map to show the current selected city"""
+        # A time-lapse only has frames for the old view
+        self.stop_timelapse()
         # Get the city name from the main application
         city = self.get_city_callback()
         # Convert city name to latitude/longitude coordinates
@@ -285,8 +334,13 @@ class MapController:
             # Add a new marker at the city location
             self.marker = self.map_view.set_marker(self.current_lat, self.current_lon, text=city)
 
+            # Get the tiles around the city ready before the user pans or zooms
+            self.prefetch_nearby_tiles()
+
     def update_weather_overlay(self):
         """Change the weather overlay displayed on the map"""
+        # A time-lapse only has frames for the old overlay
+        self.stop_timelapse()
         # Get the selected overlay display name
         overlay_display = self.layer_var.get()
         
@@ -297,50 +351,200 @@ class MapController:
                 layer_key = key
                 break
 
-        # If "none" is selected, show just the basic map
-        if layer_key == "none":
-            self.map_view.set_tile_server(self.base_tile_server, max_zoom=22)
+        if layer_key == local_overlay.LOCAL_TEMP_LAYER:
+            self.refresh_local_temperatures()
+
+        if OVERLAY_MODE == "client":
+            self.show_overlay_layer(layer_key)
         else:
-            # Build URL for our custom tile server that combines map + weather data
-            composite_url = f"{self.tile_server_url}/tiles/{layer_key}/{{z}}/{{x}}/{{y}}.png"
-            # Switch the map to use our custom tiles with weather overlay
-            self.map_view.set_tile_server(composite_url, max_zoom=10)
+            self.show_composite_tiles(layer_key)
+        self.prefetch_nearby_tiles(layer_key)
         
         # Update the info panel to reflect the new overlay (only if visible)
         if self.info_panel_visible:
             self.update_info_panel()
 
+    def show_overlay_layer(self, layer_key):
+        """Let the map widget draw transparent overlay tiles over its own base map"""
+        # If "none" is selected, show just the basic map
+        if layer_key == "none":
+            self.map_view.set_overlay_layer(None)
+            self.map_view.max_zoom = BASE_MAX_ZOOM
+            return
+
+        # Our tile server sends only the (toned-down) weather overlay
+        self.map_view.set_overlay_layer(self.layer_tile_url("overlay", layer_key))
+
+        # Weather data stops at a certain zoom, so don't zoom in further
+        max_zoom = self.layer_max_zoom(layer_key)
+        self.map_view.max_zoom = max_zoom
+        if self.map_view.zoom > max_zoom:
+            self.map_view.set_zoom(max_zoom)
+
+    def show_composite_tiles(self, layer_key):
+        """Switch the map to finished tiles from our tile server"""
+        # If "none" is selected, show just the basic map
+        if layer_key == "none":
+            self.map_view.set_tile_server(self.base_tile_server, max_zoom=BASE_MAX_ZOOM)
+        else:
+            # Build URL for our custom tile server that combines map + weather data
+            composite_url = self.layer_tile_url("tiles", layer_key)
+            # Switch the map to use our custom tiles with weather overlay
+            self.map_view.set_tile_server(composite_url, max_zoom=self.layer_max_zoom(layer_key))
+
+    def layer_tile_url(self, endpoint, layer_key):
+        """Build the tile server URL template for a layer ("overlay" or "tiles" endpoint)"""
+        url = f"{self.tile_server_url}/{endpoint}/{layer_key}/{{z}}/{{x}}/{{y}}.png"
+        if layer_key == local_overlay.LOCAL_TEMP_LAYER:
+            # New temperatures give a new URL, so the map draws the layer again
+            url += f"?v={local_overlay.get_data_version()}"
+        return url
+
+    def layer_max_zoom(self, layer_key):
+        """Get the highest zoom level a layer has data for"""
+        if layer_key == "none" or layer_key == local_overlay.LOCAL_TEMP_LAYER:
+            # Our own temperature layer can be drawn at any zoom
+            return BASE_MAX_ZOOM
+        return OVERLAY_MAX_ZOOM
+
+    def refresh_local_temperatures(self):
+        """
+        Fetch temperatures for the locally drawn layer in the background, if
+        they are missing or old, then draw the layer again.
+        """
+        updated_at = local_overlay.get_observation_info()["updated_at"]
+        if self.local_refresh_running or (updated_at and time.time() - updated_at < LOCAL_TEMPERATURE_MAX_AGE):
+            return
+        self.local_refresh_running = True
+
+        # Every saved city, plus the one on screen
+        cities = get_searched_cities()
+        current_city = self.get_city_callback()
+        if current_city and current_city not in cities:
+            cities.append(current_city)
+
+        def fetch():
+            try:
+                local_overlay.update_observations(cities)
+            except Exception:
+                # Keep showing the temperatures we had
+                return
+            finally:
+                self.local_refresh_running = False
+            # Back on the GUI thread, show the new temperatures
+            self.frame.after(0, self.update_weather_overlay)
+
+        threading.Thread(target=fetch, name="local-temperatures", daemon=True).start()
+
+    def get_selected_layer(self):
+        """Get the layer key (like "temp_new") for the overlay picked in the dropdown"""
+        overlay_display = self.layer_var.get()
+        for key, value in self.layer_options.items():
+            if value == overlay_display:
+                return key
+        return "none"
+
+    def prefetch_nearby_tiles(self, layer_key=None):
+        """
+        Download the tiles around the current view in the background.
+
+        Covers the visible area, one ring of tiles around it, and one zoom
+        level in and out, so the first pan or zoom after a search is instant.
+        """
+        layer_key = layer_key or self.get_selected_layer()
+        max_zoom = self.layer_max_zoom(layer_key)
+        tiles = tiles_around(self.current_lat, self.current_lon, self.map_view.zoom,
+                             self.map_view.width, self.map_view.height, max_zoom=max_zoom)
+
+        if OVERLAY_MODE == "client":
+            # The map widget downloads base tiles itself; the tile server does overlays
+            self.map_view.prefetch_base_tiles(tiles)
+            prefetch_tiles(layer_key, tiles)
+        elif layer_key == "none":
+            # Base tiles come straight from OpenStreetMap through the widget
+            self.map_view.prefetch_base_tiles(tiles)
+        else:
+            prefetch_tiles(layer_key, tiles, composed=True)
+
     def geocode_city(self, city_name):
         """Convert a city name into latitude/longitude coordinates"""
-        try:
-            # Use OpenStreetMap's free geocoding service
-            url = f"https://nominatim.openstreetmap.org/search"
-            # Set up search parameters
-            params = {"q": city_name, "format": "json", "limit": 1}
-            # Include a user agent as required by the service
-            headers = {"User-Agent": "Tkinter Weather App 1.0"}
-
-            # Make the web request to get coordinates
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()  # Raise an error if request failed
-
-            # Parse the JSON response
-            data = response.json()
-            # If we got results, extract the coordinates
-            if data:
-                lat = float(data[0]['lat'])
-                lon = float(data[0]['lon'])
-                return lat, lon
-        except Exception as e:
-            # If anything goes wrong, return None
+        # Use the shared geocoding cache so the map doesn't look up
+        # a city that the rest of the app has already found
+        lat, lon = get_coordinates(city_name)
+        if lat is None or lon is None:
             return None
+        return lat, lon
 
     def refresh(self):
         """Refresh both the map location and weather overlay"""
         self.update_map()
         self.update_weather_overlay()
 
+    def toggle_timelapse(self):
+        """Start or stop playing the recent hours of the selected overlay"""
+        if self.timelapse_running:
+            self.stop_timelapse()
+        else:
+            self.start_timelapse()
+
+    def start_timelapse(self):
+        """
+        Prepare every frame for the visible tiles in the background, then play them.
+
+        Returns:
+            bool: True if loading started (there is nothing to animate without a
+                  remote overlay - our own temperature layer has no history)
+        """
+        layer_key = self.get_selected_layer()
+        if layer_key in ("none", local_overlay.LOCAL_TEMP_LAYER) or self.timelapse_running:
+            return False
+
+        self.timelapse_running = True
+        self.timelapse_button.config(text=self.translate("timelapse_loading"))
+
+        frames = frame_timestamps()
+        tiles = self.map_view.visible_tiles()
+        composed = OVERLAY_MODE == "server"
+        endpoint = "frames/tiles" if composed else "frames/overlay"
+        frame_urls = [f"{self.tile_server_url}/{endpoint}/{layer_key}/{frame}/{{z}}/{{x}}/{{y}}.png"
+                      for frame in frames]
+
+        # Step 1: the tile server downloads and prepares every frame tile
+        job = prefetch_frames(layer_key, frames, [(z, x, y) for z, x, y in tiles], composed)
+        self.timelapse_job = job
+
+        def load():
+            # Step 2: once they are ready, the map builds its images in memory
+            job.wait()
+            if self.timelapse_job is not job:
+                return  # Stopped while loading
+            self.map_view.load_frames(frame_urls, tiles, composed)
+            # Step 3: back on the GUI thread, start swapping frames
+            self.frame.after(0, lambda: self._play_timelapse(job))
+
+        threading.Thread(target=load, name="timelapse-loader", daemon=True).start()
+        return True
+
+    def _play_timelapse(self, job):
+        """Start playback once the frames are loaded (unless it was stopped meanwhile)"""
+        if self.timelapse_job is not job:
+            return
+        self.timelapse_button.config(text=self.translate("timelapse_stop"))
+        self.map_view.play_frames(TIMELAPSE_FPS)
+
+    def stop_timelapse(self):
+        """Stop the time-lapse and show the current weather again"""
+        if not self.timelapse_running:
+            return
+        self.timelapse_running = False
+        if self.timelapse_job is not None:
+            self.timelapse_job.cancel()
+            self.timelapse_job = None
+        self.map_view.stop_frames()
+        self.timelapse_button.config(text=self.translate("timelapse_play"))
+
     def cleanup(self):
         """Clean up resources when the map is closed"""
+        self.stop_timelapse()
         if self.map_view:
             self.map_view.destroy()
\ No newline at end of file
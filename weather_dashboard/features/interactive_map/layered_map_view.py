@@ -0,0 +1,359 @@
+"""
+Layered Map View Widget
+=======================
+
+TkinterMapView that draws weather overlays on top of base map tiles it
+keeps for itself.
+
+TkinterMapView only remembers finished tiles. Changing the overlay means
+throwing those away, so every base tile was downloaded again - even though
+the streets under the weather never changed.
+
+Key features:
+- Raw base tiles kept in memory (LRU), separate from the finished tiles
+- Switching or removing the overlay re-downloads nothing for the base map
+- Base tiles go straight to OpenStreetMap over the shared pooled HTTP client
+- Overlay tiles (already transparent and toned down) come from the local
+  tile server's /overlay/ endpoint
+- Base tiles around the view can be prefetched in the background
+- Offline tile database (see region_packs.py) checked before the network
+- Time-lapse playback: every frame of the visible tiles is built in
+  memory first, then frames are swapped on a timer without any loading
+- Overlay drawn with alpha compositing, which also works on Pillow 10+
+  (the widget's own overlay code uses Image.ANTIALIAS, which was removed)
+"""
+
+import io
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image, ImageTk, UnidentifiedImageError
+from tkintermapview import TkinterMapView
+
+from weather_dashboard.config import http_client
+
+
+# Most raw base tiles kept in memory (about 20 KB each)
+BASE_TILE_CACHE_SIZE = 2000
+
+# Worker threads for prefetching base tiles (few, so the visible tiles come first)
+PREFETCH_WORKERS = 2
+
+# Seconds to wait for the local tile server (it may be fetching the
+# remote overlay tile itself before it can answer)
+LOCAL_TIMEOUT = 15
+
+# Headers to include with tile requests
+HEADERS = {
+    "User-Agent": "MyWeatherApp/1.0"
+}
+
+
+def fill_tile_url(template, zoom, x, y):
+    """Put tile coordinates into a {z}/{x}/{y} URL template."""
+    return template.replace("{x}", str(x)).replace("{y}", str(y)).replace("{z}", str(zoom))
+
+
+class LayeredMapView(TkinterMapView):
+    """Map widget that keeps raw base tiles so overlays can change cheaply."""
+
+    def __init__(self, *args, **kwargs):
+        # Raw base tiles: {(tile_server, zoom, x, y): PNG bytes}, least recently used first.
+        # Must exist before the parent starts its tile-loading threads.
+        self.base_tiles = OrderedDict()
+        self.base_tiles_lock = threading.Lock()
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="map-prefetch")
+        self.prefetch_generation = 0
+        # SQLite connections only work on the thread that opened them
+        self.prefetch_db = threading.local()
+        # Time-lapse: {(frame_index, zoom, x, y): PhotoImage} and playback state
+        self.frame_images = {}
+        self.frame_count = 0
+        self.frame_index = 0
+        self.frame_delay = 500
+        self.frame_job = None
+        # Plain requests for our own tile server: http_client would answer
+        # them from HTTP recordings in replay mode, and count local errors
+        # against 127.0.0.1 in the provider health checks
+        self.local_session = requests.Session()
+        super().__init__(*args, **kwargs)
+
+    def prefetch_base_tiles(self, tiles):
+        """
+        Download base tiles in the background before they are shown.
+
+        Starting a new prefetch cancels whatever is left of the previous one.
+
+        Args:
+            tiles (list): (zoom, x, y) tuples, most important first
+        """
+        self.prefetch_generation += 1
+        generation = self.prefetch_generation
+        for zoom, x, y in tiles:
+            self.prefetch_executor.submit(self._prefetch_one, generation, zoom, x, y)
+
+    def _prefetch_one(self, generation, zoom, x, y):
+        """Prefetch one base tile, unless a newer prefetch replaced this one."""
+        if generation != self.prefetch_generation or not self.running:
+            return
+        self.get_base_tile(zoom, x, y, self._prefetch_cursor())
+
+    def _prefetch_cursor(self):
+        """Get this prefetch thread's cursor for the offline tile database (if there is one)."""
+        if self.database_path is None:
+            return None
+        cursor = getattr(self.prefetch_db, "cursor", None)
+        if cursor is None:
+            try:
+                cursor = sqlite3.connect(self.database_path).cursor()
+            except sqlite3.Error:
+                return None
+            self.prefetch_db.cursor = cursor
+        return cursor
+
+    def destroy(self):
+        """Stop prefetching and playback, then close the map as usual."""
+        self.stop_frames(redraw=False)
+        self.prefetch_generation += 1
+        self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.local_session.close()
+        super().destroy()
+
+    def set_overlay_layer(self, overlay_url):
+        """
+        Show a different overlay (or none) without touching the base map cache.
+
+        Args:
+            overlay_url (str): {z}/{x}/{y} URL template for transparent
+                               overlay tiles, or None to show only the base map
+        """
+        if overlay_url == self.overlay_tile_server:
+            return
+        self.set_overlay_tile_server(overlay_url)
+
+        # Forget the finished tiles and draw again - base tiles come from memory
+        self.image_load_queue_tasks = []
+        self.image_load_queue_results = []
+        self.tile_image_cache = {}
+        self.canvas.delete("tile")
+        self.draw_initial_array()
+
+    def get_base_tile(self, zoom, x, y, db_cursor=None):
+        """
+        Get the raw base tile, from memory, the offline database or the network.
+
+        Returns:
+            bytes: PNG data, b"" if the server has no tile here, or None on errors
+        """
+        key = (self.tile_server, zoom, x, y)
+        with self.base_tiles_lock:
+            data = self.base_tiles.get(key)
+            if data is not None:
+                self.base_tiles.move_to_end(key)
+                return data
+
+        data = self._read_database_tile(zoom, x, y, db_cursor)
+        if data is None and not self.use_database_only:
+            try:
+                response = http_client.get(fill_tile_url(self.tile_server, zoom, x, y), headers=HEADERS)
+            except Exception:
+                return None
+            if response.status_code == 404:
+                data = b""
+            elif response.status_code == 200:
+                data = response.content
+            else:
+                return None
+
+        if data is None:
+            return None
+
+        with self.base_tiles_lock:
+            self.base_tiles[key] = data
+            while len(self.base_tiles) > BASE_TILE_CACHE_SIZE:
+                self.base_tiles.popitem(last=False)
+        return data
+
+    def _read_database_tile(self, zoom, x, y, db_cursor):
+        """Look a base tile up in the offline tile database (if there is one)."""
+        if db_cursor is None:
+            return None
+        try:
+            db_cursor.execute("SELECT t.tile_image FROM tiles t WHERE t.zoom=? AND t.x=? AND t.y=? AND t.server=?;",
+                              (zoom, x, y, self.tile_server))
+            result = db_cursor.fetchone()
+            return result[0] if result is not None else None
+        except sqlite3.Error:
+            return None
+
+    def get_overlay_image(self, zoom, x, y):
+        """
+        Download the overlay tile from the local tile server.
+
+        Returns:
+            PIL.Image: RGBA overlay, or None if there isn't one
+        """
+        if self.overlay_tile_server is None:
+            return None
+        try:
+            response = self.local_session.get(fill_tile_url(self.overlay_tile_server, zoom, x, y),
+                                              timeout=LOCAL_TIMEOUT)
+            if response.status_code != 200:
+                return None
+            return Image.open(io.BytesIO(response.content)).convert("RGBA")
+        except Exception:
+            return None
+
+    def request_image(self, zoom, x, y, db_cursor=None):
+        """
+        Build the finished tile image (runs on the widget's loader threads).
+
+        Replaces TkinterMapView.request_image so the base tile is kept raw
+        and the overlay is drawn on a copy of it.
+        """
+        try:
+            base_data = self.get_base_tile(zoom, x, y, db_cursor)
+            if base_data is None:
+                # Try again next time the tile is needed
+                return self.empty_tile_image
+            if not base_data:
+                # The server has no tile for these coordinates
+                self.tile_image_cache[f"{zoom}{x}{y}"] = self.empty_tile_image
+                return self.empty_tile_image
+
+            image = Image.open(io.BytesIO(base_data))
+            overlay = self.get_overlay_image(zoom, x, y)
+            if overlay is not None:
+                image = image.convert("RGBA")
+                if overlay.size != image.size:
+                    overlay = overlay.resize(image.size)
+                image = Image.alpha_composite(image, overlay)
+
+            if not self.running:
+                return self.empty_tile_image
+
+            image_tk = ImageTk.PhotoImage(image)
+            self.tile_image_cache[f"{zoom}{x}{y}"] = image_tk
+            return image_tk
+
+        except UnidentifiedImageError:
+            self.tile_image_cache[f"{zoom}{x}{y}"] = self.empty_tile_image
+            return self.empty_tile_image
+
+        except Exception:
+            return self.empty_tile_image
+
+    # TIME-LAPSE PLAYBACK
+
+    def visible_tiles(self):
+        """
+        List the tiles currently on screen.
+
+        Returns:
+            list: (zoom, x, y) tuples
+        """
+        zoom = round(self.zoom)
+        n = 2 ** zoom
+        tiles = []
+        for column in self.canvas_tile_array:
+            for canvas_tile in column:
+                x, y = canvas_tile.tile_name_position
+                if 0 <= x < n and 0 <= y < n:
+                    tiles.append((zoom, x, y))
+        return tiles
+
+    def load_frames(self, frame_urls, tiles, composed=False):
+        """
+        Build every frame of a time-lapse in memory (slow - run it on a background thread).
+
+        Args:
+            frame_urls (list): {z}/{x}/{y} URL template for each frame, oldest first
+            tiles (list): (zoom, x, y) tuples to build (see visible_tiles)
+            composed (bool): True if the URLs give finished tiles rather than
+                             overlays to draw on the base map
+
+        Returns:
+            int: Number of tile images built
+        """
+        frames = {}
+        for index, url in enumerate(frame_urls):
+            for zoom, x, y in tiles:
+                image = self._build_frame_image(url, zoom, x, y, composed)
+                if image is not None:
+                    frames[(index, zoom, x, y)] = image
+
+        self.frame_images = frames
+        self.frame_count = len(frame_urls)
+        return len(frames)
+
+    def _build_frame_image(self, url, zoom, x, y, composed):
+        """
+        Build one tile of one frame.
+
+        Returns:
+            ImageTk.PhotoImage: The finished tile, or None if it couldn't be built
+        """
+        try:
+            response = self.local_session.get(fill_tile_url(url, zoom, x, y), timeout=LOCAL_TIMEOUT)
+            if response.status_code != 200:
+                return None
+            image = Image.open(io.BytesIO(response.content))
+
+            if not composed:
+                # Draw the frame's overlay on the base tile we already have
+                base_data = self.get_base_tile(zoom, x, y, self._prefetch_cursor())
+                if not base_data:
+                    return None
+                base = Image.open(io.BytesIO(base_data)).convert("RGBA")
+                overlay = image.convert("RGBA")
+                if overlay.size != base.size:
+                    overlay = overlay.resize(base.size)
+                image = Image.alpha_composite(base, overlay)
+
+            return ImageTk.PhotoImage(image)
+        except Exception:
+            return None
+
+    def play_frames(self, fps=2):
+        """
+        Start showing the loaded frames one after another, looping.
+
+        Args:
+            fps (float): Frames per second
+        """
+        self.stop_frames(redraw=False)
+        if not self.frame_count:
+            return
+        self.frame_index = 0
+        self.frame_delay = max(1, int(1000 / fps))
+        self._show_next_frame()
+
+    def _show_next_frame(self):
+        """Swap every visible tile to the next frame's image (runs on the GUI thread)."""
+        zoom = round(self.zoom)
+        for column in self.canvas_tile_array:
+            for canvas_tile in column:
+                image = self.frame_images.get((self.frame_index, zoom, *canvas_tile.tile_name_position))
+                if image is not None:
+                    canvas_tile.set_image(image)
+
+        self.frame_index = (self.frame_index + 1) % self.frame_count
+        self.frame_job = self.after(self.frame_delay, self._show_next_frame)
+
+    def stop_frames(self, redraw=True):
+        """
+        Stop the time-lapse.
+
+        Args:
+            redraw (bool): Forget the frames and show the normal tiles again
+        """
+        if self.frame_job is not None:
+            self.after_cancel(self.frame_job)
+            self.frame_job = None
+        if redraw:
+            self.frame_images = {}
+            self.frame_count = 0
+            self.draw_initial_array()
@@ -0,0 +1,263 @@
+"""
+Local Temperature Overlay
+=========================
+
+Draws the "temp_local" map layer ourselves, from current temperatures the
+app already fetched, instead of downloading overlay tiles from the
+weather tile service.
+
+How it works:
+1. update_observations() gets the current temperature for a set of cities
+   with ONE batch weather request (see api.get_current_weather_many)
+2. For every pixel of a tile, the temperature is estimated from the
+   cities around it with inverse distance weighting (IDW): near cities
+   count a lot, far cities count a little
+3. Temperatures are turned into colours, and faded out far away from
+   any city so the map doesn't pretend to know the weather everywhere
+
+Key features:
+- The whole tile is computed at once with NumPy (no per-pixel Python loop),
+  on a coarse grid that is then smoothly scaled up
+- Every set of observations gets a data version, so cached tiles are
+  replaced as soon as new temperatures arrive
+- Works offline once the temperatures are known
+"""
+
+import hashlib
+import threading
+import time
+from io import BytesIO
+
+try:
+    import numpy as np
+    from PIL import Image
+    NUMPY_AVAILABLE = True
+except ImportError:
+    # Without NumPy the layer simply shows nothing
+    NUMPY_AVAILABLE = False
+
+from weather_dashboard.config.api import get_current_weather_many
+from weather_dashboard.config.geocoding import get_coordinates
+from weather_dashboard.config.storage import get_searched_cities
+
+
+# Layer name used in tile URLs
+LOCAL_TEMP_LAYER = "temp_local"
+
+# Size of one map tile in pixels
+TILE_SIZE = 256
+
+# Temperatures are worked out on a coarser grid and then smoothly scaled
+# up to the tile size - the field is smooth, and this is 16 times less work
+RENDER_GRID = 64
+
+# IDW power: higher values make each city's temperature cover a smaller area
+IDW_POWER = 2
+
+# The layer is fully drawn within this distance of the nearest city, and
+# fades out completely at twice this distance (km)
+INFLUENCE_KM = 300
+
+# Opacity of the colours where the layer is fully drawn (0-255)
+OVERLAY_ALPHA = 200
+
+# Temperature colour scale: (degrees Celsius, (red, green, blue))
+COLOR_STOPS = [
+    (-30, (130, 22, 146)),
+    (-20, (130, 87, 219)),
+    (-10, (32, 140, 236)),
+    (0, (32, 196, 232)),
+    (10, (35, 221, 221)),
+    (20, (194, 255, 40)),
+    (25, (255, 240, 40)),
+    (30, (255, 194, 40)),
+    (35, (252, 128, 20)),
+    (40, (200, 40, 20)),
+]
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# Current observations: arrays of station latitudes, longitudes and temperatures
+_observations = {"lat": None, "lon": None, "temp": None, "version": "", "updated_at": None}
+_observations_lock = threading.Lock()
+
+
+def set_observations(points):
+    """
+    Replace the temperatures the layer is drawn from.
+
+    Args:
+        points (list): (lat, lon, temperature_celsius) tuples
+
+    Returns:
+        str: The new data version ("" if there are no points)
+    """
+    points = [(float(lat), float(lon), float(temp)) for lat, lon, temp in points
+              if lat is not None and lon is not None and temp is not None]
+
+    # Same data gives the same version, so unchanged weather keeps its cached tiles
+    version = ""
+    if points:
+        text = ";".join(f"{lat:.4f},{lon:.4f},{temp:.1f}" for lat, lon, temp in sorted(points))
+        version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    with _observations_lock:
+        if points and NUMPY_AVAILABLE:
+            data = np.array(points, dtype=np.float64)
+            _observations.update(lat=data[:, 0], lon=data[:, 1], temp=data[:, 2])
+        else:
+            _observations.update(lat=None, lon=None, temp=None)
+        _observations["version"] = version
+        _observations["updated_at"] = time.time()
+    return version
+
+
+def update_observations(cities=None, language="en"):
+    """
+    Fetch current temperatures for a set of cities and use them for the layer.
+
+    Args:
+        cities (list): City names (default: every city in the search history)
+        language (str): Language code passed to the weather API
+
+    Returns:
+        str: The new data version
+    """
+    if cities is None:
+        cities = get_searched_cities()
+
+    points = []
+    for city, weather in get_current_weather_many(cities, language):
+        temperature = weather.get("temperature") if weather else None
+        if temperature is None:
+            continue
+        # Already cached by the batch request, so no extra network call
+        lat, lon = get_coordinates(city)
+        points.append((lat, lon, temperature))
+
+    return set_observations(points)
+
+
+def get_data_version():
+    """Get the version of the current observations ("" if there are none)."""
+    with _observations_lock:
+        return _observations["version"]
+
+
+def get_observation_info():
+    """
+    Describe the current observations.
+
+    Returns:
+        dict: Number of cities, data version and when they were updated
+    """
+    with _observations_lock:
+        count = 0 if _observations["temp"] is None else len(_observations["temp"])
+        return {"stations": count, "version": _observations["version"],
+                "updated_at": _observations["updated_at"]}
+
+
+def _pixel_coordinates(z, x, y, size):
+    """
+    Get the latitude of every pixel row and longitude of every pixel column of a tile.
+
+    Returns:
+        tuple: (latitudes, longitudes) as 1-D arrays
+    """
+    n = 2 ** z
+    steps = (np.arange(size) + 0.5) / size
+    lons = (x + steps) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + steps) / n))))
+    return lats, lons
+
+
+def interpolate_temperatures(lats, lons, station_lat, station_lon, station_temp, power=IDW_POWER):
+    """
+    Estimate temperatures on a grid with inverse distance weighting.
+
+    Args:
+        lats (array): Latitude of each grid row
+        lons (array): Longitude of each grid column
+        station_lat, station_lon, station_temp (array): Known observations
+        power (float): IDW power
+
+    Returns:
+        tuple: (temperatures, distance to the nearest station in km), both rows x columns
+    """
+    # Distances in km on a flat approximation (fine at the scale of one tile).
+    # Shapes: rows x 1 x stations and 1 x columns x stations.
+    dy = (lats[:, None, None] - station_lat[None, None, :]) * KM_PER_DEGREE
+    lon_diff = (lons[None, :, None] - station_lon[None, None, :] + 180.0) % 360.0 - 180.0
+    dx = lon_diff * KM_PER_DEGREE * np.cos(np.radians(lats))[:, None, None]
+    dist_sq = dy * dy + dx * dx
+
+    # A pixel right on a station would divide by zero - nudge it a tiny bit
+    dist_sq = np.maximum(dist_sq, 1e-6)
+    weights = dist_sq ** (-power / 2.0)
+    temperatures = (weights * station_temp).sum(axis=2) / weights.sum(axis=2)
+    nearest_km = np.sqrt(dist_sq.min(axis=2))
+    return temperatures, nearest_km
+
+
+def colorize(temperatures, nearest_km):
+    """
+    Turn temperatures into RGBA pixels.
+
+    Args:
+        temperatures (array): Degrees Celsius, rows x columns
+        nearest_km (array): Distance to the nearest station, rows x columns
+
+    Returns:
+        array: rows x columns x 4, uint8
+    """
+    stop_temps = [stop[0] for stop in COLOR_STOPS]
+    rgba = np.empty(temperatures.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        stop_values = [stop[1][channel] for stop in COLOR_STOPS]
+        rgba[..., channel] = np.interp(temperatures, stop_temps, stop_values)
+
+    # Fully drawn near cities, fading to nothing at twice INFLUENCE_KM
+    fade = np.clip(2.0 - nearest_km / INFLUENCE_KM, 0.0, 1.0)
+    rgba[..., 3] = (fade * OVERLAY_ALPHA).astype(np.uint8)
+    return rgba
+
+
+def _scale_up(values, size):
+    """Smoothly resize a 2-D array of numbers to size x size."""
+    image = Image.fromarray(values.astype(np.float32), "F")
+    return np.asarray(image.resize((size, size), Image.BILINEAR))
+
+
+def render_tile(z, x, y, size=TILE_SIZE):
+    """
+    Draw one temperature overlay tile.
+
+    Args:
+        z, x, y (int): Tile coordinates
+        size (int): Tile size in pixels
+
+    Returns:
+        bytes: PNG data, or None if there are no observations (or no NumPy)
+    """
+    if not NUMPY_AVAILABLE:
+        return None
+    with _observations_lock:
+        station_lat, station_lon, station_temp = _observations["lat"], _observations["lon"], _observations["temp"]
+    if station_temp is None:
+        return None
+
+    grid = min(size, RENDER_GRID)
+    lats, lons = _pixel_coordinates(z, x, y, grid)
+    temperatures, nearest_km = interpolate_temperatures(lats, lons, station_lat, station_lon, station_temp)
+    if nearest_km.min() > 2 * INFLUENCE_KM:
+        # No city anywhere near this tile
+        return None
+
+    if grid != size:
+        temperatures = _scale_up(temperatures, size)
+        nearest_km = _scale_up(nearest_km, size)
+
+    output = BytesIO()
+    Image.fromarray(colorize(temperatures, nearest_km), "RGBA").save(output, format="PNG", compress_level=1)
+    return output.getvalue()
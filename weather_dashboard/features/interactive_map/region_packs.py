@@ -0,0 +1,299 @@
+"""
+Offline Region Packs
+====================
+
+Downloads OpenStreetMap base tiles around saved cities into a local tile
+database, so the map can show those areas without downloading anything.
+
+The database uses the same layout as TkinterMapView's own offline loader
+(tables "server", "tiles" and "sections"), and the map widget reads it
+before going to the network.
+
+Key features:
+- One pack per city in the search history (or any list of cities)
+- Square area of a chosen radius around each city, from zoom 0 up to a chosen zoom
+- Rate limited, to stay within OpenStreetMap's tile usage policy
+- Resumable: tiles already in the database are skipped, and progress is
+  saved as it goes, so an interrupted download just continues next time
+
+Usage:
+    python -m weather_dashboard.features.interactive_map.region_packs
+    python -m weather_dashboard.features.interactive_map.region_packs --max-zoom 14 --radius 10
+    python -m weather_dashboard.features.interactive_map.region_packs --city Paris --city Oslo
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import time
+
+from weather_dashboard.config import http_client
+from weather_dashboard.config.geocoding import get_coordinates
+from weather_dashboard.config.storage import get_searched_cities
+
+
+# Where the offline tiles are stored
+OFFLINE_TILE_DB = os.getenv("OFFLINE_TILE_DB", "data/offline_tiles.db")
+
+# Base map tile server - must match the URL the map widget uses, because
+# tiles are looked up by server URL
+OSM_TILE_SERVER = "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# Default pack size
+DEFAULT_RADIUS_KM = 15
+DEFAULT_MAX_ZOOM = 12
+
+# Highest zoom OpenStreetMap has tiles for
+OSM_MAX_ZOOM = 19
+
+# Most tile downloads per second (OpenStreetMap asks bulk downloaders to go slowly)
+DEFAULT_REQUESTS_PER_SECOND = 2
+
+# Save progress after this many new tiles
+COMMIT_EVERY = 50
+
+# Headers to include with tile requests
+HEADERS = {
+    "User-Agent": "MyWeatherApp/1.0"
+}
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+def open_tile_database(db_path=OFFLINE_TILE_DB, server=OSM_TILE_SERVER):
+    """
+    Open (and create if needed) the offline tile database.
+
+    Args:
+        db_path (str): Database file
+        server (str): Tile server URL the tiles come from
+
+    Returns:
+        sqlite3.Connection: Open connection
+    """
+    folder = os.path.dirname(db_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("""CREATE TABLE IF NOT EXISTS server (
+                              url VARCHAR(300) PRIMARY KEY NOT NULL,
+                              max_zoom INTEGER NOT NULL);""")
+    connection.execute("""CREATE TABLE IF NOT EXISTS tiles (
+                              zoom INTEGER NOT NULL,
+                              x INTEGER NOT NULL,
+                              y INTEGER NOT NULL,
+                              server VARCHAR(300) NOT NULL,
+                              tile_image BLOB NOT NULL,
+                              CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url),
+                              CONSTRAINT pk_tiles PRIMARY KEY (zoom, x, y, server));""")
+    connection.execute("""CREATE TABLE IF NOT EXISTS sections (
+                              position_a VARCHAR(100) NOT NULL,
+                              position_b VARCHAR(100) NOT NULL,
+                              zoom_a INTEGER NOT NULL,
+                              zoom_b INTEGER NOT NULL,
+                              server VARCHAR(300) NOT NULL,
+                              CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url),
+                              CONSTRAINT pk_tiles PRIMARY KEY (position_a, position_b, zoom_a, zoom_b, server));""")
+    connection.execute("INSERT OR IGNORE INTO server (url, max_zoom) VALUES (?, ?);", (server, OSM_MAX_ZOOM))
+    connection.commit()
+    return connection
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Get the square area around a point.
+
+    Returns:
+        tuple: (north, west, south, east) in degrees
+    """
+    lat_step = radius_km / KM_PER_DEGREE
+    # Degrees of longitude get shorter towards the poles
+    lon_step = radius_km / (KM_PER_DEGREE * max(0.01, math.cos(math.radians(lat))))
+    north = min(85.0511, lat + lat_step)
+    south = max(-85.0511, lat - lat_step)
+    return north, max(-180.0, lon - lon_step), south, min(179.9999, lon + lon_step)
+
+
+def _tile_xy(lat, lon, zoom):
+    """Convert a position to tile numbers at a zoom level (Web Mercator)."""
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_box(box, min_zoom, max_zoom):
+    """
+    List every tile inside an area, for a range of zoom levels.
+
+    Args:
+        box (tuple): (north, west, south, east) from bounding_box()
+        min_zoom, max_zoom (int): Zoom levels to include
+
+    Returns:
+        list: (zoom, x, y) tuples, lowest zoom first
+    """
+    north, west, south, east = box
+    tiles = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        left, top = _tile_xy(north, west, zoom)
+        right, bottom = _tile_xy(south, east, zoom)
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                tiles.append((zoom, x, y))
+    return tiles
+
+
+class RateLimiter:
+    """Spaces calls out so there are at most a set number per second."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0
+        self.next_time = 0.0
+
+    def wait(self):
+        """Sleep until the next call is allowed."""
+        now = time.monotonic()
+        if now < self.next_time:
+            time.sleep(self.next_time - now)
+            now = self.next_time
+        self.next_time = now + self.interval
+
+
+def download_region(connection, lat, lon, radius_km=DEFAULT_RADIUS_KM, max_zoom=DEFAULT_MAX_ZOOM,
+                    min_zoom=0, server=OSM_TILE_SERVER, limiter=None):
+    """
+    Download the tiles around one position into the database.
+
+    Args:
+        connection (sqlite3.Connection): From open_tile_database()
+        lat, lon (float): Centre of the area
+        radius_km (float): Half the width of the square area
+        max_zoom, min_zoom (int): Zoom levels to download
+        server (str): Tile server URL template
+        limiter (RateLimiter): Shared rate limiter (default: DEFAULT_REQUESTS_PER_SECOND)
+
+    Returns:
+        dict: Counts of "downloaded", "skipped" (already stored) and "failed" tiles
+    """
+    limiter = limiter or RateLimiter(DEFAULT_REQUESTS_PER_SECOND)
+    max_zoom = min(max_zoom, OSM_MAX_ZOOM)
+    box = bounding_box(lat, lon, radius_km)
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+
+    # Tiles we already have (from an earlier, maybe interrupted, run)
+    stored = set(connection.execute(
+        "SELECT zoom, x, y FROM tiles WHERE server=? AND zoom BETWEEN ? AND ?;",
+        (server, min_zoom, max_zoom)))
+
+    for zoom, x, y in tiles_in_box(box, min_zoom, max_zoom):
+        if (zoom, x, y) in stored:
+            counts["skipped"] += 1
+            continue
+
+        limiter.wait()
+        url = server.replace("{x}", str(x)).replace("{y}", str(y)).replace("{z}", str(zoom))
+        try:
+            response = http_client.get(url, headers=HEADERS)
+        except Exception:
+            counts["failed"] += 1
+            continue
+        if response.status_code != 200 or not response.content:
+            counts["failed"] += 1
+            continue
+
+        connection.execute("INSERT OR REPLACE INTO tiles (zoom, x, y, server, tile_image) VALUES (?, ?, ?, ?, ?);",
+                           (zoom, x, y, server, response.content))
+        stored.add((zoom, x, y))
+        counts["downloaded"] += 1
+        if counts["downloaded"] % COMMIT_EVERY == 0:
+            connection.commit()
+
+    # Remember the finished area the same way TkinterMapView's loader does
+    if counts["failed"] == 0:
+        connection.execute("INSERT OR IGNORE INTO sections (position_a, position_b, zoom_a, zoom_b, server) "
+                           "VALUES (?, ?, ?, ?, ?);",
+                           (str(box[:2]), str(box[2:]), min_zoom, max_zoom, server))
+    connection.commit()
+    return counts
+
+
+def download_region_packs(cities=None, radius_km=DEFAULT_RADIUS_KM, max_zoom=DEFAULT_MAX_ZOOM, min_zoom=0,
+                          db_path=OFFLINE_TILE_DB, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                          server=OSM_TILE_SERVER, progress=None):
+    """
+    Download an offline region pack for each city.
+
+    Args:
+        cities (list): City names (default: every city in the search history)
+        radius_km (float): Half the width of the square area around each city
+        max_zoom, min_zoom (int): Zoom levels to download
+        db_path (str): Offline tile database
+        requests_per_second (float): Download speed limit (0 for no limit)
+        server (str): Tile server URL template
+        progress (callable): Called as progress(city, counts) after each city
+
+    Returns:
+        dict: Totals for "downloaded", "skipped" and "failed" tiles, plus
+              "cities" (packed) and "unknown_cities" (couldn't be found)
+    """
+    if cities is None:
+        cities = get_searched_cities()
+
+    summary = {"downloaded": 0, "skipped": 0, "failed": 0, "cities": [], "unknown_cities": []}
+    limiter = RateLimiter(requests_per_second)
+    connection = open_tile_database(db_path, server)
+    try:
+        for city in cities:
+            lat, lon = get_coordinates(city)
+            if lat is None or lon is None:
+                summary["unknown_cities"].append(city)
+                continue
+
+            counts = download_region(connection, lat, lon, radius_km, max_zoom, min_zoom, server, limiter)
+            for key in ("downloaded", "skipped", "failed"):
+                summary[key] += counts[key]
+            summary["cities"].append(city)
+            if progress:
+                progress(city, counts)
+    finally:
+        connection.close()
+    return summary
+
+
+def main():
+    """Download region packs from the command line."""
+    parser = argparse.ArgumentParser(description='Download offline map tiles around saved cities')
+    parser.add_argument('--city', action='append', dest='cities',
+                        help='City to download (repeatable; default: every searched city)')
+    parser.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM,
+                        help=f'Kilometres around each city (default: {DEFAULT_RADIUS_KM})')
+    parser.add_argument('--max-zoom', type=int, default=DEFAULT_MAX_ZOOM,
+                        help=f'Most detailed zoom level (default: {DEFAULT_MAX_ZOOM})')
+    parser.add_argument('--min-zoom', type=int, default=0,
+                        help='Least detailed zoom level (default: 0)')
+    parser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help=f'Tile downloads per second (default: {DEFAULT_REQUESTS_PER_SECOND})')
+    parser.add_argument('--db', default=OFFLINE_TILE_DB,
+                        help=f'Offline tile database (default: {OFFLINE_TILE_DB})')
+    args = parser.parse_args()
+
+    def show_progress(city, counts):
+        print(f"{city}: {counts['downloaded']} downloaded, {counts['skipped']} already stored, "
+              f"{counts['failed']} failed")
+
+    summary = download_region_packs(args.cities, args.radius, args.max_zoom, args.min_zoom,
+                                    args.db, args.rate, progress=show_progress)
+
+    print(f"Done: {summary['downloaded']} tiles downloaded for {len(summary['cities'])} cities")
+    if summary["unknown_cities"]:
+        print(f"Couldn't find: {', '.join(summary['unknown_cities'])}")
+    if summary["failed"]:
+        print(f"{summary['failed']} tiles failed - run again to retry them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Map Tile Cache
+==============
+
+Two-level cache used by the tile server so that panning back over an area
+doesn't download every tile again.
+
+Levels:
+1. Memory - an LRU (least recently used) cache holding the hottest tiles,
+   limited by total size in bytes
+2. Disk   - one PNG file per tile under data/tile_cache/, limited by total
+   size; the least recently used files are deleted first
+
+Kinds of tiles stored:
+- "base"     - raw OpenStreetMap tiles (change rarely, long TTL)
+- "overlay"  - raw weather overlay tiles (change often, short TTL)
+- "composed" - finished tiles we built ourselves (same TTL as overlays)
+- "processed" - toned-down overlays sent on their own (same TTL as overlays)
+- "frame_overlay" / "frame_tile" - the same for past time-lapse frames,
+  which never change, so they are kept longer
+
+Every entry remembers when it was saved, and is ignored once it is older
+than its kind's TTL (time to live).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Where tiles are stored on disk
+TILE_CACHE_DIR = "data/tile_cache"
+
+# How long each kind of tile stays valid (seconds)
+TILE_TTLS = {
+    "base": 7 * 24 * 3600,     # 7 days - streets don't move
+    "overlay": 10 * 60,        # 10 minutes - weather changes
+    "composed": 10 * 60,       # Built from overlays, so same as overlays
+    "processed": 10 * 60,      # Overlays after toning down, so same as overlays
+    "frame_overlay": 6 * 3600, # Time-lapse frames show the past, which doesn't change
+    "frame_tile": 6 * 3600,
+}
+
+# Size limits (bytes)
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024    # 32 MB in memory
+DISK_CACHE_BYTES = 256 * 1024 * 1024     # 256 MB on disk
+
+# When the disk is over its limit, delete down to this fraction of it
+DISK_EVICT_TARGET = 0.9
+
+
+class TileCache:
+    """Memory LRU + disk cache for map tiles."""
+
+    def __init__(self, directory=TILE_CACHE_DIR, memory_bytes=MEMORY_CACHE_BYTES,
+                 disk_bytes=DISK_CACHE_BYTES, ttls=None):
+        """
+        Create a tile cache.
+
+        Args:
+            directory (str): Folder for the disk level
+            memory_bytes (int): Size limit for the memory level
+            disk_bytes (int): Size limit for the disk level (0 turns the disk level off)
+            ttls (dict): TTL in seconds for each kind of tile
+        """
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttls = dict(TILE_TTLS, **(ttls or {}))
+
+        # Memory level: {key: (saved_at, data)} in least-recently-used order
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+        # Disk level: total size is measured the first time it is needed
+        self._disk_size = None
+        self._disk_lock = threading.Lock()
+
+        self._stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "stores": 0, "memory_evictions": 0, "disk_evictions": 0,
+        }
+
+    # KEYS AND PATHS
+
+    @staticmethod
+    def make_key(kind, layer, z, x, y, variant=""):
+        """
+        Build the cache key for a tile.
+
+        Args:
+            kind (str): "base", "overlay", "composed", "processed",
+                        "frame_overlay" or "frame_tile"
+            layer (str): Overlay layer name ("osm" for base tiles)
+            z, x, y (int): Tile coordinates
+            variant (str): Extra key part, e.g. a data version or frame time
+
+        Returns:
+            tuple: Hashable key
+        """
+        return (kind, layer, int(z), int(x), int(y), str(variant))
+
+    def _path(self, key):
+        """Get the disk path for a key."""
+        kind, layer, z, x, y, variant = key
+        name = f"{y}_{variant}.png" if variant else f"{y}.png"
+        return os.path.join(self.directory, kind, layer, str(z), str(x), name)
+
+    def _ttl(self, kind):
+        """Get the TTL for a kind of tile."""
+        return self.ttls.get(kind, self.ttls["overlay"])
+
+    def _count(self, field):
+        """Add one to a counter (lock must be held)."""
+        self._stats[field] += 1
+
+    # READING
+
+    def get(self, kind, layer, z, x, y, variant=""):
+        """
+        Look a tile up, memory first and then disk.
+
+        Args:
+            kind, layer, z, x, y, variant: See make_key()
+
+        Returns:
+            bytes: PNG data, or None if not cached or too old
+        """
+        key = self.make_key(kind, layer, z, x, y, variant)
+        ttl = self._ttl(kind)
+        now = time.time()
+
+        # Level 1: memory
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < ttl:
+                    self._memory.move_to_end(key)
+                    self._count("memory_hits")
+                    return entry[1]
+                # Too old
+                self._memory_remove(key)
+
+        # Level 2: disk
+        data, saved_at = self._disk_get(key, ttl, now)
+        with self._lock:
+            if data is None:
+                self._count("misses")
+                return None
+            self._count("disk_hits")
+            self._memory_put(key, saved_at, data)
+        return data
+
+    def _disk_get(self, key, ttl, now):
+        """
+        Read a tile file if it exists and is fresh enough.
+
+        Returns:
+            tuple: (data, saved_at), or (None, None)
+        """
+        if not self.disk_bytes:
+            return None, None
+
+        path = self._path(key)
+        try:
+            # A tile file's modified time is when it was saved, and its
+            # access time is when it was last used
+            saved_at = os.path.getmtime(path)
+            if now - saved_at >= ttl:
+                return None, None
+            with open(path, "rb") as f:
+                data = f.read()
+            # Touch the access time so eviction knows it was used recently
+            os.utime(path, (now, saved_at))
+            return data, saved_at
+        except OSError:
+            return None, None
+
+    # WRITING
+
+    def put(self, kind, layer, z, x, y, data, variant=""):
+        """
+        Store a tile in memory and on disk.
+
+        Args:
+            kind, layer, z, x, y, variant: See make_key()
+            data (bytes): PNG data
+        """
+        if not data:
+            return
+
+        key = self.make_key(kind, layer, z, x, y, variant)
+        now = time.time()
+
+        with self._lock:
+            self._count("stores")
+            self._memory_put(key, now, data)
+
+        self._disk_put(key, data, now)
+
+    def _memory_put(self, key, saved_at, data):
+        """Add an entry to the memory level, evicting old ones (lock must be held)."""
+        if len(data) > self.memory_bytes:
+            return
+
+        self._memory_remove(key)
+        self._memory[key] = (saved_at, data)
+        self._memory_size += len(data)
+
+        while self._memory_size > self.memory_bytes and self._memory:
+            oldest_key = next(iter(self._memory))
+            self._memory_remove(oldest_key)
+            self._count("memory_evictions")
+
+    def _memory_remove(self, key):
+        """Remove an entry from the memory level (lock must be held)."""
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[1])
+
+    def _disk_put(self, key, data, saved_at):
+        """Write a tile file, then evict old files if the disk level is too big."""
+        if not self.disk_bytes:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+
+            # Write to a temporary file first so readers never see half a tile
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            os.utime(path, (saved_at, saved_at))
+        except OSError:
+            return
+
+        with self._disk_lock:
+            if self._disk_size is None:
+                self._disk_size = self._measure_disk()
+            else:
+                self._disk_size += len(data) - old_size
+            needs_eviction = self._disk_size > self.disk_bytes
+
+        if needs_eviction:
+            self._evict_disk()
+
+    # DISK HOUSEKEEPING
+
+    def _list_files(self):
+        """
+        List every tile file on disk.
+
+        Returns:
+            list: (last_used_time, size, path) tuples
+        """
+        files = []
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((max(info.st_atime, info.st_mtime), info.st_size, path))
+        return files
+
+    def _measure_disk(self):
+        """Add up the size of every tile file on disk."""
+        return sum(size for _, size, _ in self._list_files())
+
+    def _evict_disk(self):
+        """Delete the least recently used tile files until under the target size."""
+        with self._disk_lock:
+            files = sorted(self._list_files())
+            total = sum(size for _, size, _ in files)
+            target = self.disk_bytes * DISK_EVICT_TARGET
+
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    with self._lock:
+                        self._count("disk_evictions")
+                except OSError:
+                    pass
+
+            self._disk_size = total
+
+    # MAINTENANCE AND STATS
+
+    def clear(self, include_disk=False):
+        """
+        Empty the cache.
+
+        Args:
+            include_disk (bool): Also delete the tile files on disk
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+
+        if include_disk:
+            with self._disk_lock:
+                for _, _, path in self._list_files():
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._disk_size = 0
+
+    def get_stats(self):
+        """
+        Get counters and sizes for the cache.
+
+        Returns:
+            dict: Hit/miss counters, entry counts, sizes and hit ratio
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+        with self._disk_lock:
+            stats["disk_bytes"] = self._disk_size
+
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else None
+        stats["memory_limit"] = self.memory_bytes
+        stats["disk_limit"] = self.disk_bytes
+        return stats
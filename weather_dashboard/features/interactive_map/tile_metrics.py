@@ -0,0 +1,243 @@
+"""
+Tile Server Metrics
+===================
+
+Counters and timings for the local tile server, so a slow map can be
+traced to its cause: the upstream tile services, our own CPU work
+(compositing and PNG encoding), or the cache.
+
+Key features:
+- Requests, statuses and bytes served per endpoint and layer
+- Finished-tile cache hits and misses per layer
+- Latency histograms for upstream downloads, base and overlay separately
+- Time histograms for compositing, PNG encoding and local layer rendering
+- Requests in flight right now, and the most seen at once
+- Plain dictionary for /stats and Prometheus text format for /metrics
+"""
+
+import threading
+import time
+
+
+# Histogram bucket upper limits (seconds)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Counts how many measurements fall at or below each bucket limit."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Add one measurement (caller holds the metrics lock)."""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for index, limit in enumerate(self.buckets):
+            if seconds <= limit:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        """
+        Get the bucket counts the way Prometheus expects them.
+
+        Returns:
+            list: (limit, measurements at or below limit) pairs, ending with "+Inf"
+        """
+        pairs = []
+        running = 0
+        for limit, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((limit, running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+    def snapshot(self):
+        """
+        Summarise the histogram.
+
+        Returns:
+            dict: count, average and max in milliseconds, and cumulative buckets
+        """
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "max_ms": round(self.max * 1000, 2),
+            "sum_seconds": round(self.total, 6),
+            "buckets": {str(limit): count for limit, count in self.cumulative()},
+        }
+
+
+class TileMetrics:
+    """All the tile server's counters, safe to update from many threads."""
+
+    UPSTREAM_KINDS = ("base", "overlay")
+    STAGES = ("compose", "encode", "render")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set every counter back to zero."""
+        with self._lock:
+            self.started_at = time.time()
+            self.requests = {}        # {(endpoint, layer): count}
+            self.statuses = {}        # {status_code: count}
+            self.bytes_served = 0
+            self.cache = {}           # {layer: {"hits": n, "misses": n}}
+            self.upstream = {kind: Histogram() for kind in self.UPSTREAM_KINDS}
+            self.upstream_errors = {kind: 0 for kind in self.UPSTREAM_KINDS}
+            self.stages = {stage: Histogram() for stage in self.STAGES}
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    # RECORDING
+
+    def request_started(self):
+        """A request arrived."""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self):
+        """A request is done (called even if it failed)."""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def record_response(self, endpoint, layer, status, size):
+        """
+        Count a response.
+
+        Args:
+            endpoint (str): Flask endpoint name (like "serve_overlay")
+            layer (str): Overlay layer, or None for endpoints without one
+            status (int): HTTP status code
+            size (int): Bytes in the response body
+        """
+        key = (endpoint or "unknown", layer or "-")
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes_served += size or 0
+
+    def record_cache(self, layer, hit):
+        """Count a finished-tile cache hit or miss for a layer."""
+        with self._lock:
+            counts = self.cache.setdefault(layer, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def observe_upstream(self, kind, seconds, ok=True):
+        """
+        Record how long an upstream download took.
+
+        Args:
+            kind (str): "base" or "overlay"
+            seconds (float): Time taken
+            ok (bool): False if the download failed
+        """
+        with self._lock:
+            self.upstream[kind].observe(seconds)
+            if not ok:
+                self.upstream_errors[kind] += 1
+
+    def observe_stage(self, stage, seconds):
+        """Record how long some CPU work ("compose", "encode" or "render") took."""
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    # REPORTING
+
+    def snapshot(self):
+        """
+        Get every metric as plain data (for /stats).
+
+        Returns:
+            dict: Requests, cache, upstream, stage timings and traffic
+        """
+        with self._lock:
+            layers = {}
+            for (endpoint, layer), count in self.requests.items():
+                layers.setdefault(layer, {})[endpoint] = count
+
+            cache = {}
+            for layer, counts in self.cache.items():
+                lookups = counts["hits"] + counts["misses"]
+                cache[layer] = dict(counts, hit_ratio=round(counts["hits"] / lookups, 3) if lookups else None)
+
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "requests": layers,
+                "statuses": {str(status): count for status, count in self.statuses.items()},
+                "bytes_served": self.bytes_served,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "cache": cache,
+                "upstream": {kind: dict(hist.snapshot(), errors=self.upstream_errors[kind])
+                             for kind, hist in self.upstream.items()},
+                "stages": {stage: hist.snapshot() for stage, hist in self.stages.items()},
+            }
+
+    def to_prometheus(self, tile_cache_stats=None):
+        """
+        Get every metric in Prometheus text format (for /metrics).
+
+        Args:
+            tile_cache_stats (dict): TileCache.get_stats(), added as gauges
+
+        Returns:
+            str: One metric per line
+        """
+        lines = []
+
+        def add(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        def add_histogram(name, help_text, histograms, label):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in histograms.items():
+                for limit, count in hist.cumulative():
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{limit}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {hist.total}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+        with self._lock:
+            add("tile_requests_total", "counter", "Tile server requests by endpoint and layer",
+                [({"endpoint": endpoint, "layer": layer}, count)
+                 for (endpoint, layer), count in sorted(self.requests.items())])
+            add("tile_responses_total", "counter", "Responses by HTTP status",
+                [({"status": status}, count) for status, count in sorted(self.statuses.items())])
+            add("tile_bytes_served_total", "counter", "Bytes sent to the map", [({}, self.bytes_served)])
+            add("tile_requests_in_flight", "gauge", "Requests being handled right now", [({}, self.in_flight)])
+            add("tile_cache_lookups_total", "counter", "Finished-tile cache lookups by layer and result",
+                [({"layer": layer, "result": result}, counts[result])
+                 for layer, counts in sorted(self.cache.items()) for result in ("hits", "misses")])
+            add_histogram("tile_upstream_seconds", "Upstream tile download time", self.upstream, "kind")
+            add("tile_upstream_errors_total", "counter", "Failed upstream downloads",
+                [({"kind": kind}, count) for kind, count in self.upstream_errors.items()])
+            add_histogram("tile_stage_seconds", "CPU time spent compositing, encoding and rendering", self.stages, "stage")
+
+        if tile_cache_stats:
+            add("tile_store_entries", "gauge", "Tiles held in the memory cache",
+                [({}, tile_cache_stats.get("memory_entries", 0))])
+            add("tile_store_bytes", "gauge", "Bytes held by the tile cache",
+                [({"level": "memory"}, tile_cache_stats.get("memory_bytes", 0)),
+                 ({"level": "disk"}, tile_cache_stats.get("disk_bytes") or 0)])
+            add("tile_store_hits_total", "counter", "Tile cache hits by level",
+                [({"level": "memory"}, tile_cache_stats.get("memory_hits", 0)),
+                 ({"level": "disk"}, tile_cache_stats.get("disk_hits", 0))])
+            add("tile_store_misses_total", "counter", "Tile cache misses",
+                [({}, tile_cache_stats.get("misses", 0))])
+
+        return "\n".join(lines) + "\n"
@@ -7,23 +7,49 @@ Local Flask server that combines OpenStreetMap base tiles with weather overlay d
 Features:
 - Real-time tile composition merging base maps with weather layers
 - Support for multiple weather data types (temperature, wind, precipitation, etc.)
-- Dynamic image processing with brightness and contrast adjustments
+- Brightness and contrast applied together in one lookup-table pass
 - Transparent overlay blending for optimal weather data visibility
 - Error handling for missing tiles or failed API requests
 - Configurable weather data source integration
-- High-performance image caching and processing
+- Two-level (memory + disk) cache for base, overlay and finished tiles
+- Base and overlay tiles downloaded at the same time over pooled connections
+- Threaded server, so the dozens of tiles in one map view load in parallel
+- Overlay-only endpoint, so the map widget can layer weather on top of
+  base tiles it downloads and caches itself
+- Background prefetching of the tiles around the view and one zoom level
+  in and out, so the first pan or zoom comes from the cache
+- Time-lapse frames: every frame cached separately, and all frames of
+  the visible tiles prepared in the background before playback
+- Started once, on demand, with a /health readiness check and a clean shutdown
+- Locally drawn "temp_local" layer, interpolated from city temperatures
+  we already fetched (see local_overlay.py)
+- /stats (JSON) and /metrics (Prometheus) show request counts, cache hit
+  ratios, upstream latency and compose/encode time
 
 The server runs locally to provide seamless weather overlay integration
 without external dependencies during map navigation.
+
+Set TILE_SERVER_PORT in .env to choose the port (0 picks any free port).
 """
 
-from flask import Flask, send_file
-import requests
+from flask import Flask, send_file, request, has_request_context
 from io import BytesIO
-from PIL import Image, ImageEnhance
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from PIL import Image, ImageStat
+from functools import lru_cache
+from werkzeug.serving import make_server
+import math
 import os
+import threading
+import time
+import requests
 from dotenv import load_dotenv
 
+from weather_dashboard.config import http_client
+from weather_dashboard.features.interactive_map.tile_cache import TileCache
+from weather_dashboard.features.interactive_map.tile_metrics import TileMetrics
+from weather_dashboard.features.interactive_map import local_overlay
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -43,6 +69,352 @@ HEADERS = {
     "User-Agent": "MyWeatherApp/1.0"
 }
 
+# Where the server listens. Port 0 means "any free port".
+TILE_SERVER_HOST = "127.0.0.1"
+TILE_SERVER_PORT = int(os.getenv("TILE_SERVER_PORT", "5005"))
+
+# The one running server (see start_tile_server)
+_server = None
+_server_thread = None
+_server_lock = threading.Lock()
+
+# Cache for downloaded and finished tiles (memory + disk)
+tile_cache = TileCache()
+
+# Request counts and timings, reported by /stats and /metrics
+metrics = TileMetrics()
+
+# How the overlay is toned down before it is drawn on the map
+OVERLAY_BRIGHTNESS = 0.3  # 30% of original brightness
+OVERLAY_CONTRAST = 0.8    # 80% of original contrast
+
+# PNG compression for tiles we encode: 0 (none, fastest) to 9 (smallest, slowest).
+# Tiles are only sent to this computer, so fast beats small.
+PNG_COMPRESS_LEVEL = int(os.getenv("TILE_PNG_COMPRESS_LEVEL", "1"))
+
+# Worker threads for downloading overlay tiles while the base tile downloads.
+# Sized to match the connection pools for the tile hosts in http_client.
+UPSTREAM_WORKERS = 16
+_upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="tile-upstream")
+
+# Worker threads for prefetching. Kept small so prefetching never takes
+# connections or CPU away from tiles the map is waiting for.
+PREFETCH_WORKERS = 2
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="tile-prefetch")
+
+# Time-lapse: how many frames, how far apart (seconds), and the worker
+# threads that prepare them before playback starts
+FRAME_COUNT = 6
+FRAME_STEP = 3600
+FRAME_WORKERS = 8
+_frame_executor = ThreadPoolExecutor(max_workers=FRAME_WORKERS, thread_name_prefix="tile-frames")
+
+# Goes up by one for every new prefetch, so older queued work can be skipped
+_prefetch_generation = 0
+_prefetch_lock = threading.Lock()
+
+# Size of one map tile in pixels
+TILE_SIZE = 256
+
+
+def png_response(data):
+    """Send PNG bytes back to the map widget."""
+    return send_file(BytesIO(data), mimetype='image/png')
+
+
+def fetch_base_tile(z, x, y):
+    """
+    Get an OpenStreetMap base tile, from the cache if possible.
+    
+    Returns:
+        bytes: PNG data, or None if it couldn't be downloaded
+    """
+    cached = tile_cache.get("base", "osm", z, x, y)
+    if cached is not None:
+        return cached
+    
+    osm_url = OSM_BASE_TILE_URL.format(z=z, x=x, y=y)
+    started = time.perf_counter()
+    try:
+        base_resp = http_client.get(osm_url, headers=HEADERS)
+    except Exception:
+        metrics.observe_upstream("base", time.perf_counter() - started, ok=False)
+        raise
+    metrics.observe_upstream("base", time.perf_counter() - started, ok=base_resp.status_code == 200)
+    if base_resp.status_code != 200:
+        app.logger.error(f"Failed to fetch OSM base tile {osm_url}: {base_resp.status_code}")
+        return None
+    
+    tile_cache.put("base", "osm", z, x, y, base_resp.content)
+    return base_resp.content
+
+
+def layer_version(layer, frame=None):
+    """
+    Get the data version cached tiles of a layer belong to.
+    
+    Remote layers have none (their tiles just expire), while the locally
+    drawn layer changes version whenever new temperatures arrive.
+    Time-lapse frames add their timestamp, so every frame is cached separately.
+    """
+    version = ""
+    if layer == local_overlay.LOCAL_TEMP_LAYER:
+        version = local_overlay.get_data_version()
+    if frame is not None:
+        version += f"t{frame}"
+    return version
+
+
+def fetch_overlay_tile(layer, z, x, y, frame=None):
+    """
+    Get a weather overlay tile, from the cache if possible.
+    
+    The "temp_local" layer is drawn here from temperatures we already
+    have, instead of being downloaded.
+    
+    Args:
+        layer (str): Overlay layer name
+        z, x, y (int): Tile coordinates
+        frame (int): Unix time of a time-lapse frame (None for the latest weather)
+    
+    Returns:
+        bytes: PNG data, or None if it couldn't be downloaded
+    """
+    variant = layer_version(layer, frame)
+    cached = tile_cache.get("overlay", layer, z, x, y, variant)
+    if cached is not None:
+        if layer == local_overlay.LOCAL_TEMP_LAYER and cached == transparent_tile():
+            # Remembered as "no city near this tile"
+            return None
+        return cached
+    
+    if layer == local_overlay.LOCAL_TEMP_LAYER:
+        started = time.perf_counter()
+        rendered = local_overlay.render_tile(z, x, y)
+        metrics.observe_stage("render", time.perf_counter() - started)
+        # Empty tiles are cached too (as a transparent tile), so panning over
+        # places with no searched city doesn't draw them again every time
+        tile_cache.put("overlay", layer, z, x, y,
+                       rendered if rendered is not None else transparent_tile(), variant)
+        return rendered
+    
+    overlay_url = f"{weatherdb_tile_url}/{layer}/{z}/{x}/{y}.png?appid={weatherdb_api_key}"
+    if frame is not None:
+        # Ask the weather service for the map at that moment
+        overlay_url += f"&date={frame}"
+    started = time.perf_counter()
+    try:
+        overlay_resp = http_client.get(overlay_url, headers=HEADERS)
+    except Exception as e:
+        # Overlay service unreachable - the caller falls back to the base map
+        metrics.observe_upstream("overlay", time.perf_counter() - started, ok=False)
+        app.logger.error(f"Failed to fetch overlay tile {layer}/{z}/{x}/{y}: {e}")
+        return None
+    # A 404 just means no weather data for this tile, not a failure
+    metrics.observe_upstream("overlay", time.perf_counter() - started,
+                             ok=overlay_resp.status_code in (200, 404))
+    if overlay_resp.status_code != 200:
+        return None
+    
+    tile_cache.put("overlay", layer, z, x, y, overlay_resp.content, variant)
+    return overlay_resp.content
+
+
+@lru_cache(maxsize=256)
+def _overlay_lut(mean):
+    """
+    Build the lookup table that darkens and flattens an overlay in one pass.
+    
+    It gives the same result as ImageEnhance.Brightness(0.3) followed by
+    ImageEnhance.Contrast(0.8), which would each go over the whole image:
+        darker = value * brightness
+        result = mean + (darker - mean) * contrast
+    
+    Args:
+        mean (int): Average grey level of the darkened overlay
+                    (contrast pulls every value towards it)
+    
+    Returns:
+        list: 1024 entries - one table each for R, G, B, and A (unchanged)
+    """
+    channel = [
+        max(0, min(255, int(mean + (value * OVERLAY_BRIGHTNESS - mean) * OVERLAY_CONTRAST + 0.5)))
+        for value in range(256)
+    ]
+    return channel * 3 + list(range(256))
+
+
+def process_overlay(overlay_data):
+    """
+    Decode an overlay tile and tone it down for drawing on the map.
+    
+    Args:
+        overlay_data (bytes): Overlay PNG from the weather service
+    
+    Returns:
+        PIL.Image: Processed RGBA overlay (transparency kept)
+    """
+    overlay_img = Image.open(BytesIO(overlay_data)).convert("RGBA")
+    
+    # Average grey level after darkening, which is what contrast works around
+    mean_grey = ImageStat.Stat(overlay_img.convert("L")).mean[0] * OVERLAY_BRIGHTNESS
+    return overlay_img.point(_overlay_lut(int(mean_grey + 0.5)))
+
+
+def encode_png(img):
+    """Encode an image as PNG bytes using the configured compression level."""
+    started = time.perf_counter()
+    output = BytesIO()
+    img.save(output, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    metrics.observe_stage("encode", time.perf_counter() - started)
+    return output.getvalue()
+
+
+def compose_tile(base_data, overlay_data, tone_down=True):
+    """
+    Draw a processed weather overlay on top of a base map tile.
+    
+    Args:
+        base_data (bytes): Base map PNG
+        overlay_data (bytes): Overlay PNG
+        tone_down (bool): Darken the overlay first (False for overlays that
+                          already have their final colours)
+    
+    Returns:
+        bytes: Combined PNG
+    """
+    started = time.perf_counter()
+    # RGBA mode allows transparency
+    base_img = Image.open(BytesIO(base_data)).convert("RGBA")
+    if tone_down:
+        final_overlay = process_overlay(overlay_data)
+    else:
+        final_overlay = Image.open(BytesIO(overlay_data)).convert("RGBA")
+    
+    # alpha_composite blends the two images in a single C pass
+    if final_overlay.size != base_img.size:
+        final_overlay = final_overlay.resize(base_img.size)
+    composed = Image.alpha_composite(base_img, final_overlay)
+    metrics.observe_stage("compose", time.perf_counter() - started)
+    return encode_png(composed)
+
+
+@lru_cache(maxsize=1)
+def transparent_tile():
+    """PNG bytes for an empty, fully transparent tile."""
+    return encode_png(Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0)))
+
+
+def _record_cache(layer, hit):
+    """Count a finished-tile cache hit or miss (only for real requests, not prefetching)."""
+    if has_request_context():
+        metrics.record_cache(layer, hit)
+
+
+def get_processed_overlay(layer, z, x, y, frame=None):
+    """
+    Get the toned-down, transparent overlay for a tile, from the cache if possible.
+    
+    Args:
+        frame (int): Unix time of a time-lapse frame (None for the latest weather)
+    
+    Returns:
+        bytes: PNG data, or None if the weather service has no tile here
+    """
+    kind = "processed" if frame is None else "frame_overlay"
+    variant = layer_version(layer, frame)
+    processed = tile_cache.get(kind, layer, z, x, y, variant)
+    _record_cache(layer, processed is not None)
+    if processed is not None:
+        return processed
+    
+    overlay_data = fetch_overlay_tile(layer, z, x, y, frame)
+    if overlay_data is None:
+        return None
+    
+    if layer == local_overlay.LOCAL_TEMP_LAYER:
+        # Drawn here with its own colours and transparency - the darkening
+        # is only meant for the weather service's bright tiles
+        processed = overlay_data
+    else:
+        started = time.perf_counter()
+        overlay_img = process_overlay(overlay_data)
+        metrics.observe_stage("compose", time.perf_counter() - started)
+        processed = encode_png(overlay_img)
+    tile_cache.put(kind, layer, z, x, y, processed, variant)
+    return processed
+
+
+def get_composed_tile(layer, z, x, y, frame=None):
+    """
+    Get a base map tile with the weather overlay drawn in, from the cache if possible.
+    
+    Args:
+        frame (int): Unix time of a time-lapse frame (None for the latest weather)
+    
+    Returns:
+        bytes: PNG data (the plain base tile if there is no overlay),
+               or None if the base tile couldn't be downloaded
+    """
+    # Step 0: If we built this exact tile recently, send it straight back
+    kind = "composed" if frame is None else "frame_tile"
+    variant = layer_version(layer, frame)
+    composed = tile_cache.get(kind, layer, z, x, y, variant)
+    _record_cache(layer, composed is not None)
+    if composed is not None:
+        return composed
+    
+    # Step 1: Start downloading the weather overlay tile in the background,
+    # and get the basic map tile from OpenStreetMap at the same time
+    overlay_future = _upstream_executor.submit(fetch_overlay_tile, layer, z, x, y, frame)
+    base_data = fetch_base_tile(z, x, y)
+    
+    # Check if we successfully got the base map tile
+    if base_data is None:
+        return None
+
+    # Step 2: Wait for the weather overlay tile
+    overlay_data = overlay_future.result()
+    
+    # If we can't get weather data, send the base map exactly as
+    # OpenStreetMap gave it to us - no need to decode and re-encode it
+    if overlay_data is None:
+        return base_data
+
+    # Step 3: Darken the overlay and draw it on the base map
+    composed = compose_tile(base_data, overlay_data, tone_down=layer != local_overlay.LOCAL_TEMP_LAYER)
+
+    # Step 4: Remember the combined tile
+    tile_cache.put(kind, layer, z, x, y, composed, variant)
+    return composed
+
+
+@app.route('/overlay/<layer>/<int:z>/<int:x>/<int:y>.png')
+def serve_overlay(layer, z, x, y):
+    """
+    Send only the toned-down, transparent weather overlay for a tile.
+    
+    The map widget draws this on top of the base map it downloaded itself,
+    so base tiles never pass through this server in this mode.
+    
+    Parameters:
+    - layer: type of weather data (temp, wind, etc.)
+    - z: zoom level
+    - x, y: tile coordinates on the map grid
+    """
+    try:
+        processed = get_processed_overlay(layer, z, x, y)
+        
+        # No weather data here - an empty tile leaves the map underneath visible
+        if processed is None:
+            return png_response(transparent_tile())
+        return png_response(processed)
+    
+    except Exception as e:
+        app.logger.error(f"Error processing overlay tile: {e}")
+        return png_response(transparent_tile())
+
+
 @app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.png')
 def serve_tile(layer, z, x, y):
     """
@@ -54,62 +426,362 @@ def serve_tile(layer, z, x, y):
     - x, y: tile coordinates on the map grid
     """
     try:
-        # Step 1: Get the basic map tile from OpenStreetMap
-        osm_url = OSM_BASE_TILE_URL.format(z=z, x=x, y=y)
-        base_resp = requests.get(osm_url, headers=HEADERS)
+        composed = get_composed_tile(layer, z, x, y)
         
         # Check if we successfully got the base map tile
-        if base_resp.status_code != 200:
-            app.logger.error(f"Failed to fetch OSM base tile {osm_url}: {base_resp.status_code}")
+        if composed is None:
             return "Base tile not found", 404
-        
-        # Convert the base tile image data into a PIL Image object
-        # RGBA mode allows transparency
-        base_img = Image.open(BytesIO(base_resp.content)).convert("RGBA")
+        return png_response(composed)
 
-        # Step 2: Get the weather overlay tile
-        overlay_url = f"{weatherdb_tile_url}/{layer}/{z}/{x}/{y}.png?appid={weatherdb_api_key}"
-        overlay_resp = requests.get(overlay_url, headers=HEADERS)
+    except Exception as e:
+        # If anything goes wrong, log the error and return an error message
+        app.logger.error(f"Error merging tiles: {e}")
+        return "Internal Server Error", 500
+
+
+@app.route('/frames/overlay/<layer>/<int:frame>/<int:z>/<int:x>/<int:y>.png')
+def serve_frame_overlay(layer, frame, z, x, y):
+    """Send the transparent overlay for one time-lapse frame (see serve_overlay)."""
+    try:
+        processed = get_processed_overlay(layer, z, x, y, frame)
+        return png_response(processed if processed is not None else transparent_tile())
+    except Exception as e:
+        app.logger.error(f"Error processing frame tile: {e}")
+        return png_response(transparent_tile())
+
+
+@app.route('/frames/tiles/<layer>/<int:frame>/<int:z>/<int:x>/<int:y>.png')
+def serve_frame_tile(layer, frame, z, x, y):
+    """Send the finished tile for one time-lapse frame (see serve_tile)."""
+    try:
+        composed = get_composed_tile(layer, z, x, y, frame)
+        if composed is None:
+            return "Base tile not found", 404
+        return png_response(composed)
+    except Exception as e:
+        app.logger.error(f"Error merging frame tiles: {e}")
+        return "Internal Server Error", 500
+
+
+# METRICS
+
+@app.before_request
+def _start_request_metrics():
+    """Count the request as in flight."""
+    metrics.request_started()
+
+
+@app.after_request
+def _record_response_metrics(response):
+    """Count the response for its endpoint and layer."""
+    layer = (request.view_args or {}).get("layer")
+    metrics.record_response(request.endpoint, layer, response.status_code, response.content_length)
+    return response
+
+
+@app.teardown_request
+def _finish_request_metrics(error=None):
+    """The request is done, even if it failed."""
+    metrics.request_finished()
+
+
+@app.route('/stats')
+def stats():
+    """Tile server metrics and tile cache statistics as JSON."""
+    snapshot = metrics.snapshot()
+    snapshot["tile_cache"] = tile_cache.get_stats()
+    return snapshot
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Tile server metrics in Prometheus text format."""
+    text = metrics.to_prometheus(tile_cache.get_stats())
+    return text, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+# PREFETCHING
+
+def tiles_around(lat, lon, zoom, width=600, height=350, ring=1, zoom_levels=1, max_zoom=22):
+    """
+    List the tiles a map view shows, plus the tiles just outside it.
+    
+    Args:
+        lat, lon (float): Centre of the map view
+        zoom (int): Current zoom level
+        width, height (int): Size of the map view in pixels
+        ring (int): Extra rows/columns of tiles around the view
+        zoom_levels (int): Also include this many zoom levels in and out
+        max_zoom (int): Highest zoom level that has tiles
+    
+    Returns:
+        list: (z, x, y) tuples - the current zoom level first, then zoomed in,
+              then zoomed out; nearest the centre first within each level
+    """
+    zoom = int(zoom)
+    levels = [zoom]
+    for step in range(1, zoom_levels + 1):
+        levels += [zoom + step, zoom - step]
+    
+    lat = max(-85.0511, min(85.0511, lat))  # Web map tiles stop at about 85 degrees
+    tiles = []
+    for z in levels:
+        if z < 0 or z > max_zoom:
+            continue
+        n = 2 ** z
+        
+        # Centre of the view in tile units (Web Mercator)
+        centre_x = (lon + 180.0) / 360.0 * n
+        centre_y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
         
-        # If we can't get weather data, just return the basic map
-        if overlay_resp.status_code != 200:
-            output = BytesIO()
-            base_img.save(output, format="PNG")
-            output.seek(0)
-            return send_file(output, mimetype='image/png')
-
-        # Step 3: Process the weather overlay to make it darker and more visible
-        overlay_img = Image.open(BytesIO(overlay_resp.content)).convert("RGBA")
+        # How many tiles reach from the centre to each edge, plus the ring
+        reach_x = math.ceil(width / TILE_SIZE / 2) + ring
+        reach_y = math.ceil(height / TILE_SIZE / 2) + ring
         
-        # Make the overlay much darker (30% of original brightness)
-        enhancer = ImageEnhance.Brightness(overlay_img)
-        much_darker_overlay = enhancer.enhance(0.3)
+        level_tiles = set()
+        for dx in range(-reach_x, reach_x + 1):
+            for dy in range(-reach_y, reach_y + 1):
+                y = int(centre_y) + dy
+                if 0 <= y < n:
+                    # The world wraps around left to right
+                    level_tiles.add((z, (int(centre_x) + dx) % n, y))
         
-        # Also reduce contrast slightly for better visibility(80% of original contrast)
-        contrast_enhancer = ImageEnhance.Contrast(much_darker_overlay)
-        final_overlay = contrast_enhancer.enhance(0.8)
+        tiles += sorted(level_tiles, key=lambda t: (t[1] + 0.5 - centre_x) ** 2 + (t[2] + 0.5 - centre_y) ** 2)
+    return tiles
 
-        # Step 4: Combine the base map with the weather overlay
-        base_img.paste(final_overlay, (0, 0), final_overlay)
 
-        # Step 5: Send the combined image back to the map widget
-        output = BytesIO()  # Create a byte buffer to hold image data
-        base_img.save(output, format="PNG")  # Save the combined image as PNG
-        output.seek(0)  # Reset buffer position to beginning
-        return send_file(output, mimetype='image/png')  # Send the image
+def prefetch_tiles(layer, tiles, composed=False):
+    """
+    Warm the cache with tiles the user is likely to look at next.
+    
+    Runs in the background on a small pool of its own, so tiles the map is
+    actually showing are never stuck behind prefetching. Starting a new
+    prefetch cancels whatever is left of the previous one.
+    
+    Args:
+        layer (str): Overlay layer name ("none" prefetches nothing)
+        tiles (list): (z, x, y) tuples, most important first (see tiles_around)
+        composed (bool): Prefetch finished tiles for server-side compositing
+                         instead of overlay-only tiles
+    
+    Returns:
+        int: Number of tiles queued
+    """
+    global _prefetch_generation
+    
+    with _prefetch_lock:
+        _prefetch_generation += 1
+        generation = _prefetch_generation
+    
+    if not layer or layer == "none":
+        return 0
+    
+    build = get_composed_tile if composed else get_processed_overlay
+    for z, x, y in tiles:
+        _prefetch_executor.submit(_prefetch_one, generation, build, layer, z, x, y)
+    return len(tiles)
+
 
+def _prefetch_one(generation, build, layer, z, x, y):
+    """Prefetch one tile, unless a newer prefetch has replaced this one."""
+    if generation != _prefetch_generation:
+        return
+    try:
+        build(layer, z, x, y)
     except Exception as e:
-        # If anything goes wrong, log the error and return an error message
-        app.logger.error(f"Error merging tiles: {e}")
-        return "Internal Server Error", 500
+        # Prefetching is only a speed-up - the tile will be fetched when shown
+        app.logger.debug(f"Prefetch of {layer}/{z}/{x}/{y} failed: {e}")
 
-def start_tile_server(*args, **kwargs):
-    """Start the tile server on localhost port 5005"""
-    # Run the Flask server
-    # debug=False and use_reloader=False prevent issues when running in threads
-    app.run(host="127.0.0.1", port=5005, debug=False, use_reloader=False)
 
-# If this file is run directly (not imported), start the server
+# TIME-LAPSE
+
+def frame_timestamps(count=FRAME_COUNT, step=FRAME_STEP, now=None):
+    """
+    Get the times of the recent frames for a time-lapse, oldest first.
+    
+    Times are rounded down to whole steps, so every tile of a frame (and
+    every run within the same hour) uses the same cached tiles.
+    
+    Args:
+        count (int): Number of frames
+        step (int): Seconds between frames
+        now (float): Current Unix time (default: now)
+    
+    Returns:
+        list: Unix times (int)
+    """
+    now = time.time() if now is None else now
+    latest = int(now // step * step)
+    return [latest - step * (count - 1 - index) for index in range(count)]
+
+
+class FrameJob:
+    """Progress of a time-lapse prefetch (see prefetch_frames)."""
+    
+    def __init__(self, futures):
+        self.futures = futures
+    
+    def progress(self):
+        """
+        Count the frame tiles that are ready.
+        
+        Returns:
+            tuple: (tiles finished, total tiles)
+        """
+        return sum(future.done() for future in self.futures), len(self.futures)
+    
+    def done(self):
+        """True once every frame tile is ready."""
+        return all(future.done() for future in self.futures)
+    
+    def wait(self, timeout=None):
+        """
+        Wait until every frame tile is ready.
+        
+        Returns:
+            bool: True if everything finished within the timeout
+        """
+        finished, not_finished = wait_futures(self.futures, timeout=timeout)
+        return not not_finished
+    
+    def cancel(self):
+        """Drop the frame tiles that haven't started yet."""
+        for future in self.futures:
+            future.cancel()
+
+
+def prefetch_frames(layer, frames, tiles, composed=False):
+    """
+    Download and prepare every frame of a time-lapse before it plays.
+    
+    Args:
+        layer (str): Overlay layer name
+        frames (list): Unix times from frame_timestamps()
+        tiles (list): (z, x, y) tuples of the visible tiles
+        composed (bool): Prepare finished tiles (server-side compositing)
+                         instead of overlay-only tiles
+    
+    Returns:
+        FrameJob: Progress of the work, which runs in the background
+    """
+    build = get_composed_tile if composed else get_processed_overlay
+    futures = []
+    # Frame by frame, so the first frames are ready first
+    for frame in frames:
+        for z, x, y in tiles:
+            futures.append(_frame_executor.submit(_build_frame_tile, build, layer, z, x, y, frame))
+    return FrameJob(futures)
+
+
+def _build_frame_tile(build, layer, z, x, y, frame):
+    """Prepare one frame tile; a failure just leaves that tile empty during playback."""
+    try:
+        build(layer, z, x, y, frame)
+    except Exception as e:
+        app.logger.debug(f"Frame {frame} of {layer}/{z}/{x}/{y} failed: {e}")
+
+
+@app.route('/health')
+def health():
+    """Readiness check: answers as soon as the server can take tile requests."""
+    return {"status": "ok"}
+
+
+def start_tile_server(port=None):
+    """
+    Start the tile server in the background, once.
+    
+    Later calls don't start a second server - they just return the address
+    of the one already running, so opening the map page again is instant.
+    
+    Args:
+        port (int): Port to listen on (default: TILE_SERVER_PORT). If it is
+                    taken, a free port is used instead.
+    
+    Returns:
+        str: Base URL of the server, like "http://127.0.0.1:5005"
+    """
+    global _server, _server_thread
+    
+    with _server_lock:
+        if _server is not None:
+            return _server_url()
+        
+        if port is None:
+            port = TILE_SERVER_PORT
+        try:
+            # threaded=True handles every tile request on its own thread
+            server = make_server(TILE_SERVER_HOST, port, app, threaded=True)
+        except (OSError, SystemExit):
+            # Port already taken (maybe by another copy of the app) - let the system pick one.
+            # Werkzeug reports this by calling sys.exit(), so SystemExit is caught too.
+            app.logger.warning(f"Tile server port {port} is busy, using a free port instead")
+            server = make_server(TILE_SERVER_HOST, 0, app, threaded=True)
+        
+        # The socket is already listening here, so requests can't arrive too early
+        _server = server
+        _server_thread = threading.Thread(target=server.serve_forever, name="tile-server", daemon=True)
+        _server_thread.start()
+        return _server_url()
+
+
+def _server_url():
+    """Build the base URL of the running server (lock must be held)."""
+    return f"http://{TILE_SERVER_HOST}:{_server.server_port}"
+
+
+def get_tile_server_url():
+    """
+    Get the base URL of the running tile server.
+    
+    Returns:
+        str: Base URL, or None if the server isn't running
+    """
+    with _server_lock:
+        return _server_url() if _server is not None else None
+
+
+def is_tile_server_ready(timeout=1.0):
+    """
+    Check that the tile server is running and answering requests.
+    
+    Args:
+        timeout (float): Seconds to wait for the /health answer
+    
+    Returns:
+        bool: True if /health answered OK
+    """
+    url = get_tile_server_url()
+    if url is None:
+        return False
+    try:
+        # Plain requests: this must reach the real server even when HTTP
+        # recordings are being replayed
+        return requests.get(f"{url}/health", timeout=timeout).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def stop_tile_server():
+    """Shut the tile server down and wait for its thread (called when the app closes)."""
+    global _server, _server_thread
+    
+    with _server_lock:
+        server, thread = _server, _server_thread
+        _server, _server_thread = None, None
+    
+    if server is None:
+        return
+    server.shutdown()
+    server.server_close()
+    if thread is not None:
+        thread.join(timeout=5)
+
+
+# If this file is run directly (not imported), start the server and keep it running
 if __name__ == "__main__":
-    start_tile_server()
-    
\ No newline at end of file
+    print(f"Tile server running at {start_tile_server()}")
+    try:
+        _server_thread.join()
+    except KeyboardInterrupt:
+        stop_tile_server()
@@ -13,53 +13,35 @@ Key features:
 - All calculations work worldwide with any city name
 
 Data sources:
-- Sunrise-Sunset API
+- Open-Meteo city snapshot (shared with the rest of the app)
+- Sunrise-Sunset API (fallback)
 - Mathematical calculations for moon phases
 - Astronomical formulas for celestial positions
 """
 
-import requests
 import math
 import datetime
 from typing import Dict, Tuple, Optional
 
+from weather_dashboard.config import http_client
+from weather_dashboard.config.geocoding import get_coordinates
+from weather_dashboard.config.city_snapshot import fetch_city_snapshot, get_today_sun_times
+from weather_dashboard.config.single_flight import coalesce
+
 
 def get_coordinates_for_city(city: str) -> Tuple[Optional[float], Optional[float]]:
     """
     Get latitude and longitude coordinates for any city.
     
+    Uses the shared geocoding cache used by the rest of the app.
+    
     Args:
         city (str): Name of the city (like "London", "Tokyo", "New York")
         
     Returns:
         tuple: (latitude, longitude) as numbers, or (None, None) if city not found
     """
-    # Validate input
-    if not isinstance(city, str) or not city.strip():
-        return None, None
-    
-    try:
-        # Use the Open-Meteo geocoding API to find city coordinates
-        url = f"https://geocoding-api.open-meteo.com/v1/search?name={city}&count=1&language=en&format=json"
-        response = requests.get(url, timeout=10)  # 10 second timeout
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", [])
-            
-            # Extract coordinates from the first result
-            if results:
-                lat = results[0].get("latitude")
-                lon = results[0].get("longitude")
-                return lat, lon
-        
-        # If we get here, city wasn't found
-        return None, None
-        
-    except Exception as e:
-        # If anything goes wrong, return None
-        return None, None
+    return get_coordinates(city)
 
 
 def fetch_sun_moon_data(city: str) -> Dict:
@@ -81,6 +63,22 @@ def fetch_sun_moon_data(city: str) -> Dict:
             - whether it's currently daytime
             - error information if something went wrong            
     """
+    # The sun/moon page and its auto-refresh can ask at the same time,
+    # so share one request between them
+    request_key = {"city": str(city).strip().lower()}
+    return coalesce("sunrise_sunset", request_key, _request_sun_moon_data, city)
+
+
+def _request_sun_moon_data(city: str) -> Dict:
+    """
+    Geocode the city and download sunrise/sunset data (see fetch_sun_moon_data).
+    
+    Args:
+        city (str): Name of the city to get data for
+        
+    Returns:
+        dict: Complete astronomical data, or fallback data on failure
+    """
     # Step 1: Get city coordinates
     lat, lon = get_coordinates_for_city(city)
     
@@ -89,41 +87,45 @@ def fetch_sun_moon_data(city: str) -> Dict:
         return get_fallback_data()
     
     try:
-        # Step 3: Get sunrise/sunset data from the Sunrise-Sunset API
-        url = f"https://api.sunrise-sunset.org/json?lat={lat}&lng={lon}&formatted=0"
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            results = data.get("results", {})
+        # Step 3: Use sunrise/sunset from the shared Open-Meteo city snapshot.
+        # The main weather display has usually just downloaded it.
+        results = get_today_sun_times(fetch_city_snapshot(city))
+        
+        # Step 4: If the snapshot isn't available, ask the Sunrise-Sunset API
+        if results is None:
+            url = f"https://api.sunrise-sunset.org/json?lat={lat}&lng={lon}&formatted=0"
+            response = http_client.get(url)
             
-            # Step 4: Calculate additional astronomical data
-            sun_position = calculate_sun_position(lat, lon)
-            moon_phase = calculate_moon_phase()
-            moon_position = calculate_moon_position(lat, lon)
-            is_day = is_currently_daytime(results.get("sunrise"), results.get("sunset"))
+            if response.status_code != 200:
+                # If API request failed, return fallback data
+                return get_fallback_data(f"API returned status {response.status_code}")
             
-            # Step 5: Return comprehensive astronomical data
-            return {
-                "city": city,
-                "latitude": lat,
-                "longitude": lon,
-                "sunrise": results.get("sunrise"),
-                "sunset": results.get("sunset"),
-                "solar_noon": results.get("solar_noon"),
-                "day_length": results.get("day_length"),
-                "sun_position": sun_position,
-                "moon_phase": moon_phase,
-                "moon_phase_name": get_moon_phase_name(moon_phase),
-                "moon_illumination": calculate_moon_illumination(moon_phase),
-                "moon_position": moon_position,
-                "is_daytime": is_day,
-                "current_time": datetime.datetime.now().isoformat(),
-                "error": None
-            }
-        
-        # If API request failed, return fallback data
-        return get_fallback_data(f"API returned status {response.status_code}")
+            results = response.json().get("results", {})
+        
+        # Step 5: Calculate additional astronomical data
+        sun_position = calculate_sun_position(lat, lon)
+        moon_phase = calculate_moon_phase()
+        moon_position = calculate_moon_position(lat, lon)
+        is_day = is_currently_daytime(results.get("sunrise"), results.get("sunset"))
+        
+        # Step 6: Return comprehensive astronomical data
+        return {
+            "city": city,
+            "latitude": lat,
+            "longitude": lon,
+            "sunrise": results.get("sunrise"),
+            "sunset": results.get("sunset"),
+            "solar_noon": results.get("solar_noon"),
+            "day_length": results.get("day_length"),
+            "sun_position": sun_position,
+            "moon_phase": moon_phase,
+            "moon_phase_name": get_moon_phase_name(moon_phase),
+            "moon_illumination": calculate_moon_illumination(moon_phase),
+            "moon_position": moon_position,
+            "is_daytime": is_day,
+            "current_time": datetime.datetime.now().isoformat(),
+            "error": None
+        }
         
     except Exception as e:
         # If anything goes wrong, return fallback data with error message
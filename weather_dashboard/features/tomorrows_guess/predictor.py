@@ -20,7 +20,7 @@ The prediction algorithm:
 - Handles missing or invalid data gracefully
 """
 
-from features.history_tracker.api import fetch_world_history
+from weather_dashboard.features.history_tracker.api import fetch_world_history
 
 
 def get_tomorrows_prediction(city):
@@ -17,7 +17,8 @@ Key responsibilities:
 import tkinter as tk
 from PIL import Image, ImageTk
 from io import BytesIO
-import requests
+
+from weather_dashboard.config import http_client
 
 
 class WeatherDisplay:
@@ -226,7 +227,7 @@ class WeatherDisplay:
             url = f"http://openweathermap.org/img/wn/{icon_code}@2x.png"
             
             # Download the icon image
-            response = requests.get(url, timeout=5)  # 5 second timeout
+            response = http_client.get(url, timeout=5)  # 5 second timeout
             response.raise_for_status()  # Raise exception if download failed
             
             # Convert downloaded data to an image
@@ -338,7 +339,7 @@ class WeatherDisplay:
             self._clear_history_labels()
             
             # Get historical weather data from our API
-            from features.history_tracker.api import fetch_world_history
+            from weather_dashboard.features.history_tracker.api import fetch_world_history
             history_data = fetch_world_history(city)
             
             # Check if we got valid historical data
@@ -209,6 +209,9 @@ TRANSLATIONS = {
         "network_error": "Network error",
         "try_again": "Try again",
         "refresh": "Refresh",
+        "timelapse_play": "Play Time-lapse",
+        "timelapse_stop": "Stop Time-lapse",
+        "timelapse_loading": "Loading frames...",
         "visible": "Visible",
         "unknown": "Unknown",
         "unknown_error": "Unknown error occurred",
@@ -254,6 +257,7 @@ TRANSLATIONS = {
         "overlay_pressure": "Atmospheric Pressure",
         "overlay_snow": "Snow Cover",
         "overlay_dewpoint": "Dew Point",
+        "overlay_local_temperature": "Temperature (Local)",
         
         # Map Information Panel
         "map_information": "Map Information",
@@ -305,6 +309,10 @@ TRANSLATIONS = {
         "dewpoint_overlay_desc": "Shows dew point temperatures across the map region. Indicates humidity comfort levels and potential for fog or moisture formation.",
         "dewpoint_overlay_features": "• Humidity comfort mapping\n• Fog formation prediction\n• Moisture level visualization\n• Air quality correlation data",
         
+        "local_temperature_overlay_info": "Local Temperature Overlay",
+        "local_temperature_overlay_desc": "Drawn on this computer from the current temperatures of your saved cities. Temperatures between cities are estimated from the nearest ones, and the colors fade out far away from any city.",
+        "local_temperature_overlay_features": "• Works without the weather tile service\n• Uses weather the app already downloaded\n• Updates when new temperatures arrive\n• Available at every zoom level",
+        
         # Map Error Messages
         "map_loading_error": "Error loading map",
         "overlay_loading_error": "Error loading weather overlay",
@@ -525,6 +533,9 @@ TRANSLATIONS = {
         "network_error": "Error de red",
         "try_again": "Intentar de nuevo",
         "refresh": "Actualizar",
+        "timelapse_play": "Reproducir Secuencia",
+        "timelapse_stop": "Detener Secuencia",
+        "timelapse_loading": "Cargando fotogramas...",
         "visible": "Visible",
         "unknown": "Desconocido",
         "unknown_error": "Error desconocido ocurrido",
@@ -577,6 +588,7 @@ TRANSLATIONS = {
         "overlay_pressure": "Presión Atmosférica",
         "overlay_snow": "Cobertura de Nieve",
         "overlay_dewpoint": "Punto de Rocío",
+        "overlay_local_temperature": "Temperatura (Local)",
         
         # Map Information Panel
         "map_information": "Información del Mapa",
@@ -628,6 +640,10 @@ TRANSLATIONS = {
         "dewpoint_overlay_desc": "Muestra temperaturas de punto de rocío en toda la región del mapa. Indica niveles de comodidad de humedad y potencial para formación de niebla o humedad.",
         "dewpoint_overlay_features": "• Mapeo de comodidad de humedad\n• Predicción de formación de niebla\n• Visualización de nivel de humedad\n• Datos de correlación de calidad del aire",
         
+        "local_temperature_overlay_info": "Superposición de Temperatura Local",
+        "local_temperature_overlay_desc": "Se dibuja en este equipo a partir de la temperatura actual de tus ciudades guardadas. Entre ciudades, la temperatura se estima a partir de las más cercanas, y los colores se desvanecen lejos de cualquier ciudad.",
+        "local_temperature_overlay_features": "• Funciona sin el servicio de mosaicos meteorológicos\n• Usa datos que la aplicación ya descargó\n• Se actualiza al llegar nuevas temperaturas\n• Disponible en todos los niveles de zoom",
+        
         # Map Error Messages
         "map_loading_error": "Error al cargar el mapa",
         "overlay_loading_error": "Error al cargar la superposición meteorológica",
@@ -848,6 +864,9 @@ TRANSLATIONS = {
         "network_error": "नेटवर्क त्रुटि",
         "try_again": "पुनः प्रयास करें",
         "refresh": "रीफ्रेश करें",
+        "timelapse_play": "टाइम-लैप्स चलाएं",
+        "timelapse_stop": "टाइम-लैप्स रोकें",
+        "timelapse_loading": "फ्रेम लोड हो रहे हैं...",
         "visible": "दिखाई दे रहा",
         "unknown": "अज्ञात",
         "unknown_error": "अज्ञात त्रुटि हुई",
@@ -926,6 +945,7 @@ TRANSLATIONS = {
         "overlay_pressure": "वायुमंडलीय दबाव",
         "overlay_snow": "बर्फ आवरण",
         "overlay_dewpoint": "ओस बिंदु",
+        "overlay_local_temperature": "तापमान (स्थानीय)",
         
         # Map Information Panel
         "map_information": "मानचित्र जानकारी",
@@ -977,6 +997,10 @@ TRANSLATIONS = {
         "dewpoint_overlay_desc": "मानचित्र क्षेत्र में ओस बिंदु तापमान दिखाता है। आर्द्रता आराम स्तर और कोहरे या नमी गठन की संभावना का संकेत देता है।",
         "dewpoint_overlay_features": "• आर्द्रता आराम मैपिंग\n• कोहरा गठन भविष्यवाणी\n• नमी स्तर विज़ुअलाइज़ेशन\n• वायु गुणवत्ता सहसंबंध डेटा",
         
+        "local_temperature_overlay_info": "स्थानीय तापमान आवरण",
+        "local_temperature_overlay_desc": "आपके सहेजे गए शहरों के वर्तमान तापमान से इसी कंप्यूटर पर बनाया जाता है। शहरों के बीच का तापमान निकटतम शहरों से अनुमानित किया जाता है, और किसी भी शहर से दूर रंग फीके हो जाते हैं।",
+        "local_temperature_overlay_features": "• मौसम टाइल सेवा के बिना काम करता है\n• ऐप द्वारा पहले से डाउनलोड किए गए डेटा का उपयोग\n• नया तापमान आने पर अपडेट होता है\n• सभी ज़ूम स्तरों पर उपलब्ध",
+        
         # Map Error Messages
         "map_loading_error": "मानचित्र लोड करने में त्रुटि",
         "overlay_loading_error": "मौसम आवरण लोड करने में त्रुटि",